@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+ADC calibration for the Bodycam2 battery monitor
+================================================
+Converts MCP3021 codes to battery voltage with the per-device reference
+rail, divider and linear correction, and carries the discharge curve to
+the SoC estimator.  The conversion is one multiply-add on a (possibly
+fractional) code, so no lookup table is kept.
+
+Per-device calibration is optional and lives next to the IMU one:
+
+  /app/bodycam2/conf/battery_calibration.json
+  {
+      "vdd": 3.29,                       # measured reference rail
+      "r_top": 10000, "r_bottom": 27000, # divider as fitted
+      "gain": 1.0, "offset_v": 0.0,      # linear correction on V_BAT
+      "curve": [[4.20, 100], ..., [3.00, 0]]
+  }
+
+Any key may be omitted; the board defaults are used for the rest.  The
+curve must fall strictly in both voltage and percentage, since the
+estimator divides by the step between points.
+"""
+
+import json
+import logging
+
+log = logging.getLogger("battery")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+CALIBRATION_PATH = "/app/bodycam2/conf/battery_calibration.json"
+
+ADC_CODES = 1024
+
+
+class AdcCalibration:
+    """code -> battery voltage, plus the discharge curve."""
+
+    def __init__(self, vdd, r_top, r_bottom, curve, gain=1.0, offset_v=0.0):
+        self.vdd = float(vdd)
+        self.r_top = float(r_top)
+        self.r_bottom = float(r_bottom)
+        self.curve = [(float(v), float(p)) for v, p in curve]
+        self.gain = float(gain)
+        self.offset_v = float(offset_v)
+        divider = (self.r_top + self.r_bottom) / self.r_bottom if self.r_bottom > 0 else 0.0
+        self._volts_per_code = self.vdd / ADC_CODES * divider * self.gain
+
+    @classmethod
+    def load(cls, defaults, path=CALIBRATION_PATH):
+        """Build the calibration from `defaults` overridden by the file.
+
+        `defaults` holds vdd, r_top, r_bottom and curve.  A missing file is
+        normal (uncalibrated unit); an unreadable or implausible one is
+        logged and ignored.
+        """
+        params = dict(defaults)
+        try:
+            with open(path, "r") as fh:
+                data = json.load(fh)
+            for key in ("vdd", "r_top", "r_bottom", "gain", "offset_v", "curve"):
+                if key in data:
+                    params[key] = data[key]
+            cal = cls(**params)
+            if not cal.is_plausible():
+                raise ValueError("implausible calibration")
+            return cal, path
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning(f"Ignoring battery calibration {path}: {e}")
+        return cls(**dict(defaults)), None
+
+    def is_plausible(self):
+        volts = [v for v, _ in self.curve]
+        pcts = [p for _, p in self.curve]
+        return (
+            len(self.curve) >= 2
+            and all(a > b for a, b in zip(volts, volts[1:]))
+            and all(a > b for a, b in zip(pcts, pcts[1:]))
+            and 2.5 <= volts[-1] < volts[0] <= 4.5
+            and 3.0 <= self.vdd <= 3.6
+            and self.r_bottom > 0
+            and self.r_top >= 0
+            and 0.8 <= self.gain <= 1.2
+        )
+
+    def voltage(self, code):
+        """Battery voltage for a (possibly fractional) code."""
+        code = min(max(float(code), 0.0), ADC_CODES - 1)
+        return code * self._volts_per_code + self.offset_v
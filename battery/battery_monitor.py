@@ -2,9 +2,16 @@
 """
 Battery Monitor for Bodycam2
 ============================
-Reads LiPo battery voltage via MCP3021 10-bit ADC over I2C,
-converts to percentage using a discharge curve lookup table,
-and writes the result to /dev/shm/battery.dat.
+Samples LiPo battery voltage continuously (2 Hz) from an MCP3021 10-bit
+ADC over the shared bus-0 handle (i2c_lib) into a ring buffer of raw codes.  At
+the publish interval a robust filter over the buffer (median/MAD outlier
+rejection, trimmed mean) yields a code, converted through a per-device
+calibration (adc_calibration.py) to the voltage, which is fed, together with
+the current load state (camera streaming, modem state
+from the telemetry bus), into a Kalman filter (soc_estimator.py) that
+compensates voltage sag.  The filtered percentage is published on the
+telemetry bus ("battery" field) and, for legacy readers, to
+/dev/shm/battery.dat; the predicted runtime goes to "battery_runtime".
 
 Hardware:
   - MCP3021A5T on I2C bus 0, address 0x4D
@@ -12,13 +19,27 @@ Hardware:
   - VDD = 3.3V regulated rail
   - GPIO24 = low battery LED
 
-LED behavior:
-  - Above 15%: LED off
-  - 15% to 10%: blink (200ms on, 2s off)
-  - Below 10%: solid on
+Low battery: every level crossing (ok / warn / critical / shutdown) is
+published as a "battery_event" on the telemetry bus.  The shutdown
+coordinator (shutdown.py) runs as a thread here and reacts to the
+"shutdown" event: final MQTT status, ordered service stop, poweroff.
+
+History: one record per minute (voltage, SoC, load flags, board
+temperature, modelled current, runtime, series resistance) goes to a
+ring file on the SD card (history.py), written in batches.
+
+Brownout: the median of the last few samples is checked on every
+sample; a dip below BROWNOUT_V or a sudden drop of BROWNOUT_DROP_V is
+logged and published immediately instead of waiting for the next cycle.
+
+LED behavior (predicted runtime at the recent average load):
+  - Above 30 min: LED off
+  - 30 to 10 min: blink (200ms on, 2s off)
+  - Below 10 min: solid on
   - Hysteresis bands prevent state toggling at boundaries
 """
 
+import argparse
 import os
 import sys
 import time
@@ -28,17 +49,29 @@ import threading
 import logging
 
 
-try:
-    import smbus2
-except ImportError:
-    print("FATAL: smbus2 not installed. pip install smbus2", file=sys.stderr)
-    sys.exit(1)
+import numpy as np
 
 try:
     import RPi.GPIO as GPIO
 except ImportError:
     GPIO = None
 
+# Allow import of shared telemetry_lib module from /app/bodycam2/
+sys.path.insert(0, "/app/bodycam2")
+
+from telemetry_lib import TelemetryBus
+
+try:
+    from i2c_lib import PRIORITY_LOW, open_device
+except ImportError:
+    print("FATAL: smbus2 not installed. pip install smbus2", file=sys.stderr)
+    sys.exit(1)
+
+from adc_calibration import ADC_CODES, AdcCalibration
+from history import BatteryHistory, load_flags
+from shutdown import ShutdownCoordinator
+from soc_estimator import DISCHARGE_CURVE, SocEstimator, load_current, streaming_active
+
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
@@ -47,15 +80,26 @@ I2C_BUS = 0
 I2C_ADDR = 0x4D
 
 # Voltage divider: V_BAT = V_AIN * (R_TOP + R_BOTTOM) / R_BOTTOM
+# Board defaults; per-device values come from the calibration file
 R_TOP = 10_000
 R_BOTTOM = 27_000
-DIVIDER_RATIO = (R_TOP + R_BOTTOM) / R_BOTTOM
 
 VDD = 3.3
-ADC_RESOLUTION = 1024
 
-SAMPLES_PER_CYCLE = 10
-POLL_INTERVAL_S = 60
+SAMPLE_INTERVAL_S = 0.5      # Continuous ADC sampling period
+RING_SIZE = 240              # Raw codes kept (2 min at 2 Hz)
+FILTER_WINDOW_S = 30         # Samples used for each published value
+MIN_FILTER_SAMPLES = 5
+OUTLIER_MAD_K = 4.0          # Reject codes further than k * MAD from median
+TRIM_FRACTION = 0.1          # Trimmed from each end after outlier rejection
+PUBLISH_INTERVAL_S = 60      # Default, override with --publish-interval
+
+BROWNOUT_SAMPLES = 3         # Short median for brownout detection
+BROWNOUT_V = 3.30            # Absolute dip threshold
+BROWNOUT_DROP_V = 0.25       # Sudden drop below the filtered voltage
+
+WATCHDOG_PING_S = 10
+LOOP_ERROR_LOG_EVERY = 120   # Repeated cycle errors logged once a minute at 2 Hz
 
 OUTPUT_PATH = "/dev/shm/battery.dat"
 OUTPUT_TMP = OUTPUT_PATH + ".tmp"
@@ -67,33 +111,17 @@ LED_PIN = 24
 LED_ON_MS = 200
 LED_OFF_S = 2.0
 
-THRESH_WARN = 15
+# Runtime thresholds in minutes
+THRESH_WARN = 30
 THRESH_CRIT = 10
-HYSTERESIS = 2
-
-# LiPo discharge curve: (voltage, percentage)
-DISCHARGE_CURVE = [
-    (4.20, 100),
-    (4.15, 95),
-    (4.10, 90),
-    (4.05, 85),
-    (4.00, 80),
-    (3.95, 75),
-    (3.90, 70),
-    (3.85, 65),
-    (3.80, 60),
-    (3.75, 55),
-    (3.70, 50),
-    (3.65, 45),
-    (3.60, 40),
-    (3.55, 30),
-    (3.50, 20),
-    (3.45, 15),
-    (3.40, 10),
-    (3.30, 5),
-    (3.20, 2),
-    (3.00, 0),
-]
+HYSTERESIS = 5
+
+MODEM_MAX_AGE_S = 180  # Older cell telemetry -> modem state unknown
+
+# Shutdown when either is reached (latched)
+SHUTDOWN_RUNTIME_S = 5 * 60
+SHUTDOWN_VOLTAGE_V = 3.25   # Model-independent floor
+
 
 # ---------------------------------------------------------------------------
 # Logging — minimal output, rotate to stay small
@@ -152,6 +180,7 @@ LED_BLINK = 1
 LED_SOLID = 2
 
 _LED_NAMES = {LED_OFF: "off", LED_BLINK: "blink", LED_SOLID: "solid"}
+_LEVEL_NAMES = {LED_OFF: "ok", LED_BLINK: "warn", LED_SOLID: "critical"}
 
 
 class LEDController:
@@ -239,91 +268,139 @@ class LEDController:
 # ADC
 # ---------------------------------------------------------------------------
 
-def read_adc_raw(bus):
+def read_adc_raw(dev):
     """Read single 10-bit value from MCP3021.
 
     Byte 0: 0000 D9 D8 D7 D6
     Byte 1: D5 D4 D3 D2 D1 D0 X X
     """
-    data = bus.read_i2c_block_data(I2C_ADDR, 0, 2)
+    data = dev.read_i2c_block_data(0, 2)
     return ((data[0] & 0x0F) << 6) | ((data[1] & 0xFC) >> 2)
 
 
-def read_battery_voltage(bus):
-    """Sample ADC, trim outliers, convert to battery voltage."""
-    readings = []
-    for _ in range(SAMPLES_PER_CYCLE):
+class AdcSampler:
+    """MCP3021 on the shared bus-0 handle (i2c_lib reopens it after errors).
+
+    Low priority: the ADC shares bus 0 with the UV sensor and a reading
+    can wait a few milliseconds for the bus.
+    """
+
+    def __init__(self, bus_num):
+        self.dev = open_device(bus_num, I2C_ADDR, "mcp3021", PRIORITY_LOW)
+
+    def read(self):
+        """Return one raw code, or None on I2C error."""
         try:
-            readings.append(read_adc_raw(bus))
+            return read_adc_raw(self.dev)
         except OSError:
-            continue
-        time.sleep(0.005)
+            return None
 
-    if len(readings) < 3:
-        return None
+    def close(self):
+        self.dev.bus.close()
 
-    readings.sort()
-    trimmed = readings[1:-1]
-    avg_code = sum(trimmed) / len(trimmed)
 
-    v_ain = (avg_code / ADC_RESOLUTION) * VDD
-    return v_ain * DIVIDER_RATIO
+class AdcRing:
+    """Fixed-size ring buffer of raw ADC codes with sample times."""
 
+    def __init__(self, size=RING_SIZE):
+        self.codes = np.zeros(size, dtype=np.float32)
+        self.times = np.full(size, -np.inf)
+        self._next = 0
+        self.count = 0
 
-# ---------------------------------------------------------------------------
-# Voltage to percentage
-# ---------------------------------------------------------------------------
+    def add(self, code, t):
+        self.codes[self._next] = code
+        self.times[self._next] = t
+        self._next = (self._next + 1) % len(self.codes)
+        self.count += 1
 
-def voltage_to_percent(voltage):
-    """Convert battery voltage to percentage via discharge curve
-    with linear interpolation."""
-    if voltage is None:
-        return None
+    def window(self, seconds, now):
+        """Codes sampled within the last `seconds` (unordered)."""
+        return self.codes[self.times >= now - seconds]
 
-    if voltage >= DISCHARGE_CURVE[0][0]:
-        return 100
-    if voltage <= DISCHARGE_CURVE[-1][0]:
-        return 0
+    def latest(self, n):
+        """The `n` most recent codes."""
+        n = min(n, self.count, len(self.codes))
+        idx = (self._next - 1 - np.arange(n)) % len(self.codes)
+        return self.codes[idx]
 
-    for i in range(len(DISCHARGE_CURVE) - 1):
-        v_high, p_high = DISCHARGE_CURVE[i]
-        v_low, p_low = DISCHARGE_CURVE[i + 1]
-        if v_low <= voltage <= v_high:
-            frac = (voltage - v_low) / (v_high - v_low)
-            return max(0, min(100, int(round(p_low + frac * (p_high - p_low)))))
 
-    return 0
+def robust_code(codes):
+    """Outlier-rejected, trimmed mean of raw codes (one vectorized pass).
+
+    Codes further than OUTLIER_MAD_K median absolute deviations from the
+    median are dropped (MAD floored at 1 LSB so a quiet ADC keeps its
+    samples), then TRIM_FRACTION is trimmed from each end.
+    """
+    if len(codes) < MIN_FILTER_SAMPLES:
+        return None
+    med = np.median(codes)
+    dev = np.abs(codes - med)
+    mad = max(float(np.median(dev)), 1.0)
+    kept = np.sort(codes[dev <= OUTLIER_MAD_K * mad])
+    trim = int(len(kept) * TRIM_FRACTION)
+    if trim:
+        kept = kept[trim:-trim]
+    return float(kept.mean())
+
+
+class BrownoutDetector:
+    """Flags sudden or deep voltage dips from the newest samples."""
+
+    def __init__(self, calibration):
+        self.calibration = calibration
+        self.active = False
+        self.events = 0
+        self.last_v = None
+
+    def check(self, ring, reference_v):
+        """Return "start", "end" or None for the current ring contents."""
+        if ring.count < BROWNOUT_SAMPLES:
+            return None
+        short_v = self.calibration.voltage(np.median(ring.latest(BROWNOUT_SAMPLES)))
+        self.last_v = short_v
+        dip = short_v < BROWNOUT_V or (
+            reference_v is not None and reference_v - short_v > BROWNOUT_DROP_V
+        )
+        if dip and not self.active:
+            self.active = True
+            self.events += 1
+            return "start"
+        if not dip and self.active:
+            self.active = False
+            return "end"
+        return None
 
 
 # ---------------------------------------------------------------------------
 # LED state with hysteresis
 # ---------------------------------------------------------------------------
 
-def determine_led_state(percent, current):
-    """Decide LED state with hysteresis to prevent boundary toggling.
+def determine_led_state(minutes, current):
+    """Decide LED state from runtime remaining, with hysteresis.
 
-    OFF   -> BLINK  at <= 15%     | BLINK -> OFF   at >= 17%
-    BLINK -> SOLID  at <= 10%     | SOLID -> BLINK at >= 12%
+    OFF   -> BLINK  at <= 30 min  | BLINK -> OFF   at >= 35 min
+    BLINK -> SOLID  at <= 10 min  | SOLID -> BLINK at >= 15 min
     """
-    if percent is None:
+    if minutes is None:
         return current
 
     if current == LED_OFF:
-        if percent <= THRESH_CRIT:
+        if minutes <= THRESH_CRIT:
             return LED_SOLID
-        if percent <= THRESH_WARN:
+        if minutes <= THRESH_WARN:
             return LED_BLINK
         return LED_OFF
 
     if current == LED_BLINK:
-        if percent <= THRESH_CRIT:
+        if minutes <= THRESH_CRIT:
             return LED_SOLID
-        if percent >= THRESH_WARN + HYSTERESIS:
+        if minutes >= THRESH_WARN + HYSTERESIS:
             return LED_OFF
         return LED_BLINK
 
     if current == LED_SOLID:
-        if percent >= THRESH_CRIT + HYSTERESIS:
+        if minutes >= THRESH_CRIT + HYSTERESIS:
             return LED_BLINK
         return LED_SOLID
 
@@ -347,21 +424,94 @@ def write_battery_level(percent):
         log.error(f"Write failed: {e}")
 
 
+def battery_level(led_state, runtime, voltage, latched):
+    """Event level for the current reading; "shutdown" latches."""
+    if latched == "shutdown" or voltage <= SHUTDOWN_VOLTAGE_V or (
+        runtime is not None and runtime <= SHUTDOWN_RUNTIME_S
+    ):
+        return "shutdown"
+    return _LEVEL_NAMES[led_state]
+
+
+def publish_event(telemetry, coordinator, level, runtime):
+    """Announce a level crossing on the bus (or straight to the coordinator)."""
+    log_info(f"Battery level {level} (runtime {runtime}s)")
+    if telemetry is not None:
+        telemetry.publish("battery_event", level=level,
+                          runtime_s=-1 if runtime is None else runtime)
+    else:
+        coordinator.trigger(level, runtime)
+
+
+def read_load_state(telemetry):
+    """Streamer running and modem state (None if unknown)."""
+    modem_state = None
+    if telemetry is not None:
+        cell = telemetry.read_fresh("cell", MODEM_MAX_AGE_S)
+        if cell is not None:
+            modem_state = cell.values["state"]
+    return streaming_active(), modem_state
+
+
+def open_telemetry():
+    """Open the shared telemetry bus, or None (legacy file only)."""
+    try:
+        return TelemetryBus()
+    except OSError as e:
+        log.error(f"Telemetry bus unavailable: {e}")
+        return None
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bodycam2 battery monitor")
+    parser.add_argument("--publish-interval", type=float, default=PUBLISH_INTERVAL_S,
+                        help="Seconds between published values (default: %(default)s)")
+    parser.add_argument("--sample-interval", type=float, default=SAMPLE_INTERVAL_S,
+                        help="Seconds between ADC samples (default: %(default)s)")
+    parser.add_argument("--no-poweroff", action="store_true",
+                        help="Log the low-battery shutdown steps instead of running them")
+    return parser.parse_args()
+
+
 def main():
-    log_info(f"Started | bus={I2C_BUS} addr=0x{I2C_ADDR:02X} poll={POLL_INTERVAL_S}s")
+    args = parse_args()
+    log_info(f"Started | bus={I2C_BUS} addr=0x{I2C_ADDR:02X} "
+             f"sample={args.sample_interval}s publish={args.publish_interval}s")
 
     led = LEDController(LED_PIN)
     led.start()
 
+    calibration, cal_path = AdcCalibration.load(
+        {"vdd": VDD, "r_top": R_TOP, "r_bottom": R_BOTTOM, "curve": DISCHARGE_CURVE}
+    )
+    log_info(f"ADC calibration: {cal_path or 'board defaults'} "
+             f"({calibration.voltage(0):.2f}-{calibration.voltage(ADC_CODES - 1):.2f} V)")
+
     led_state = LED_OFF
-    consecutive_failures = 0
+    telemetry = open_telemetry()
+    estimator = SocEstimator(curve=calibration.curve)
+    sampler = AdcSampler(I2C_BUS)
+    ring = AdcRing()
+    brownout = BrownoutDetector(calibration)
+    try:
+        history = BatteryHistory()
+    except OSError as e:
+        log.error(f"Battery history unavailable: {e}")
+        history = None
+    coordinator = ShutdownCoordinator(telemetry, dry_run=args.no_poweroff)
+    coordinator.start()
+    level = None
 
     def shutdown(signum, _frame):
         log_info(f"Shutdown signal={signum}")
+        if history is not None:
+            history.close()
+        log_info(f"I2C {sampler.dev.summary()}")
+        sampler.close()
         led.cleanup()
         sys.exit(0)
 
@@ -370,43 +520,93 @@ def main():
 
     sd_notify("READY=1")
 
+    voltage = None
+    next_sample = next_publish = time.monotonic()
+    last_ping = 0.0
+    last_good = time.monotonic()
+    reported_failure = False
+    loop_errors = 0
+
     while True:
-        bus = None
-        percent = None
+        now = time.monotonic()
         try:
-            bus = smbus2.SMBus(I2C_BUS)
-            voltage = read_battery_voltage(bus)
-            percent = voltage_to_percent(voltage)
-
-            if percent is not None:
-                write_battery_level(percent)
-                if consecutive_failures >= 3:
+            code = sampler.read()
+            if code is not None:
+                ring.add(code, now)
+                last_good = now
+                if reported_failure:
                     log_info("ADC recovered after failures")
-                consecutive_failures = 0
-            else:
-                consecutive_failures += 1
-                if consecutive_failures == 3:
-                    log.error("No valid ADC reading for 3 consecutive cycles")
-
+                    reported_failure = False
+            elif not reported_failure and now - last_good >= 3 * args.publish_interval:
+                log.error(f"No valid ADC reading for {now - last_good:.0f}s")
+                reported_failure = True
+
+            event = brownout.check(ring, voltage) if code is not None else None
+            if event == "start":
+                log.error(f"Brownout: {brownout.last_v:.2f} V (filtered {voltage or 0:.2f} V, "
+                          f"estimate {estimator.percent()}%)")
+                next_publish = now
+            elif event == "end":
+                log_info(f"Brownout cleared: {brownout.last_v:.2f} V")
+
+            if now >= next_publish:
+                next_publish = now + args.publish_interval
+                code_f = robust_code(ring.window(FILTER_WINDOW_S, now))
+                if code_f is not None:
+                    voltage = calibration.voltage(code_f)
+                    streaming, modem_state = read_load_state(telemetry)
+                    current = load_current(streaming, modem_state)
+                    estimator.update(voltage, current, now)
+                    percent = estimator.percent()
+                    runtime = estimator.runtime_s()
+                    write_battery_level(percent)
+                    if telemetry is not None:
+                        # During a brownout the bus carries the dip itself,
+                        # the estimator keeps working from the filtered value
+                        telemetry.publish("battery",
+                                          voltage=brownout.last_v if brownout.active else voltage,
+                                          percent=percent)
+                        telemetry.publish("battery_runtime",
+                                          runtime_s=-1 if runtime is None else runtime,
+                                          current_a=current,
+                                          soc_std=estimator.soc_std())
+
+                    if history is not None and history.due(now):
+                        history.add(now, voltage, percent,
+                                    load_flags(streaming, modem_state, brownout.active),
+                                    current, runtime, estimator.r)
+
+                    minutes = None if runtime is None else runtime / 60.0
+                    led_state = determine_led_state(minutes, led_state)
+                    led.set_state(led_state)
+
+                    new_level = battery_level(led_state, runtime, voltage, level)
+                    if new_level != level:
+                        level = new_level
+                        publish_event(telemetry, coordinator, level, runtime)
+                elif ring.count < MIN_FILTER_SAMPLES:
+                    # Still filling the buffer at startup
+                    next_publish = now + args.sample_interval
         except Exception as e:
-            consecutive_failures += 1
-            if consecutive_failures == 3:
-                log.error(f"Persistent error: {e}")
-
-        finally:
-            if bus:
-                try:
-                    bus.close()
-                except Exception:
-                    pass
-
-        new_state = determine_led_state(percent, led_state)
-        if new_state != led_state:
-            led_state = new_state
-        led.set_state(led_state)
-
-        watchdog_ping()
-        time.sleep(POLL_INTERVAL_S)
+            # Keep sampling, pinging the watchdog and hosting the shutdown
+            # coordinator; log the first failure of a run, then sparingly
+            loop_errors += 1
+            if loop_errors == 1 or loop_errors % LOOP_ERROR_LOG_EVERY == 0:
+                log.error(f"Monitor cycle failed ({loop_errors}x): {e}",
+                          exc_info=loop_errors == 1)
+        else:
+            loop_errors = 0
+
+        if now - last_ping >= WATCHDOG_PING_S:
+            watchdog_ping()
+            last_ping = now
+
+        next_sample += args.sample_interval
+        delay = next_sample - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_sample = time.monotonic()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Battery history ring file for Bodycam2
+======================================
+Fixed-size binary ring of per-minute battery records on persistent
+storage, kept for the last HISTORY_SHIFTS shifts.  Records are buffered
+in memory and written FLUSH_RECORDS at a time (one pwrite + header
+update), so the SD card sees a write every 15 minutes instead of every
+minute.  close() flushes whatever is pending (SIGTERM, poweroff).
+
+File layout:
+  header  32 bytes  magic "BCBH", version, record size, capacity,
+                    next write slot, records written (total)
+  records capacity x 16 bytes, oldest overwritten first
+
+Record (little endian, RECORD_DTYPE):
+  ts          uint32   unix time
+  voltage_mv  uint16   filtered battery voltage
+  percent     uint8    estimated SoC
+  flags       uint8    FLAG_* load state
+  temp_c10    int16    board (SoC) temperature, 0.1 C; no cell sensor
+  current_ma  uint16   modelled load current
+  runtime_min uint16   predicted runtime (0xFFFF = unknown)
+  r_mohm      uint16   estimated series resistance
+
+history_report.py reads these files (one per device) for discharge and
+degradation analysis.
+"""
+
+import logging
+import os
+import struct
+import time
+
+import numpy as np
+
+log = logging.getLogger("battery")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+HISTORY_PATH = "/app/bodycam2/data/battery_history.bin"
+HISTORY_INTERVAL_S = 60
+HISTORY_SHIFTS = 30
+SHIFT_HOURS = 8
+CAPACITY = HISTORY_SHIFTS * SHIFT_HOURS * 3600 // HISTORY_INTERVAL_S
+FLUSH_RECORDS = 15
+
+TEMP_PATH = "/sys/class/thermal/thermal_zone0/temp"
+
+FLAG_STREAMING = 0x01
+FLAG_MODEM_CONNECTED = 0x02
+FLAG_MODEM_REGISTERED = 0x04
+FLAG_BROWNOUT = 0x08
+
+MAGIC = b"BCBH"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIIQ4x")
+HEADER_SIZE = _HEADER.size  # 32
+
+RECORD_DTYPE = np.dtype([
+    ("ts", "<u4"),
+    ("voltage_mv", "<u2"),
+    ("percent", "u1"),
+    ("flags", "u1"),
+    ("temp_c10", "<i2"),
+    ("current_ma", "<u2"),
+    ("runtime_min", "<u2"),
+    ("r_mohm", "<u2"),
+])
+RUNTIME_UNKNOWN = 0xFFFF
+
+
+def load_flags(streaming, modem_state, brownout=False):
+    """Pack the load state into a record flags byte."""
+    flags = FLAG_STREAMING if streaming else 0
+    if modem_state == "connected":
+        flags |= FLAG_MODEM_CONNECTED
+    elif modem_state == "registered":
+        flags |= FLAG_MODEM_REGISTERED
+    if brownout:
+        flags |= FLAG_BROWNOUT
+    return flags
+
+
+def read_board_temp():
+    """SoC temperature in 0.1 C, or 0 if unavailable."""
+    try:
+        with open(TEMP_PATH) as fh:
+            return int(fh.read().strip()) // 100
+    except (OSError, ValueError):
+        return 0
+
+
+def read_history(path):
+    """Return all records of a history file, oldest first."""
+    with open(path, "rb") as fh:
+        head = fh.read(HEADER_SIZE)
+        magic, version, rec_size, capacity, nxt, total = _HEADER.unpack(head)
+        if magic != MAGIC or version != VERSION or rec_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{path}: not a battery history file")
+        data = np.frombuffer(fh.read(capacity * rec_size), dtype=RECORD_DTYPE)
+    if total < capacity:
+        return data[:total].copy()
+    return np.concatenate([data[nxt:], data[:nxt]])
+
+
+class BatteryHistory:
+    """Append-only view of the ring file with batched writes."""
+
+    def __init__(self, path=HISTORY_PATH, capacity=CAPACITY):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.capacity = capacity
+        self.next = 0
+        self.total = 0
+        self.pending = np.zeros(FLUSH_RECORDS, dtype=RECORD_DTYPE)
+        self.n_pending = 0
+        self.last_t = None
+
+        head = os.pread(self.fd, HEADER_SIZE, 0)
+        if len(head) == HEADER_SIZE:
+            magic, version, rec_size, cap, nxt, total = _HEADER.unpack(head)
+            if (magic, version, rec_size, cap) == (MAGIC, VERSION, RECORD_DTYPE.itemsize, capacity):
+                self.next, self.total = nxt, total
+                return
+            log.warning(f"Battery history {path} has a different layout, starting over")
+        os.ftruncate(self.fd, HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+        self._write_header()
+
+    def due(self, now):
+        """True if a record is due at monotonic time `now`."""
+        return self.last_t is None or now - self.last_t >= HISTORY_INTERVAL_S
+
+    def add(self, now, voltage, percent, flags, current, runtime_s, r_ohm):
+        self.last_t = now
+        rec = self.pending[self.n_pending]
+        rec["ts"] = int(time.time())
+        rec["voltage_mv"] = int(round(voltage * 1000))
+        rec["percent"] = max(0, min(100, percent))
+        rec["flags"] = flags
+        rec["temp_c10"] = read_board_temp()
+        rec["current_ma"] = int(round(current * 1000))
+        rec["runtime_min"] = (RUNTIME_UNKNOWN if runtime_s is None
+                              else min(max(runtime_s, 0) // 60, RUNTIME_UNKNOWN - 1))
+        rec["r_mohm"] = int(round(r_ohm * 1000))
+        self.n_pending += 1
+        if self.n_pending == FLUSH_RECORDS:
+            self.flush()
+
+    def flush(self):
+        n = self.n_pending
+        if not n:
+            return
+        size = RECORD_DTYPE.itemsize
+        data = self.pending[:n].tobytes()
+        first = min(n, self.capacity - self.next)
+        try:
+            os.pwrite(self.fd, data[:first * size], HEADER_SIZE + self.next * size)
+            if first < n:
+                os.pwrite(self.fd, data[first * size:], HEADER_SIZE)
+            self.next = (self.next + n) % self.capacity
+            self.total += n
+            self._write_header()
+            os.fsync(self.fd)
+        except OSError as e:
+            log.error(f"Battery history write failed: {e}")
+        self.n_pending = 0
+
+    def _write_header(self):
+        os.pwrite(self.fd, _HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize,
+                                        self.capacity, self.next, self.total), 0)
+
+    def close(self):
+        if self.fd is None:
+            return
+        self.flush()
+        os.close(self.fd)
+        self.fd = None
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Discharge and degradation report from battery history files.
+
+Reads the ring files written by battery_monitor.py (history.py), one
+per device, e.g. collected from the fleet as <device_id>.bin, and
+reports:
+
+  per load profile   discharge rate (%/h and mV/h) and mean modelled
+                     current, for idle / streaming, with and without LTE
+  per device         shifts, effective capacity (modelled mAh per 100 %
+                     SoC), series resistance, and their trend over time
+  fleet              devices whose capacity or resistance is an outlier
+                     against the fleet median, or trending down
+
+A shift is a run of records without a gap over --gap-min and without
+charging (SoC rising).  Effective capacity uses the modelled load
+current, so it is relative: a cell that has lost capacity drains its
+estimated SoC faster for the same load and scores lower than its peers.
+
+Usage:
+    python3 history_report.py /app/bodycam2/data/battery_history.bin
+    python3 history_report.py fleet/*.bin --min-drop 30
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from history import (
+    FLAG_BROWNOUT,
+    FLAG_MODEM_CONNECTED,
+    FLAG_STREAMING,
+    read_history,
+)
+
+DEFAULT_GAP_MIN = 30
+DEFAULT_MIN_DROP = 20       # % SoC a shift must cover for a capacity estimate
+CHARGE_RISE_PCT = 2         # SoC rise that marks a charge (new shift)
+RECENT_SHIFTS = 5           # Shifts summarised as "current" state
+CAPACITY_OUTLIER = 0.80     # Fraction of fleet median capacity
+RESISTANCE_OUTLIER = 1.5    # Multiple of fleet median resistance
+TREND_ALERT_PCT = -5.0      # Capacity trend (% per 30 days) worth flagging
+
+PROFILES = ("idle", "idle+lte", "streaming", "streaming+lte")
+
+
+def profile_index(flags):
+    """Map record flags to an index into PROFILES (vectorized)."""
+    return ((flags & FLAG_STREAMING) != 0) * 2 + ((flags & FLAG_MODEM_CONNECTED) != 0)
+
+
+def split_shifts(rec, gap_s):
+    """Return a shift id per record (gaps and charging start a new shift)."""
+    dt = np.diff(rec["ts"].astype(np.int64))
+    rise = np.diff(rec["percent"].astype(np.int16)) >= CHARGE_RISE_PCT
+    brk = (dt > gap_s) | (dt <= 0) | rise
+    return np.concatenate([[0], np.cumsum(brk)])
+
+
+def discharge_by_profile(rec, shift):
+    """Per-profile totals over consecutive record pairs within a shift."""
+    same = shift[1:] == shift[:-1]
+    clean = (rec["flags"][:-1] & FLAG_BROWNOUT) == 0
+    ok = same & clean
+    prof = profile_index(rec["flags"][:-1])[ok]
+    dt_h = np.diff(rec["ts"].astype(np.float64))[ok] / 3600.0
+    d_pct = -np.diff(rec["percent"].astype(np.float64))[ok]
+    d_mv = -np.diff(rec["voltage_mv"].astype(np.float64))[ok]
+    cur = rec["current_ma"][:-1].astype(np.float64)[ok]
+    n = len(PROFILES)
+    return {
+        "hours": np.bincount(prof, dt_h, n),
+        "pct": np.bincount(prof, d_pct, n),
+        "mv": np.bincount(prof, d_mv, n),
+        "mah": np.bincount(prof, cur * dt_h, n),
+    }
+
+
+def shift_stats(rec, shift, min_drop):
+    """One row per shift: start ts, SoC drop, effective capacity, resistance."""
+    rows = []
+    for sid in np.unique(shift):
+        r = rec[shift == sid]
+        if len(r) < 2:
+            continue
+        drop = float(r["percent"][0]) - float(r["percent"][-1])
+        dt_h = np.diff(r["ts"].astype(np.float64)) / 3600.0
+        mah = float(np.sum(r["current_ma"][:-1] * dt_h))
+        capacity = mah / (drop / 100.0) if drop >= min_drop else np.nan
+        rows.append((int(r["ts"][0]), drop, capacity, float(np.median(r["r_mohm"]))))
+    return np.array(rows, dtype=[("ts", "i8"), ("drop", "f8"),
+                                 ("capacity", "f8"), ("r_mohm", "f8")])
+
+
+def trend_pct_per_30d(ts, values):
+    """Linear trend of `values` in % of their mean per 30 days."""
+    ok = ~np.isnan(values)
+    if ok.sum() < 3 or np.ptp(ts[ok]) < 86400:
+        return np.nan
+    slope = np.polyfit(ts[ok] / 86400.0, values[ok], 1)[0]
+    return 100.0 * slope * 30 / np.mean(values[ok])
+
+
+def device_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Battery history discharge report")
+    parser.add_argument("files", nargs="+", help="History files, one per device")
+    parser.add_argument("--gap-min", type=float, default=DEFAULT_GAP_MIN,
+                        help="Gap (minutes) that ends a shift")
+    parser.add_argument("--min-drop", type=float, default=DEFAULT_MIN_DROP,
+                        help="Minimum SoC drop (%%) for a capacity estimate")
+    args = parser.parse_args()
+
+    totals = {k: np.zeros(len(PROFILES)) for k in ("hours", "pct", "mv", "mah")}
+    devices = []
+    for path in args.files:
+        try:
+            rec = read_history(path)
+        except (OSError, ValueError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            continue
+        if len(rec) < 2:
+            continue
+        shift = split_shifts(rec, args.gap_min * 60)
+        for k, v in discharge_by_profile(rec, shift).items():
+            totals[k] += v
+        stats = shift_stats(rec, shift, args.min_drop)
+        recent = stats[-RECENT_SHIFTS:]
+        devices.append({
+            "name": device_name(path),
+            "records": len(rec),
+            "shifts": len(stats),
+            "capacity": float(np.nanmedian(recent["capacity"])) if np.any(~np.isnan(recent["capacity"])) else np.nan,
+            "r_mohm": float(np.median(recent["r_mohm"])) if len(recent) else np.nan,
+            "trend": trend_pct_per_30d(stats["ts"].astype(np.float64), stats["capacity"]),
+        })
+
+    if not devices:
+        print("No usable history")
+        return 1
+
+    print("Discharge by load profile (all devices)")
+    print(f"{'profile':<15} {'hours':>7} {'%/h':>6} {'mV/h':>6} {'mA':>6}")
+    for i, name in enumerate(PROFILES):
+        h = totals["hours"][i]
+        if h <= 0:
+            continue
+        print(f"{name:<15} {h:>7.1f} {totals['pct'][i] / h:>6.1f} "
+              f"{totals['mv'][i] / h:>6.0f} {totals['mah'][i] / h:>6.0f}")
+
+    caps = np.array([d["capacity"] for d in devices])
+    rs = np.array([d["r_mohm"] for d in devices])
+    cap_med = np.nanmedian(caps) if np.any(~np.isnan(caps)) else np.nan
+    r_med = np.nanmedian(rs) if np.any(~np.isnan(rs)) else np.nan
+
+    print(f"\nDevices (fleet median: {cap_med:.0f} mAh, {r_med:.0f} mOhm)")
+    print(f"{'device':<20} {'records':>8} {'shifts':>6} {'mAh':>6} {'mOhm':>6} "
+          f"{'%/30d':>6}  flags")
+    for d in sorted(devices, key=lambda d: (np.nan_to_num(d["capacity"], nan=np.inf), d["name"])):
+        flags = []
+        if d["capacity"] < CAPACITY_OUTLIER * cap_med:
+            flags.append("low capacity")
+        if d["r_mohm"] > RESISTANCE_OUTLIER * r_med:
+            flags.append("high resistance")
+        if d["trend"] < TREND_ALERT_PCT:
+            flags.append("fading")
+        print(f"{d['name']:<20} {d['records']:>8} {d['shifts']:>6} {d['capacity']:>6.0f} "
+              f"{d['r_mohm']:>6.0f} {d['trend']:>6.1f}  {', '.join(flags)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Low-battery shutdown coordinator for Bodycam2
+=============================================
+Runs inside battery_monitor.py.  The monitor publishes battery level
+crossings on the telemetry bus ("battery_event" field); this thread
+blocks on that field's futex and, on a "shutdown" event:
+
+  1. publishes a final status to device/{id}/status (QoS 1, waits for
+     the broker ack), with an "offline" LWT on device/{id}/last-will in
+     case the link dies half way
+  2. stops the services in SHUTDOWN_ORDER with systemctl, so each one
+     closes its MQTT client and files cleanly (camera first, it is the
+     biggest load; the heartbeat and E-STOP last)
+  3. powers the device off
+
+Replaces test/low_battery_shutdown.py, which polled battery.dat from its
+own interpreter once a minute.
+"""
+
+import logging
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, "/app/bodycam2")
+
+from mqtt_lib import MQTTClient, load_config
+
+log = logging.getLogger("battery")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+EVENT_FIELD = "battery_event"
+
+SHUTDOWN_ORDER = [
+    "webrtc_streamer.service",
+    "camera_osd.service",
+    "camera_restart.service",
+    "radar.service",
+    "uv-monitor.service",
+    "gps.service",
+    "imu.service",
+    "cell_status.service",
+    "camera_status.service",
+    "estop.service",
+]
+STOP_TIMEOUT_S = 15          # Per service; systemd escalates to SIGKILL itself
+FINAL_STATUS_TIMEOUT_S = 20  # Connect + PUBACK over 4G, then give up
+FINAL_STATUS_GRACE_S = 5     # Extra wait for a connect stuck in a socket call
+POWEROFF_CMD = ["sudo", "-n", "shutdown", "-h", "now"]
+
+
+class ShutdownCoordinator(threading.Thread):
+    """Waits for a "shutdown" battery event and powers the device down.
+
+    Parameters
+    ----------
+    bus : TelemetryBus or None
+        Event source.  Without a bus the monitor calls :meth:`trigger`.
+    dry_run : bool
+        Log the systemctl / poweroff commands instead of running them.
+    """
+
+    def __init__(self, bus, dry_run=False):
+        super().__init__(daemon=True, name="shutdown")
+        self.bus = bus
+        self.dry_run = dry_run
+        self._triggered = threading.Event()
+        self._event = None
+
+    def trigger(self, level, runtime_s):
+        """Deliver an event directly (used when the bus is unavailable)."""
+        self._event = {"level": level, "runtime_s": runtime_s}
+        self._triggered.set()
+
+    def _wait_event(self):
+        seq = self.bus.seq(EVENT_FIELD) if self.bus is not None else 0
+        while True:
+            if self._triggered.is_set():
+                event, self._event = self._event, None
+                self._triggered.clear()
+                return event
+            if self.bus is None:
+                self._triggered.wait()
+                continue
+            if self.bus.wait(EVENT_FIELD, seq, timeout=1.0):
+                seq = self.bus.seq(EVENT_FIELD)
+                sample = self.bus.read(EVENT_FIELD)
+                if sample is not None:
+                    return sample.values
+
+    def run(self):
+        while True:
+            event = self._wait_event()
+            if event["level"] == "shutdown":
+                break
+        log.error(f"Low battery shutdown: runtime {event['runtime_s']}s")
+        t0 = time.monotonic()
+        try:
+            self._final_status(event)
+        except Exception as e:
+            log.error(f"Final status failed: {e}")
+        self._stop_services()
+        log.error(f"Powering off ({time.monotonic() - t0:.1f}s after event)")
+        self._run(POWEROFF_CMD)
+
+    def _final_status(self, event):
+        """Publish the final status, bounded by FINAL_STATUS_TIMEOUT_S.
+
+        MQTTClient.connect() retries until its exit event is set, so the
+        event is set by a timer; the publish also runs in a daemon thread
+        so the shutdown goes on even if a socket call hangs past that.
+        """
+        try:
+            config = load_config()
+        except SystemExit:
+            log.error("No MQTT config, skipping final status")
+            return
+        device_id = config["device_id"]
+        payload = {
+            "device_id": device_id,
+            "device_type": "camera",
+            "ts": int(time.time()),
+            "status": "shutdown",
+            "reason": "low_battery",
+            "runtime_s": event["runtime_s"],
+        }
+        give_up = threading.Event()
+        client = MQTTClient(
+            config, give_up,
+            lwt_topic=f"device/{device_id}/last-will",
+            lwt_payload={"device_id": device_id, "status": "offline"},
+        )
+        delivered = []
+        worker = threading.Thread(
+            target=lambda: delivered.append(client.publish_once(
+                f"device/{device_id}/status", payload, qos=1,
+                timeout=FINAL_STATUS_TIMEOUT_S)),
+            name="final-status", daemon=True)
+        timer = threading.Timer(FINAL_STATUS_TIMEOUT_S, give_up.set)
+        timer.daemon = True
+        timer.start()
+        worker.start()
+        worker.join(FINAL_STATUS_TIMEOUT_S + FINAL_STATUS_GRACE_S)
+        timer.cancel()
+        if not (delivered and delivered[0]):
+            log.error("Final status not delivered, shutting down anyway")
+
+    def _stop_services(self):
+        for unit in SHUTDOWN_ORDER:
+            self._run(["sudo", "-n", "systemctl", "stop", unit], timeout=STOP_TIMEOUT_S)
+
+    def _run(self, cmd, timeout=None):
+        if self.dry_run:
+            log.error(f"[dry run] {' '.join(cmd)}")
+            return
+        try:
+            subprocess.run(cmd, timeout=timeout, check=False)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            log.error(f"{' '.join(cmd)} failed: {e}")
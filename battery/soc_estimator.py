@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Battery state-of-charge estimator for Bodycam2
+==============================================
+Extended Kalman filter over the battery voltage time series.  There is
+no current sensor, so the load current comes from a model of what is
+running (camera streaming, LTE modem state) and the filter learns how
+much that load pulls the terminal voltage down.
+
+State:
+  soc   state of charge, 0..1
+  r     effective series resistance (ohm): voltage sag per amp of load
+
+Model:
+  predict   soc -= I * dt / capacity          (I from the load model)
+  measure   V    = OCV(soc) - I * r            (OCV from DISCHARGE_CURVE)
+
+Because the measurement is corrected for sag, the camera encoder or the
+modem switching on no longer makes the percentage jump, and the modelled
+current gives a time-to-empty prediction.
+
+Usage:
+    est = SocEstimator()
+    est.update(voltage, load_current_a, now)
+    est.percent(), est.runtime_s()
+"""
+
+import math
+import os
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+CAPACITY_MAH = 3000
+
+# Battery-side current per load state (A).  Estimates for the Pi, camera
+# and modem at nominal cell voltage; calibrate per build.
+LOAD_BASE_A = 0.35
+LOAD_STREAMING_A = 0.45
+LOAD_MODEM_A = {
+    "connected": 0.25,
+    "registered": 0.04,
+    "searching": 0.12,
+}
+LOAD_MODEM_DEFAULT_A = 0.04
+
+STREAMER_COMM = "pi-webrtc"   # /proc/<pid>/comm prefix of the streamer
+
+R_INITIAL = 0.15              # ohm, typical small LiPo + wiring
+R_MIN = 0.02
+R_MAX = 1.0
+
+VOLTAGE_NOISE_V = 0.015       # ADC + ripple, 1 sigma
+SOC_INITIAL_STD = 0.10
+R_INITIAL_STD = 0.10
+LOAD_MODEL_STD = 0.15         # relative error of the modelled current
+R_DRIFT_PER_HOUR = 0.02       # ohm, 1 sigma
+
+CURRENT_SMOOTHING_S = 600     # averaging window for the runtime prediction
+MIN_SLOPE_V = 0.05            # V per unit SoC; flat OCV regions carry little info
+
+# LiPo discharge curve: (voltage, percentage), open-circuit
+DISCHARGE_CURVE = [
+    (4.20, 100),
+    (4.15, 95),
+    (4.10, 90),
+    (4.05, 85),
+    (4.00, 80),
+    (3.95, 75),
+    (3.90, 70),
+    (3.85, 65),
+    (3.80, 60),
+    (3.75, 55),
+    (3.70, 50),
+    (3.65, 45),
+    (3.60, 40),
+    (3.55, 30),
+    (3.50, 20),
+    (3.45, 15),
+    (3.40, 10),
+    (3.30, 5),
+    (3.20, 2),
+    (3.00, 0),
+]
+
+
+# ---------------------------------------------------------------------------
+# Open-circuit voltage curve
+# ---------------------------------------------------------------------------
+
+def ocv(soc, curve=DISCHARGE_CURVE):
+    """Open-circuit voltage and its slope dV/dsoc at `soc` (0..1)."""
+    pct = soc * 100.0
+    if pct >= curve[0][1]:
+        v_hi, p_hi = curve[0]
+        v_lo, p_lo = curve[1]
+    elif pct <= curve[-1][1]:
+        v_hi, p_hi = curve[-2]
+        v_lo, p_lo = curve[-1]
+    else:
+        for i in range(len(curve) - 1):
+            v_hi, p_hi = curve[i]
+            v_lo, p_lo = curve[i + 1]
+            if p_lo <= pct <= p_hi:
+                break
+    slope = (v_hi - v_lo) / ((p_hi - p_lo) / 100.0)
+    return v_lo + (soc - p_lo / 100.0) * slope, slope
+
+
+def soc_from_ocv(voltage, curve=DISCHARGE_CURVE):
+    """Inverse of the discharge curve (0..1), linear interpolation."""
+    if voltage >= curve[0][0]:
+        return 1.0
+    if voltage <= curve[-1][0]:
+        return 0.0
+    for i in range(len(curve) - 1):
+        v_hi, p_hi = curve[i]
+        v_lo, p_lo = curve[i + 1]
+        if v_lo <= voltage <= v_hi:
+            frac = (voltage - v_lo) / (v_hi - v_lo)
+            return (p_lo + frac * (p_hi - p_lo)) / 100.0
+    return 0.0
+
+
+# ---------------------------------------------------------------------------
+# Load model
+# ---------------------------------------------------------------------------
+
+def streaming_active():
+    """True if the WebRTC streamer process (camera + encoder) is running."""
+    try:
+        pids = [p for p in os.listdir("/proc") if p.isdigit()]
+    except OSError:
+        return False
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/comm") as fh:
+                if fh.read().startswith(STREAMER_COMM):
+                    return True
+        except OSError:
+            continue
+    return False
+
+
+def load_current(streaming, modem_state):
+    """Modelled battery current (A) for the given load state.
+
+    `modem_state` is the ModemManager state string published by
+    cell/status.py, or None if unknown.
+    """
+    current = LOAD_BASE_A
+    if streaming:
+        current += LOAD_STREAMING_A
+    current += LOAD_MODEM_A.get(modem_state, LOAD_MODEM_DEFAULT_A)
+    return current
+
+
+# ---------------------------------------------------------------------------
+# Estimator
+# ---------------------------------------------------------------------------
+
+class SocEstimator:
+    """Two-state EKF (soc, series resistance) driven by modelled load."""
+
+    def __init__(self, capacity_mah=CAPACITY_MAH, curve=DISCHARGE_CURVE):
+        self.capacity_as = capacity_mah / 1000.0 * 3600.0
+        self.curve = curve
+        self.soc = None
+        self.r = R_INITIAL
+        self.p = None
+        self.current_avg = None
+        self.last_t = None
+
+    @property
+    def ready(self):
+        return self.soc is not None
+
+    def update(self, voltage, current, now):
+        """Fold in one voltage reading taken under `current` amps."""
+        if self.soc is None:
+            self.soc = soc_from_ocv(voltage + current * self.r, self.curve)
+            self.p = [[SOC_INITIAL_STD ** 2, 0.0], [0.0, R_INITIAL_STD ** 2]]
+            self.current_avg = current
+            self.last_t = now
+            return
+
+        dt = max(0.0, now - self.last_t)
+        self.last_t = now
+
+        # Predict: discharge by the modelled current
+        self.soc -= current * dt / self.capacity_as
+        q_soc = (LOAD_MODEL_STD * current * dt / self.capacity_as) ** 2
+        q_r = R_DRIFT_PER_HOUR ** 2 * dt / 3600.0
+        p = self.p
+        p[0][0] += q_soc
+        p[1][1] += q_r
+
+        # Update: terminal voltage = OCV(soc) - I * r
+        v_oc, slope = ocv(self.soc, self.curve)
+        h0 = max(slope, MIN_SLOPE_V)
+        h1 = -current
+        innovation = voltage - (v_oc - current * self.r)
+
+        ph0 = p[0][0] * h0 + p[0][1] * h1
+        ph1 = p[1][0] * h0 + p[1][1] * h1
+        s = h0 * ph0 + h1 * ph1 + VOLTAGE_NOISE_V ** 2
+        k0, k1 = ph0 / s, ph1 / s
+
+        self.soc = min(1.0, max(0.0, self.soc + k0 * innovation))
+        self.r = min(R_MAX, max(R_MIN, self.r + k1 * innovation))
+        self.p = [
+            [p[0][0] - k0 * ph0, p[0][1] - k0 * ph1],
+            [p[1][0] - k1 * ph0, p[1][1] - k1 * ph1],
+        ]
+
+        alpha = 1.0 - math.exp(-dt / CURRENT_SMOOTHING_S) if dt else 0.0
+        self.current_avg += alpha * (current - self.current_avg)
+
+    def percent(self):
+        """State of charge as an integer percentage, or None."""
+        if self.soc is None:
+            return None
+        return int(round(self.soc * 100))
+
+    def soc_std(self):
+        """One-sigma uncertainty of the SoC estimate (0..1), or None."""
+        if self.p is None:
+            return None
+        return math.sqrt(max(self.p[0][0], 0.0))
+
+    def runtime_s(self):
+        """Predicted seconds until empty at the recent average load."""
+        if self.soc is None or not self.current_avg:
+            return None
+        return int(self.soc * self.capacity_as / self.current_avg)
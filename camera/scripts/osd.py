@@ -3,8 +3,10 @@
 """
 OSD Telemetry Publisher for Bodycam
 ====================================
-Periodically reads signal and battery levels from /dev/shm/status.json
-and publishes them to MQTT for OSD overlay or dashboard display.
+Reads signal and battery levels from the shared telemetry bus (falling
+back to /dev/shm/status.json) and publishes them to MQTT for OSD overlay
+or dashboard display.  A message goes out when either value changes and
+at least every PUBLISH_INTERVAL_SEC.
 
 MQTT topic : device/{device_id}/osd
 Log file   : /tmp/osd.log
@@ -21,17 +23,21 @@ import threading
 import time
 
 # ---------------------------------------------------------------------------
-#  Path setup -- allow import of shared mqtt_lib module from /app/bodycam2/
+#  Path setup -- allow import of shared mqtt_lib / telemetry_lib modules
 # ---------------------------------------------------------------------------
 sys.path.insert(0, "/app/bodycam2")
 
 from mqtt_lib import MQTTClient, load_config
+from telemetry_lib import TelemetryBus
 
 # ---------------------------------------------------------------------------
 #  Configuration
 # ---------------------------------------------------------------------------
 STATUS_FILE = "/dev/shm/status.json"
 PUBLISH_INTERVAL_SEC = 10
+MIN_INTERVAL_SEC = 1        # Rate limit for change-triggered publishes
+BATTERY_MAX_AGE_SEC = 180   # battery_monitor publishes every 60 s
+CELL_MAX_AGE_SEC = 90       # cell/status.py publishes every 30 s
 LOG_FILE = "/tmp/osd.log"
 
 # ---------------------------------------------------------------------------
@@ -61,6 +67,19 @@ def _handle_signal(signum, _frame):
 # ---------------------------------------------------------------------------
 #  Status reading
 # ---------------------------------------------------------------------------
+def read_status_bus(bus):
+    """Read signal_level and battery_level from the telemetry bus.
+
+    Returns a dict with both values, or None if either field is missing
+    or stale.
+    """
+    battery = bus.read_fresh("battery", BATTERY_MAX_AGE_SEC)
+    cell = bus.read_fresh("cell", CELL_MAX_AGE_SEC)
+    if battery is None or cell is None:
+        return None
+    return {"signal": cell.values["signal_level"], "battery": battery.values["percent"]}
+
+
 def read_status():
     """Read signal_level and battery_level from the shared status file.
 
@@ -106,6 +125,12 @@ def main():
 
     client = MQTTClient(config, exit_event)
 
+    try:
+        bus = TelemetryBus()
+    except OSError as exc:
+        log.warning("Telemetry bus unavailable: %s (using %s)", exc, STATUS_FILE)
+        bus = None
+
     try:
         client.connect()
 
@@ -115,10 +140,16 @@ def main():
 
         log.info("OSD publisher started: interval=%ds, topic=%s", PUBLISH_INTERVAL_SEC, topic)
 
+        last_status = None
+        last_publish = 0.0
         while not exit_event.is_set():
-            status = read_status()
+            status = read_status_bus(bus) if bus is not None else None
+            if status is None:
+                status = read_status()
 
-            if status is not None:
+            now = time.monotonic()
+            if status is not None and (status != last_status
+                                       or now - last_publish >= PUBLISH_INTERVAL_SEC):
                 payload = {
                     "device_id": device_id,
                     "device_type": "camera",
@@ -126,14 +157,31 @@ def main():
                     "status": status,
                 }
                 client.publish(topic, payload, qos=0)
-
-            if exit_event.wait(timeout=PUBLISH_INTERVAL_SEC):
+                last_status = status
+                last_publish = now
+
+            if bus is None:
+                if exit_event.wait(timeout=PUBLISH_INTERVAL_SEC):
+                    break
+                continue
+
+            # Sleep until battery or cell data changes (bounded so the
+            # heartbeat and the shutdown check still run).
+            deadline = last_publish + PUBLISH_INTERVAL_SEC
+            battery_seq, cell_seq = bus.seq("battery"), bus.seq("cell")
+            while not exit_event.is_set() and time.monotonic() < deadline:
+                if (bus.wait("battery", battery_seq, timeout=MIN_INTERVAL_SEC)
+                        or bus.seq("cell") != cell_seq):
+                    break
+            if exit_event.wait(timeout=MIN_INTERVAL_SEC):
                 break
 
     except KeyboardInterrupt:
         log.info("Interrupted.")
     finally:
         client.close()
+        if bus is not None:
+            bus.close()
         log.info("OSD publisher shutdown complete.")
 
 
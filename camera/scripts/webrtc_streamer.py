@@ -1,28 +1,215 @@
 #!/app/bodycam2/venv/bin/python3
+"""
+WebRTC streamer launcher for Bodycam
+====================================
+Starts pi-webrtc with an fps / resolution profile chosen from the ambient
+light level (lux from uv_monitor.py on the telemetry bus).  In low light a
+lower frame rate lets the sensor expose longer, which cuts noise and with
+it encoder load and uplink bitrate.
 
-import sys
+Profiles come from the "light_profiles" config key, most restrictive
+first; the first profile whose "max_lux" is above the current level wins,
+and missing fps / width / height fall back to the top-level config.  A
+profile never raises the frame rate above the configured "fps":
+
+    "light_profiles": [
+        {"name": "dark",   "max_lux": 10,   "fps": 10},
+        {"name": "dim",    "max_lux": 200,  "fps": 15},
+        {"name": "bright"}
+    ]
+
+pi-webrtc has no runtime control channel, so a changed profile is only
+applied by restarting it.  That drops the live stream for a few seconds,
+so light adaptation is off unless "light_adaptive_restart" is true in the
+config; without it the stream runs at the configured fps / width / height.
+"""
+
+import logging
+import signal
 import subprocess
+import sys
+import threading
+import time
+
 sys.path.insert(0, "/app/bodycam2")
 from mqtt_lib import load_config
+from telemetry_lib import TelemetryBus
+
+# ---------------------------------------------------------------------------
+#  Configuration
+# ---------------------------------------------------------------------------
+STREAMER = "/app/bodycam2/camera/stream/pi-webrtc_1.2.2"
+LOG_FILE = "/tmp/webrtc_streamer.log"
+
+DEFAULT_PROFILES = [
+    {"name": "dark", "max_lux": 10, "fps": 10},
+    {"name": "dim", "max_lux": 200, "fps": 15},
+    {"name": "bright"},
+]
+LUX_MAX_AGE_SEC = 10        # Older lux -> uv_monitor not running, use "bright"
+LUX_WAIT_SEC = 5            # Wait this long for a first lux reading at start
+HYSTERESIS = 0.3            # Leave a profile only 30% beyond its boundary
+PROFILE_HOLD_SEC = 60       # New level must persist this long before a restart
+
+# ---------------------------------------------------------------------------
+#  Logging
+# ---------------------------------------------------------------------------
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        logging.FileHandler(LOG_FILE),
+        logging.StreamHandler(),
+    ],
+)
+log = logging.getLogger("webrtc_streamer")
+
+exit_event = threading.Event()
+
+
+def _handle_signal(signum, _frame):
+    log.info("Signal %d received, shutting down.", signum)
+    exit_event.set()
+
+
+# ---------------------------------------------------------------------------
+#  Light profiles
+# ---------------------------------------------------------------------------
+def load_profiles(config):
+    """Profiles with fps / width / height filled in from the config."""
+    profiles = []
+    for p in config.get("light_profiles") or DEFAULT_PROFILES:
+        profiles.append({
+            "name": p.get("name", "profile"),
+            "max_lux": p.get("max_lux"),
+            "fps": min(p.get("fps", config["fps"]), config["fps"]),
+            "width": p.get("width", config["width"]),
+            "height": p.get("height", config["height"]),
+        })
+    return profiles
+
+
+def select_profile(profiles, lux, current=None):
+    """Pick the profile for `lux`, sticking to `current` inside its band."""
+    if lux is None:
+        return profiles[-1]
+    if current is not None:
+        i = profiles.index(current)
+        lower = profiles[i - 1]["max_lux"] if i > 0 else None
+        upper = current["max_lux"]
+        if ((lower is None or lux >= lower * (1 - HYSTERESIS))
+                and (upper is None or lux < upper * (1 + HYSTERESIS))):
+            return current
+    for p in profiles:
+        if p["max_lux"] is None or lux < p["max_lux"]:
+            return p
+    return profiles[-1]
+
+
+def read_lux(bus):
+    if bus is None:
+        return None
+    sample = bus.read_fresh("uv", LUX_MAX_AGE_SEC)
+    return None if sample is None else sample.values["lux"]
+
+
+# ---------------------------------------------------------------------------
+#  Streamer process
+# ---------------------------------------------------------------------------
+def start_streamer(config, profile):
+    log.info("Starting stream: profile=%s %dx%d@%dfps", profile["name"],
+             profile["width"], profile["height"], profile["fps"])
+    return subprocess.Popen([
+        STREAMER,
+        "--camera=libcamera:0",
+        f"--fps={profile['fps']}",
+        f"--width={profile['width']}",
+        f"--height={profile['height']}",
+        "--hw-accel",
+        "--no-audio",
+        "--use-mqtt",
+        f"--mqtt-host={config['server']}",
+        f"--mqtt-port=8883",
+        f"--mqtt-username={config['username']}",
+        f"--mqtt-password={config['password']}",
+        f"--uid={config['device_id']}",
+        f"--stun-url={config['stun_url']}",
+        f"--turn-url={config['turn_url']}",
+        f"--turn-username={config['turn_username']}",
+        f"--turn-password={config['turn_password']}"])
+
+
+def stop_streamer(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+# ---------------------------------------------------------------------------
+#  Main
+# ---------------------------------------------------------------------------
+def main():
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    config = load_config()
+    adaptive = bool(config.get("light_adaptive_restart", False))
+
+    bus = None
+    if adaptive:
+        profiles = load_profiles(config)
+        try:
+            bus = TelemetryBus()
+        except OSError as exc:
+            log.warning("Telemetry bus unavailable: %s (fixed profile)", exc)
+
+        lux = read_lux(bus)
+        if lux is None and bus is not None:
+            bus.wait("uv", bus.seq("uv"), timeout=LUX_WAIT_SEC)
+            lux = read_lux(bus)
+        profile = select_profile(profiles, lux)
+        log.info("Ambient light %s lux, adaptive restart on",
+                 "unknown" if lux is None else f"{lux:.0f}")
+    else:
+        profile = {"name": "config", "fps": config["fps"],
+                   "width": config["width"], "height": config["height"]}
+        log.info("Adaptive restart off, using the configured profile")
+
+    proc = start_streamer(config, profile)
+    pending_since = None
+    try:
+        while not exit_event.is_set():
+            if proc.poll() is not None:
+                log.error("Streamer exited with code %d", proc.returncode)
+                sys.exit(proc.returncode or 1)
+
+            if not adaptive or bus is None:
+                exit_event.wait(timeout=1.0)
+                continue
+
+            # Wake on each lux update (1 Hz), or every second without one
+            bus.wait("uv", bus.seq("uv"), timeout=1.0)
+            wanted = select_profile(profiles, read_lux(bus), profile)
+            if wanted is profile:
+                pending_since = None
+                continue
+            now = time.monotonic()
+            if pending_since is None:
+                pending_since = now
+            elif now - pending_since >= PROFILE_HOLD_SEC:
+                log.info("Light profile %s -> %s, restarting stream",
+                         profile["name"], wanted["name"])
+                stop_streamer(proc)
+                profile = wanted
+                proc = start_streamer(config, profile)
+                pending_since = None
+    finally:
+        if proc.poll() is None:
+            stop_streamer(proc)
+
 
-config = load_config()
-
-
-subprocess.check_call([
-    "/app/bodycam2/camera/stream/pi-webrtc_1.2.2",
-    "--camera=libcamera:0",
-    f"--fps={config['fps']}",
-    f"--width={config['width']}",
-    f"--height={config['height']}",
-    "--hw-accel",
-    "--no-audio",
-    "--use-mqtt",
-    f"--mqtt-host={config['server']}",
-    f"--mqtt-port=8883",
-    f"--mqtt-username={config['username']}",
-    f"--mqtt-password={config['password']}",
-    f"--uid={config['device_id']}",
-    f"--stun-url={config['stun_url']}",
-    f"--turn-url={config['turn_url']}",
-    f"--turn-username={config['turn_username']}",
-    f"--turn-password={config['turn_password']}"]);
+if __name__ == "__main__":
+    main()
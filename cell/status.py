@@ -8,14 +8,26 @@ import sys
 import signal
 from gpiozero import LED
 
+# Allow import of shared telemetry_lib module from /app/bodycam2/
+sys.path.insert(0, "/app/bodycam2")
+
+from telemetry_lib import TelemetryBus
+
 # --- Configuration ---
 DESTINATION_URL = "https://your-api-endpoint.com/report"
 BATTERY_FILE = "/dev/shm/battery.dat"
 JSON_FILE = "/dev/shm/status.json"
 INTERVAL = 30  # Seconds
+BATTERY_MAX_AGE = 180  # Seconds; battery_monitor publishes every 60 s
 
 cell_led = LED(23)
 
+try:
+    telemetry = TelemetryBus()
+except OSError as e:
+    print(f"Telemetry bus unavailable: {e}")
+    telemetry = None
+
 def signal_handler(sig, frame):
     cell_led.off()
     sys.exit(0)
@@ -66,7 +78,12 @@ def get_modem_details(index):
         return None
 
 def get_battery_level():
-    """Get battery level from file written by the ADC"""
+    """Get battery level from the telemetry bus, or the file written by the ADC"""
+    if telemetry is not None:
+        sample = telemetry.read_fresh("battery", BATTERY_MAX_AGE)
+        if sample is not None:
+            return sample.values["percent"]
+
     try:
         with open(BATTERY_FILE, 'r') as file:
             content = file.read().strip()
@@ -110,9 +127,17 @@ def main():
             print(f"Procesing modem with index {index}")
 
             payload = get_modem_details(index)
+            if payload is None:
+                continue
             payload["battery_level"] = get_battery_level()
 
             write_to_file(payload)
+            if telemetry is not None:
+                telemetry.publish("cell",
+                                  signal_quality=payload["signal_quality"],
+                                  signal_level=int(payload["signal_level"]),
+                                  state=payload["status"] or "",
+                                  operator=payload["operator_name"] or "")
 
             print(f"Sending data to server: {payload}")
 
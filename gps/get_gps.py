@@ -4,6 +4,12 @@ import subprocess
 import serial
 import time
 import re
+import sys
+
+# Allow import of shared telemetry_lib module from /app/bodycam2/
+sys.path.insert(0, "/app/bodycam2")
+
+from telemetry_lib import TelemetryBus
 
 def get_mmcli_output(command):
     try:
@@ -73,6 +79,12 @@ def run_gps_service():
         print(f"Error connecting to AT port: {e}")
         return
 
+    try:
+        telemetry = TelemetryBus()
+    except OSError as e:
+        print(f"Telemetry bus unavailable: {e}")
+        telemetry = None
+
     # Main Loop
     while True:
         try:
@@ -92,6 +104,8 @@ def run_gps_service():
 
                             with open('/dev/shm/gps.dat', 'w') as f:
                                 f.write(f"{lat:.6f}, {lon:.6f}\n")
+                            if telemetry is not None:
+                                telemetry.publish("gps", lat=lat, lon=lon)
 
                             print(f"Updated GPS: {lat:.6f} [{parts[2]} {parts[3]}], {lon:.6f} [{parts[4]} {parts[5]}]")
                             break # Found our sentence, break to wait for next interval
@@ -0,0 +1,20 @@
+"""
+Bodycam2 shared I2C bus manager.
+
+Usage:
+    from i2c_lib import open_device, PRIORITY_HIGH
+"""
+
+from i2c_lib.bus import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    DeviceStats,
+    I2CBus,
+    I2CDevice,
+    get_bus,
+    i2c_msg,
+    open_device,
+)
+
+__all__ = ["DeviceStats", "I2CBus", "I2CDevice", "PRIORITY_HIGH", "PRIORITY_LOW",
+           "get_bus", "i2c_msg", "open_device"]
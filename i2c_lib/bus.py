@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Shared I2C bus manager for bodycam2 drivers.
+
+One persistent SMBus handle per bus and process, a lock per bus that
+also holds across processes, transaction priorities, and per-device
+latency statistics.  Drivers get an I2CDevice bound to their address
+and use it like an smbus2.SMBus without the address argument.
+
+Location : /app/bodycam2/i2c_lib/bus.py
+Locks    : /run/lock/bodycam-i2c-<bus>.lock (flock)
+
+Usage:
+    dev = open_device(1, 0x69, "icm42605", priority=PRIORITY_HIGH)
+    raw = dev.read_i2c_block_data(0x1F, 12)
+    with dev.transaction():               # several ops without interleaving
+        dev.write_byte_data(0x76, 0x00)
+        dev.write_byte_data(0x4E, 0x0F)
+    dev.summary()                         # one-line latency summary
+
+Locking
+-------
+The kernel already serialises single transfers on an adapter; the lock
+decides who goes next when several drivers want the bus, and keeps
+multi-op sequences (transaction()) together.  Every operation takes a
+threading lock (threads of one process) and an flock on the bus lock
+file (other processes).  Locks are per operation: a driver waiting for
+a conversion or a ready line never holds the bus.
+
+Priorities
+----------
+PRIORITY_HIGH  blocks on the lock: next in line as soon as it is free.
+PRIORITY_LOW   tries without blocking and backs off (0.5 ms, doubling to
+               4 ms) while the bus is held, so a high-priority driver
+               waiting on the flock gets it first.  After
+               LOW_PRIORITY_MAX_WAIT_SEC it blocks like a high-priority
+               caller so it cannot starve.
+
+A transfer in progress is never interrupted; a high-priority caller
+waits at most for one low-priority transaction.
+"""
+
+import contextlib
+import errno
+import fcntl
+import logging
+import os
+import threading
+import time
+
+from smbus2 import SMBus, i2c_msg
+
+log = logging.getLogger("bodycam.i2c")
+
+# ---------------------------------------------------------------------------
+#  Constants
+# ---------------------------------------------------------------------------
+LOCK_DIR = "/run/lock"
+LOCK_NAME = "bodycam-i2c-{bus}.lock"
+
+PRIORITY_LOW = 0
+PRIORITY_HIGH = 1
+
+LOW_PRIORITY_BACKOFF_SEC = 0.0005
+LOW_PRIORITY_BACKOFF_MAX_SEC = 0.004
+LOW_PRIORITY_MAX_WAIT_SEC = 0.25
+
+REOPEN_AFTER_FAILURES = 10       # Consecutive errors before the handle is reopened
+STATS_LATENCY_WINDOW = 1000      # Transfer latencies kept per device for percentiles
+
+_buses = {}
+_buses_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+#  Statistics
+# ---------------------------------------------------------------------------
+class DeviceStats:
+    """Transaction counters and latency percentiles for one device.
+
+    ``xfer`` is the time spent in the ioctl, ``wait`` the time spent
+    getting the bus lock (contention with other drivers).
+    """
+
+    def __init__(self):
+        self.ops = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.latencies = [0.0] * STATS_LATENCY_WINDOW
+        self.latency_idx = 0
+        self.latency_n = 0
+
+    def record(self, wait, xfer, ok):
+        self.ops += 1
+        if not ok:
+            self.errors += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.latencies[self.latency_idx] = xfer
+        self.latency_idx = (self.latency_idx + 1) % STATS_LATENCY_WINDOW
+        self.latency_n = min(self.latency_n + 1, STATS_LATENCY_WINDOW)
+
+    def report(self):
+        """Counters plus transfer percentiles and lock wait, in microseconds."""
+        xfer = {}
+        if self.latency_n:
+            ordered = sorted(self.latencies[:self.latency_n])
+            last = len(ordered) - 1
+
+            def pct(p):
+                return round(ordered[min(last, int(p / 100.0 * last + 0.5))] * 1e6)
+
+            xfer = {"p50": pct(50), "p95": pct(95), "p99": pct(99),
+                    "max": round(ordered[-1] * 1e6)}
+        return {
+            "ops": self.ops,
+            "errors": self.errors,
+            "xfer_us": xfer,
+            "wait_us": {
+                "mean": round(self.wait_total / self.ops * 1e6) if self.ops else 0,
+                "max": round(self.wait_max * 1e6),
+            },
+        }
+
+
+# ---------------------------------------------------------------------------
+#  Bus
+# ---------------------------------------------------------------------------
+class I2CBus:
+    """Persistent handle and lock for one I2C bus.
+
+    Use :func:`get_bus` (or :func:`open_device`) rather than creating
+    instances directly, so all drivers of a process share one handle.
+
+    Parameters
+    ----------
+    bus_num : int
+        Adapter number (/dev/i2c-<bus_num>).
+    lock_dir : str, optional
+        Directory for the cross-process lock file.
+    """
+
+    def __init__(self, bus_num, lock_dir=LOCK_DIR):
+        self.bus_num = bus_num
+        self._smbus = None
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._failures = 0
+        self.devices = {}
+
+        path = os.path.join(lock_dir, LOCK_NAME.format(bus=bus_num))
+        try:
+            # flock needs no write access, so any user can share the file
+            self._lock_fd = os.open(path, os.O_RDONLY | os.O_CREAT, 0o666)
+        except OSError as exc:
+            log.warning("I2C lock %s unavailable (%s), locking within this process only",
+                        path, exc)
+            self._lock_fd = None
+
+    def device(self, addr, name=None, priority=PRIORITY_LOW):
+        """Return the I2CDevice for `addr`, creating it on first use."""
+        dev = self.devices.get(addr)
+        if dev is None:
+            dev = I2CDevice(self, addr, name, priority)
+            self.devices[addr] = dev
+        return dev
+
+    # ------------------------------------------------------------------
+    #  Locking
+    # ------------------------------------------------------------------
+    def acquire(self, priority=PRIORITY_LOW):
+        """Take the bus lock; returns the seconds spent waiting."""
+        t0 = time.perf_counter()
+        if priority != PRIORITY_LOW or not self._try_acquire(t0):
+            self._acquire_blocking()
+        return time.perf_counter() - t0
+
+    def _acquire_blocking(self):
+        self._lock.acquire()
+        if self._depth == 0 and self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        self._depth += 1
+
+    def _try_acquire(self, t0):
+        backoff = LOW_PRIORITY_BACKOFF_SEC
+        while True:
+            if self._lock.acquire(blocking=False):
+                if self._depth or self._lock_fd is None or self._try_flock():
+                    self._depth += 1
+                    return True
+                self._lock.release()
+            if time.perf_counter() - t0 >= LOW_PRIORITY_MAX_WAIT_SEC:
+                return False
+            time.sleep(backoff)
+            backoff = min(backoff * 2, LOW_PRIORITY_BACKOFF_MAX_SEC)
+
+    def _try_flock(self):
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError as exc:
+            if exc.errno in (errno.EWOULDBLOCK, errno.EAGAIN):
+                return False
+            raise
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+    # ------------------------------------------------------------------
+    #  Transfers
+    # ------------------------------------------------------------------
+    def run(self, dev, op, *args):
+        """Run one smbus2 method under the lock and account it to `dev`."""
+        wait = self.acquire(dev.priority)
+        try:
+            if self._smbus is None:
+                self._smbus = SMBus(self.bus_num)
+            t0 = time.perf_counter()
+            try:
+                result = getattr(self._smbus, op)(*args)
+            except OSError:
+                dev.stats.record(wait, time.perf_counter() - t0, False)
+                self._failures += 1
+                if self._failures % REOPEN_AFTER_FAILURES == 0:
+                    log.warning("I2C bus %d: %d consecutive errors, reopening",
+                                self.bus_num, self._failures)
+                    self._close_handle()
+                raise
+            dev.stats.record(wait, time.perf_counter() - t0, True)
+            self._failures = 0
+            return result
+        finally:
+            self.release()
+
+    def _close_handle(self):
+        if self._smbus is not None:
+            try:
+                self._smbus.close()
+            except OSError:
+                pass
+            self._smbus = None
+
+    def close(self):
+        """Close the SMBus handle (reopened on the next transfer)."""
+        with self._lock:
+            self._close_handle()
+
+
+class I2CDevice:
+    """One slave address on an I2CBus, with smbus2-style register access."""
+
+    def __init__(self, bus, addr, name=None, priority=PRIORITY_LOW):
+        self.bus = bus
+        self.addr = addr
+        self.name = name or f"0x{addr:02X}"
+        self.priority = priority
+        self.stats = DeviceStats()
+
+    def read_byte_data(self, reg):
+        return self.bus.run(self, "read_byte_data", self.addr, reg)
+
+    def write_byte_data(self, reg, value):
+        self.bus.run(self, "write_byte_data", self.addr, reg, value)
+
+    def read_i2c_block_data(self, reg, length):
+        return self.bus.run(self, "read_i2c_block_data", self.addr, reg, length)
+
+    def write_i2c_block_data(self, reg, data):
+        self.bus.run(self, "write_i2c_block_data", self.addr, reg, data)
+
+    def i2c_rdwr(self, *msgs):
+        """Combined transfer; build messages with i2c_msg and self.addr."""
+        self.bus.run(self, "i2c_rdwr", *msgs)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Hold the bus for several operations (keep it short)."""
+        self.bus.acquire(self.priority)
+        try:
+            yield self
+        finally:
+            self.bus.release()
+
+    def summary(self):
+        """One-line statistics for logs."""
+        s = self.stats.report()
+        x = s["xfer_us"]
+        xfer = f"p50 {x['p50']} p99 {x['p99']} max {x['max']}us" if x else "-"
+        return (f"{self.name}@{self.bus.bus_num}: {s['ops']} ops, {s['errors']} errors, "
+                f"xfer {xfer}, lock wait mean {s['wait_us']['mean']} "
+                f"max {s['wait_us']['max']}us")
+
+
+# ---------------------------------------------------------------------------
+#  Process-wide access
+# ---------------------------------------------------------------------------
+def get_bus(bus_num):
+    """The shared I2CBus for `bus_num` in this process."""
+    with _buses_lock:
+        bus = _buses.get(bus_num)
+        if bus is None:
+            bus = I2CBus(bus_num)
+            _buses[bus_num] = bus
+        return bus
+
+
+def open_device(bus_num, addr, name=None, priority=PRIORITY_LOW):
+    """Shortcut for ``get_bus(bus_num).device(addr, name, priority)``."""
+    return get_bus(bus_num).device(addr, name, priority)
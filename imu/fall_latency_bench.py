@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Fall confirmation latency benchmark.
+
+Replays IMU traces through FallDetector in both confirmation modes
+("fixed" inactivity window and "sequential" early exit) and reports the
+time-to-alert distribution, measured from impact to publish.
+
+Trace format (as written by ``imu_fall_detect.py --record``):
+    CSV with header ``t,ax,ay,az,gx,gy,gz``  (seconds, g, deg/s)
+
+Usage:
+    python3 fall_latency_bench.py /tmp/traces/*.csv
+    python3 fall_latency_bench.py --synthetic 200
+"""
+
+import argparse
+import csv
+import logging
+import math
+import random
+import sys
+
+import imu_fall_detect as imu
+
+MODES = ("fixed", "sequential")
+
+
+# =========================================================================
+#  Replay
+# =========================================================================
+class ReplayDetector(imu.FallDetector):
+    """FallDetector that records alert latency instead of publishing."""
+
+    def __init__(self, confirm_mode):
+        super().__init__(None, None, None, "bench", "bench/fall",
+                         confirm_mode=confirm_mode)
+        self.alerts = []
+
+    def _publish_fall_event(self, severe=False):
+        self.alerts.append(self.last_sample_time - self.impact_time)
+
+
+def load_trace(path):
+    with open(path, newline="") as fh:
+        reader = csv.reader(fh)
+        next(reader, None)
+        return [tuple(float(v) for v in row) for row in reader if row]
+
+
+def replay(samples, confirm_mode):
+    detector = ReplayDetector(confirm_mode)
+    for t, ax, ay, az, gx, gy, gz in samples:
+        detector.process_sample(ax, ay, az, gx, gy, gz, now=t)
+    return detector.alerts
+
+
+# =========================================================================
+#  Synthetic traces
+# =========================================================================
+def _rotate(v, k, theta):
+    """Rodrigues rotation of vector v about unit axis k by theta (rad)."""
+    c, s = math.cos(theta), math.sin(theta)
+    kx, ky, kz = k
+    vx, vy, vz = v
+    dot = kx * vx + ky * vy + kz * vz
+    cx, cy, cz = ky * vz - kz * vy, kz * vx - kx * vz, kx * vy - ky * vx
+    return (
+        vx * c + cx * s + kx * dot * (1 - c),
+        vy * c + cy * s + ky * dot * (1 - c),
+        vz * c + cz * s + kz * dot * (1 - c),
+    )
+
+
+def synthetic_trace(rng, fall=True):
+    """Standing -> free-fall with rotation -> impact -> lying (or upright)."""
+    dt = imu.SAMPLE_PERIOD_SEC
+    t = 1000.0      # clear of the detector's MIN_EVENT_INTERVAL debounce
+    out = []
+
+    def emit(acc, gyr):
+        nonlocal t
+        t += dt
+        out.append((
+            t,
+            acc[0] + rng.gauss(0, 0.01), acc[1] + rng.gauss(0, 0.01),
+            acc[2] + rng.gauss(0, 0.01),
+            gyr[0] + rng.gauss(0, 1.0), gyr[1] + rng.gauss(0, 1.0),
+            gyr[2] + rng.gauss(0, 1.0),
+        ))
+
+    up = (0.0, 0.0, 1.0)
+    for _ in range(300):
+        emit(up, (0.0, 0.0, 0.0))
+
+    heading = rng.uniform(0, 2 * math.pi)
+    axis = (math.cos(heading), math.sin(heading), 0.0)
+    angle = math.radians(rng.uniform(60, 100) if fall else rng.uniform(0, 15))
+    n_fall = int(rng.uniform(0.25, 0.5) / dt)
+    rate = math.degrees(angle) / (n_fall * dt)
+    for _ in range(n_fall):
+        emit((0.0, 0.0, rng.uniform(0.1, 0.3)),
+             (axis[0] * rate, axis[1] * rate, 0.0))
+
+    grav = _rotate(up, axis, -angle)
+    peak = rng.uniform(3.5, 6.0)
+    for _ in range(3):
+        emit(tuple(peak * g for g in grav), (0.0, 0.0, 0.0))
+
+    # Post-impact: occasional limb movement, otherwise still
+    moves = rng.random() < 0.3
+    for i in range(400):
+        wiggle = 40.0 if moves and (i // 25) % 4 == 0 else 0.0
+        emit(grav, (wiggle, 0.0, 0.0))
+    return out
+
+
+# =========================================================================
+#  Reporting
+# =========================================================================
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def report(label, falls, latencies, n_traces, false_alerts=None):
+    print(f"  {label:<10} alerts={falls}/{n_traces}", end="")
+    if false_alerts is not None:
+        print(f"  false_alerts={false_alerts}", end="")
+    if latencies:
+        ms = [v * 1000 for v in latencies]
+        print(f"  latency ms: min={min(ms):.0f} p50={percentile(ms, 50):.0f} "
+              f"p90={percentile(ms, 90):.0f} max={max(ms):.0f}")
+    else:
+        print("  latency ms: n/a")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fall confirmation latency benchmark")
+    parser.add_argument("traces", nargs="*", help="Recorded CSV traces")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N",
+                        help="Also generate N synthetic falls and N non-falls")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if not args.traces and not args.synthetic:
+        parser.error("give trace files or --synthetic N")
+
+    logging.getLogger("imu").setLevel(logging.WARNING)
+
+    if args.traces:
+        traces = [load_trace(p) for p in args.traces]
+        print(f"Recorded traces: {len(traces)}")
+        for mode in MODES:
+            latencies = []
+            for samples in traces:
+                latencies.extend(replay(samples, mode))
+            report(mode, len(latencies), latencies, len(traces))
+
+    if args.synthetic:
+        rng = random.Random(args.seed)
+        falls = [synthetic_trace(rng, fall=True) for _ in range(args.synthetic)]
+        stumbles = [synthetic_trace(rng, fall=False) for _ in range(args.synthetic)]
+        print(f"Synthetic traces: {len(falls)} falls, {len(stumbles)} non-falls")
+        for mode in MODES:
+            latencies = []
+            for samples in falls:
+                latencies.extend(replay(samples, mode))
+            false_alerts = sum(len(replay(samples, mode)) for samples in stumbles)
+            report(mode, len(latencies), latencies, len(falls), false_alerts)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
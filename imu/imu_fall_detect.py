@@ -11,6 +11,28 @@ Algorithm: 3-phase threshold-based fall detection (research-backed)
     Phase 1: Free-fall detection (accel magnitude < 0.4g)
     Phase 2: Impact detection (accel > 3.0g or gyro > 300 deg/s)
     Phase 3: Inactivity + posture change confirmation
+             (sequential test: alerts as soon as the evidence is conclusive,
+             falls back to the full inactivity window otherwise)
+
+Pre-impact: a 0.4 s sliding window (rolling sums, O(1) per sample)
+estimates vertical velocity and emits a provisional ``fall_imminent``
+event on a fast lane before the confirmed ``fall`` event.
+
+Orientation: complementary gyro/accel filter updated at full ODR.  Posture
+change is the tilt angle between the pre-fall and post-impact gravity
+directions; inactivity uses the per-sample quaternion rotation rate.
+
+Calibration: gyro bias, accel scale and the resting gravity direction are
+re-estimated whenever the wearer is stationary and cached in
+/app/bodycam2/conf/imu_calibration.json.  A restart applies the cached
+gyro bias and accel scale; the orientation is seeded from the first live
+sample, since the device may boot in a different posture than it was
+calibrated in.
+
+Telemetry: loop health (sample rate, jitter histogram, missed samples,
+I2C read latency percentiles, bus lock wait, per-state dwell) in
+/dev/shm/imu_stats.json, optionally also on MQTT device/{id}/imu_health
+(--health-mqtt).
 
 Log file: /tmp/imu.log
 
@@ -18,9 +40,12 @@ References:
     - Analog Devices AN-1023: Detecting Human Falls with a 3-Axis Accelerometer
     - Kangas et al: Evaluation of Accelerometer-Based Fall Detection Algorithms
     - PMC6412321: Pre-Impact Fall Detection Using IMU Sensors
+    - Mahony et al: Nonlinear Complementary Filters on the Special
+      Orthogonal Group (2008)
 """
 
 import argparse
+import json
 import logging
 import math
 import os
@@ -33,14 +58,14 @@ import time
 import traceback
 from datetime import timedelta
 
-import smbus2
-
 # ---------------------------------------------------------------------------
 #  Path setup -- allow import of shared mqtt_lib module from /app/bodycam2/
 # ---------------------------------------------------------------------------
 sys.path.insert(0, "/app/bodycam2")
 
+from i2c_lib import PRIORITY_HIGH, open_device
 from mqtt_lib import MQTTClient, load_config
+from telemetry_lib import TelemetryBus
 
 # ---------------------------------------------------------------------------
 #  Logging
@@ -90,6 +115,7 @@ GYRO_FS_SEL = 2
 GYRO_SCALE = 65.5
 
 SENSOR_ODR = 0x08
+SAMPLE_PERIOD_SEC = 0.01        # 100 Hz (SENSOR_ODR = 0x08)
 
 # ---------------------------------------------------------------------------
 #  GPIO
@@ -107,14 +133,64 @@ INACTIVITY_GYRO_THRESHOLD = 20.0
 INACTIVITY_PERIOD_SEC = 2.0
 INACTIVITY_ALLOWED_MOVEMENT_FRAC = 0.2
 
-POSTURE_CHANGE_THRESHOLD_G = 0.4
+POSTURE_CHANGE_THRESHOLD_DEG = 25.0
 
 IMPACT_STABILIZATION_DELAY = 0.2
 FREE_FALL_IMPACT_WINDOW = 1.0
 MIN_EVENT_INTERVAL = 5.0
 
-GRAVITY_EMA_ALPHA = 0.02
-GRAVITY_MIN_SAMPLES = 50
+# ---------------------------------------------------------------------------
+#  Pre-impact prediction (sliding window)
+# ---------------------------------------------------------------------------
+PRE_IMPACT_WINDOW_SAMPLES = 40  # 0.4 s at 100 Hz
+PRE_IMPACT_VELOCITY_MS = 1.3    # downward vertical velocity over the window
+PRE_IMPACT_MEAN_ACCEL_G = 0.8   # mean |a| over the window must be below this
+PRE_IMPACT_HOLDOFF_SEC = 5.0    # min time between fall_imminent events
+PRE_IMPACT_RESYNC_SAMPLES = 6000  # re-sum the window to cancel float drift
+STANDARD_GRAVITY = 9.80665
+
+# ---------------------------------------------------------------------------
+#  Sequential confirmation (Wald SPRT over posture-change observations)
+# ---------------------------------------------------------------------------
+CONFIRM_MODE = "sequential"     # "sequential" (early exit) or "fixed"
+SPRT_STEP_SEC = 0.1             # one observation per step; samples are correlated
+SPRT_P_FALL = 0.9               # P(posture changed | real fall)
+SPRT_P_NO_FALL = 0.2            # P(posture changed | recovered)
+SPRT_ALPHA = 0.01               # accepted false-alert rate
+SPRT_BETA = 0.05                # accepted missed-fall rate
+
+# Steps are not independent: the tilt comes from the orientation filter,
+# which at rest tracks gravity with a 1 / ORIENT_KP_REST time constant,
+# and a settled posture barely changes.  Count one independent observation
+# per SPRT_CORRELATION_SEC by scaling each step's log-likelihood ratio.
+SPRT_CORRELATION_SEC = 0.5
+SPRT_STEP_WEIGHT = min(1.0, SPRT_STEP_SEC / SPRT_CORRELATION_SEC)
+
+SPRT_LLR_CHANGED = SPRT_STEP_WEIGHT * math.log(SPRT_P_FALL / SPRT_P_NO_FALL)
+SPRT_LLR_UNCHANGED = SPRT_STEP_WEIGHT * math.log((1 - SPRT_P_FALL) / (1 - SPRT_P_NO_FALL))
+SPRT_UPPER_BOUND = math.log((1 - SPRT_BETA) / SPRT_ALPHA)
+SPRT_LOWER_BOUND = math.log(SPRT_BETA / (1 - SPRT_ALPHA))
+
+# ---------------------------------------------------------------------------
+#  Orientation Filter (complementary, IMU-only)
+# ---------------------------------------------------------------------------
+ORIENT_KP = 1.0                 # 1/s, accel correction gain while moving
+ORIENT_KP_REST = 2.0            # 1/s, faster gravity re-alignment at rest
+ORIENT_ACCEL_GATE_G = 0.3       # skip accel correction if ||a| - 1g| exceeds this
+ORIENT_REST_ACCEL_G = 0.1       # ||a| - 1g| below this counts as at rest
+ORIENT_REST_GYRO = 10.0         # deg/s, gyro magnitude below this counts as at rest
+
+# ---------------------------------------------------------------------------
+#  Calibration (stationary bias / gravity estimate, persisted across restarts)
+# ---------------------------------------------------------------------------
+CALIB_PATH = "/app/bodycam2/conf/imu_calibration.json"
+CALIB_WINDOW_SAMPLES = 200      # 2 s of uninterrupted stillness per estimate
+CALIB_GYRO_SPREAD = 3.0         # deg/s, max-min per axis within the window
+CALIB_ACCEL_SPREAD = 0.03       # g, max-min per axis within the window
+CALIB_BLEND = 0.2               # weight of a new estimate vs. the cached one
+CALIB_MAX_GYRO_BIAS = 10.0      # deg/s per axis, reject anything larger
+CALIB_MAX_SCALE_ERROR = 0.1     # reject accel scale outside 1 +/- this
+CALIB_SAVE_INTERVAL_SEC = 600.0 # limit SD card writes
 
 # ---------------------------------------------------------------------------
 #  Operational
@@ -125,6 +201,23 @@ WATCHDOG_INTERVAL_SEC = 5.0
 INTERRUPT_TIMEOUT_SEC = 0.5
 SENSOR_HEALTH_CHECK_SEC = 10.0
 
+# ---------------------------------------------------------------------------
+#  Loop Telemetry
+# ---------------------------------------------------------------------------
+STATS_FILE = "/dev/shm/imu_stats.json"
+STATS_INTERVAL_SEC = 10.0
+HEALTH_MQTT_INTERVAL_SEC = 60.0
+STATS_LATENCY_WINDOW = 1000     # I2C read latencies kept for percentiles
+JITTER_BINS_MS = (0.5, 1.0, 2.0, 5.0, 10.0)   # |interval - period| upper edges
+
+# ---------------------------------------------------------------------------
+#  Motion Channel (read by the radar scheduler)
+# ---------------------------------------------------------------------------
+MOTION_FILE = "/dev/shm/imu_motion.json"
+MOTION_INTERVAL_SEC = 0.5
+MOTION_ACCEL_G = 0.05           # RMS |a| deviation from 1 g counted as moving
+MOTION_GYRO_DPS = 20.0          # mean rotation rate counted as moving
+
 exit_event = threading.Event()
 
 
@@ -152,21 +245,279 @@ def magnitude(x, y, z):
     return math.sqrt(x * x + y * y + z * z)
 
 
+def tilt_angle_deg(u, v):
+    """Angle between two unit vectors in degrees."""
+    dot = u[0] * v[0] + u[1] * v[1] + u[2] * v[2]
+    return math.degrees(math.acos(max(-1.0, min(1.0, dot))))
+
+
+# =========================================================================
+#  Orientation Filter
+# =========================================================================
+class OrientationFilter:
+    """Streaming complementary (Mahony) orientation estimator, gyro + accel.
+
+    The quaternion ``q = (w, x, y, z)`` rotates the sensor frame into an
+    earth frame whose +Z axis points up.  Yaw is unobservable without a
+    magnetometer and drifts, so posture decisions use :meth:`gravity`
+    (tilt only) rather than the full rotation.
+
+    The accel correction is proportional to the tilt error, so it vanishes
+    once the estimate has converged and :attr:`last_rate` then reflects real
+    rotation only.  Correction is skipped while ``|a|`` is far from 1g
+    (free-fall, impact), so the estimate is carried through by the gyro.
+    """
+
+    def __init__(self, kp=ORIENT_KP, kp_rest=ORIENT_KP_REST):
+        self.kp = kp
+        self.kp_rest = kp_rest
+        self.q = (1.0, 0.0, 0.0, 0.0)
+        self.initialized = False
+        self.last_rate = 0.0
+
+    def reset_from_accel(self, ax, ay, az):
+        """Align the estimate with a single accel reading (yaw = 0)."""
+        roll = math.atan2(ay, az)
+        pitch = math.atan2(-ax, math.sqrt(ay * ay + az * az))
+        cr, sr = math.cos(roll / 2), math.sin(roll / 2)
+        cp, sp = math.cos(pitch / 2), math.sin(pitch / 2)
+        self.q = (cr * cp, sr * cp, cr * sp, -sr * sp)
+        self.initialized = True
+        self.last_rate = 0.0
+
+    def update(self, ax, ay, az, gx, gy, gz, dt):
+        """Advance one sample.  Accel in g, gyro in deg/s, dt in seconds."""
+        if not self.initialized:
+            self.reset_from_accel(ax, ay, az)
+            return
+
+        q0, q1, q2, q3 = self.q
+        g_mag = magnitude(gx, gy, gz)
+        gx, gy, gz = math.radians(gx), math.radians(gy), math.radians(gz)
+
+        a_mag = magnitude(ax, ay, az)
+        a_err = abs(a_mag - 1.0)
+        if a_err <= ORIENT_ACCEL_GATE_G and a_mag > 0.0:
+            at_rest = a_err <= ORIENT_REST_ACCEL_G and g_mag <= ORIENT_REST_GYRO
+            kp = self.kp_rest if at_rest else self.kp
+
+            ax, ay, az = ax / a_mag, ay / a_mag, az / a_mag
+
+            # Estimated gravity direction; error is measured x estimated
+            vx = 2.0 * (q1 * q3 - q0 * q2)
+            vy = 2.0 * (q0 * q1 + q2 * q3)
+            vz = q0 * q0 - q1 * q1 - q2 * q2 + q3 * q3
+            gx += kp * (ay * vz - az * vy)
+            gy += kp * (az * vx - ax * vz)
+            gz += kp * (ax * vy - ay * vx)
+
+        h = 0.5 * dt
+        n0 = q0 + (-q1 * gx - q2 * gy - q3 * gz) * h
+        n1 = q1 + (q0 * gx + q2 * gz - q3 * gy) * h
+        n2 = q2 + (q0 * gy - q1 * gz + q3 * gx) * h
+        n3 = q3 + (q0 * gz + q1 * gy - q2 * gx) * h
+        norm = math.sqrt(n0 * n0 + n1 * n1 + n2 * n2 + n3 * n3)
+        n0, n1, n2, n3 = n0 / norm, n1 / norm, n2 / norm, n3 / norm
+
+        # Rotation between consecutive estimates, as an angular rate (deg/s)
+        dot = abs(q0 * n0 + q1 * n1 + q2 * n2 + q3 * n3)
+        self.last_rate = math.degrees(2.0 * math.acos(min(1.0, dot))) / dt
+        self.q = (n0, n1, n2, n3)
+
+    def gravity(self):
+        """Unit gravity ("up") direction in the sensor frame."""
+        q0, q1, q2, q3 = self.q
+        return (
+            2.0 * (q1 * q3 - q0 * q2),
+            2.0 * (q0 * q1 + q2 * q3),
+            q0 * q0 - q1 * q1 - q2 * q2 + q3 * q3,
+        )
+
+
+# =========================================================================
+#  Calibration
+# =========================================================================
+class ImuCalibration:
+    """Gyro bias, accel scale and resting gravity direction.
+
+    Persisted as a small JSON file so a restarted service starts with a
+    corrected sensor.  The gravity direction is kept for reference only;
+    orientation is seeded from the first live accel sample.
+    """
+
+    def __init__(self, gyro_bias=(0.0, 0.0, 0.0), accel_scale=1.0, gravity=None,
+                 ts=0):
+        self.gyro_bias = tuple(gyro_bias)
+        self.accel_scale = accel_scale
+        self.gravity = tuple(gravity) if gravity else None
+        self.ts = ts
+
+    @classmethod
+    def load(cls, path):
+        """Return the cached calibration, or None if missing or invalid."""
+        try:
+            with open(path, "r") as fh:
+                data = json.load(fh)
+            calib = cls(data["gyro_bias"], float(data["accel_scale"]),
+                        data.get("gravity"), data.get("ts", 0))
+        except FileNotFoundError:
+            log.info("No cached calibration at %s", path)
+            return None
+        except Exception as e:
+            log.warning("Ignoring unreadable calibration %s: %s", path, e)
+            return None
+        if not calib.is_plausible():
+            log.warning("Ignoring implausible calibration in %s", path)
+            return None
+        return calib
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        data = {
+            "gyro_bias": [round(v, 4) for v in self.gyro_bias],
+            "accel_scale": round(self.accel_scale, 5),
+            "gravity": [round(v, 5) for v in self.gravity] if self.gravity else None,
+            "ts": int(self.ts),
+        }
+        try:
+            with open(tmp, "w") as fh:
+                json.dump(data, fh)
+            os.replace(tmp, path)
+        except OSError as e:
+            log.warning("Calibration save failed: %s", e)
+            return False
+        return True
+
+    def is_plausible(self):
+        return (
+            all(abs(b) <= CALIB_MAX_GYRO_BIAS for b in self.gyro_bias)
+            and abs(self.accel_scale - 1.0) <= CALIB_MAX_SCALE_ERROR
+        )
+
+
+class StationaryCalibrator:
+    """Collects windows of stillness and reports their mean readings.
+
+    The window restarts whenever any axis spreads beyond the stillness
+    limits, so only CALIB_WINDOW_SAMPLES consecutive quiet samples produce
+    an estimate.  Inputs are the already-corrected sensor values, so the
+    result is a residual on top of the current calibration.
+    """
+
+    def __init__(self, size=CALIB_WINDOW_SAMPLES):
+        self.size = size
+        self._reset()
+
+    def _reset(self):
+        self.n = 0
+        self.sums = [0.0] * 6
+        self.lo = [math.inf] * 6
+        self.hi = [-math.inf] * 6
+
+    def update(self, sample):
+        """Push one (ax, ay, az, gx, gy, gz); return the window means
+        when a full stationary window completes, else None."""
+        sums, lo, hi = self.sums, self.lo, self.hi
+        for i, v in enumerate(sample):
+            sums[i] += v
+            if v < lo[i]:
+                lo[i] = v
+            if v > hi[i]:
+                hi[i] = v
+        self.n += 1
+
+        if (
+            max(hi[i] - lo[i] for i in range(3)) > CALIB_ACCEL_SPREAD
+            or max(hi[i] - lo[i] for i in range(3, 6)) > CALIB_GYRO_SPREAD
+        ):
+            self._reset()
+            return None
+
+        if self.n < self.size:
+            return None
+        means = tuple(v / self.n for v in sums)
+        self._reset()
+        return means
+
+
+# =========================================================================
+#  Pre-impact Detector
+# =========================================================================
+class PreImpactDetector:
+    """Sliding-window pre-impact fall predictor.
+
+    Keeps rolling sums over the last PRE_IMPACT_WINDOW_SAMPLES samples, so
+    every update is O(1) regardless of window length:
+
+      - vertical velocity: integral of (a . up - 1g) over the window
+      - mean |a|
+
+    A fall is predicted when the body is sinking faster than
+    PRE_IMPACT_VELOCITY_MS while mostly unloaded (low mean |a|).
+    """
+
+    def __init__(self, size=PRE_IMPACT_WINDOW_SAMPLES):
+        self.size = size
+        self.vert = [0.0] * size
+        self.amag = [1.0] * size
+        self.idx = 0
+        self.count = 0
+        self.sum_vert = 0.0
+        self.sum_amag = float(size)
+        self.updates = 0
+        self.velocity = 0.0
+
+    def update(self, a_vert, a_mag, dt):
+        """Push one sample; return True if a fall looks imminent."""
+        i = self.idx
+        dv = (a_vert - 1.0) * STANDARD_GRAVITY * dt
+        self.sum_vert += dv - self.vert[i]
+        self.sum_amag += a_mag - self.amag[i]
+        self.vert[i] = dv
+        self.amag[i] = a_mag
+        self.idx = (i + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+        self.updates += 1
+        if self.updates % PRE_IMPACT_RESYNC_SAMPLES == 0:
+            self.sum_vert = sum(self.vert)
+            self.sum_amag = sum(self.amag)
+
+        self.velocity = self.sum_vert
+        if self.count < self.size:
+            return False
+        return (
+            -self.velocity >= PRE_IMPACT_VELOCITY_MS
+            and self.sum_amag / self.size < PRE_IMPACT_MEAN_ACCEL_G
+        )
+
+
 # =========================================================================
 #  ICM-42605 Driver
 # =========================================================================
 class ICM42605:
-    """Low-level driver for the ICM-42605 6-axis IMU over I2C."""
+    """Low-level driver for the ICM-42605 6-axis IMU over I2C.
+
+    `dev` is an i2c_lib device; the IMU runs at high priority so its
+    100 Hz reads go ahead of the radar on the shared bus 1.
+    """
+
+    def __init__(self, dev):
+        self.dev = dev
+        self.gyro_bias = (0.0, 0.0, 0.0)
+        self.accel_scale = 1.0
 
-    def __init__(self, bus, addr=ICM42605_ADDR):
-        self.bus = bus
-        self.addr = addr
+    def set_calibration(self, calib):
+        """Apply gyro bias / accel scale corrections to every read."""
+        self.gyro_bias = calib.gyro_bias
+        self.accel_scale = calib.accel_scale
 
     def _r(self, reg):
-        return self.bus.read_byte_data(self.addr, reg)
+        return self.dev.read_byte_data(reg)
 
     def _w(self, reg, val):
-        self.bus.write_byte_data(self.addr, reg, val)
+        self.dev.write_byte_data(reg, val)
 
     def verify_who_am_i(self):
         wai = self._r(WHO_AM_I_REG)
@@ -216,17 +567,19 @@ class ICM42605:
 
     def read_sensor_data(self):
         """Burst-read accel + gyro (12 bytes, atomic).
-        Returns (ax, ay, az, gx, gy, gz) in g and deg/s.
+        Returns (ax, ay, az, gx, gy, gz) in g and deg/s, calibrated.
         """
-        raw = self.bus.read_i2c_block_data(self.addr, ACCEL_DATA_X1, 12)
+        raw = self.dev.read_i2c_block_data(ACCEL_DATA_X1, 12)
         ax_r, ay_r, az_r, gx_r, gy_r, gz_r = struct.unpack(">hhhhhh", bytes(raw))
+        a_k = self.accel_scale / ACCEL_SCALE
+        bx, by, bz = self.gyro_bias
         return (
-            ax_r / ACCEL_SCALE,
-            ay_r / ACCEL_SCALE,
-            az_r / ACCEL_SCALE,
-            gx_r / GYRO_SCALE,
-            gy_r / GYRO_SCALE,
-            gz_r / GYRO_SCALE,
+            ax_r * a_k,
+            ay_r * a_k,
+            az_r * a_k,
+            gx_r / GYRO_SCALE - bx,
+            gy_r / GYRO_SCALE - by,
+            gz_r / GYRO_SCALE - bz,
         )
 
     def is_healthy(self):
@@ -257,6 +610,159 @@ def setup_gpio_interrupt(gpio_pin):
         return None
 
 
+# =========================================================================
+#  Loop Telemetry
+# =========================================================================
+class LoopStats:
+    """Throughput and timing instrumentation for the sample loop.
+
+    Counters are cumulative since start except ``rate_hz``, which covers
+    the last report interval.  Reports are written atomically to
+    STATS_FILE so other processes can read them without locking.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.started = time.monotonic()
+        self.samples = 0
+        self.missed = 0
+        self.int_timeouts = 0
+        self.last_sample = None
+        self.interval_max = 0.0
+        self.jitter_hist = [0] * (len(JITTER_BINS_MS) + 1)
+        self.latencies = [0.0] * STATS_LATENCY_WINDOW
+        self.latency_idx = 0
+        self.latency_n = 0
+        self.dwell = {}
+        self.window_start = self.started
+        self.window_samples = 0
+
+    def record_sample(self, now, read_latency, state, queued=1):
+        """Account one sample read at monotonic time *now*.
+
+        *queued* is the number of DATA_READY edges seen since the last
+        read; anything above one means samples were overwritten.
+        """
+        self.samples += 1
+        self.window_samples += 1
+        self.missed += max(0, queued - 1)
+
+        self.latencies[self.latency_idx] = read_latency
+        self.latency_idx = (self.latency_idx + 1) % STATS_LATENCY_WINDOW
+        self.latency_n = min(self.latency_n + 1, STATS_LATENCY_WINDOW)
+
+        if self.last_sample is not None:
+            dt = now - self.last_sample
+            self.dwell[state] = self.dwell.get(state, 0.0) + dt
+            self.interval_max = max(self.interval_max, dt)
+            if queued <= 1 and dt > 1.5 * SAMPLE_PERIOD_SEC:
+                self.missed += int(round(dt / SAMPLE_PERIOD_SEC)) - 1
+            dev_ms = abs(dt - SAMPLE_PERIOD_SEC) * 1000.0
+            for i, edge in enumerate(JITTER_BINS_MS):
+                if dev_ms < edge:
+                    self.jitter_hist[i] += 1
+                    break
+            else:
+                self.jitter_hist[-1] += 1
+        self.last_sample = now
+
+    def record_int_timeout(self):
+        self.int_timeouts += 1
+
+    def _latency_percentiles(self):
+        if not self.latency_n:
+            return {}
+        ordered = sorted(self.latencies[:self.latency_n])
+        last = len(ordered) - 1
+
+        def pct(p):
+            return round(ordered[min(last, int(p / 100.0 * last + 0.5))] * 1e6)
+
+        return {"p50": pct(50), "p95": pct(95), "p99": pct(99),
+                "max": round(ordered[-1] * 1e6)}
+
+    def report(self, now, sample_count, i2c_errors):
+        elapsed = now - self.window_start
+        rate = self.window_samples / elapsed if elapsed > 0 else 0.0
+        self.window_start = now
+        self.window_samples = 0
+
+        labels = [f"<{e:g}" for e in JITTER_BINS_MS] + [f">={JITTER_BINS_MS[-1]:g}"]
+        return {
+            "ts": int(time.time()),
+            "uptime_s": int(now - self.started),
+            "mode": self.mode,
+            "samples": sample_count,
+            "rate_hz": round(rate, 1),
+            "missed_samples": self.missed,
+            "int_timeouts": self.int_timeouts,
+            "i2c_errors": i2c_errors,
+            "interval_max_ms": round(self.interval_max * 1000.0, 1),
+            "jitter_ms_hist": dict(zip(labels, self.jitter_hist)),
+            "i2c_read_us": self._latency_percentiles(),
+            "state_dwell_s": {k: round(v, 1) for k, v in self.dwell.items()},
+        }
+
+
+class MotionMonitor:
+    """Summarises wearer activity over short windows for other services.
+
+    Each window yields the RMS deviation of |a| from 1 g, the mean
+    rotation rate and a ``moving`` flag, published on the telemetry bus
+    ("imu_motion" field) and written atomically to MOTION_FILE.
+    """
+
+    def __init__(self, path=MOTION_FILE):
+        self.path = path
+        try:
+            self.bus = TelemetryBus()
+        except OSError as e:
+            log.warning("Telemetry bus unavailable: %s", e)
+            self.bus = None
+        self.window_start = None
+        self.n = 0
+        self.accel_sq = 0.0
+        self.rate_sum = 0.0
+
+    def update(self, a_mag, rate, now, state):
+        if self.window_start is None:
+            self.window_start = now
+        self.n += 1
+        self.accel_sq += (a_mag - 1.0) ** 2
+        self.rate_sum += rate
+        if now - self.window_start >= MOTION_INTERVAL_SEC:
+            self.flush(now, state)
+
+    def flush(self, now, state):
+        activity = math.sqrt(self.accel_sq / self.n)
+        rate = self.rate_sum / self.n
+        moving = activity > MOTION_ACCEL_G or rate > MOTION_GYRO_DPS
+        if self.bus is not None:
+            self.bus.publish("imu_motion", activity_g=activity, rate_dps=rate,
+                             moving=moving, state=state)
+        write_stats_file({
+            "ts": round(now, 3),
+            "activity_g": round(activity, 4),
+            "rate_dps": round(rate, 1),
+            "moving": moving,
+            "state": state,
+        }, self.path)
+        self.window_start = now
+        self.n = 0
+        self.accel_sq = 0.0
+        self.rate_sum = 0.0
+
+
+def write_stats_file(stats, path=STATS_FILE):
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w") as fh:
+            json.dump(stats, fh)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning("Stats write failed: %s", e)
+
+
 # =========================================================================
 #  Signal Handling
 # =========================================================================
@@ -269,14 +775,20 @@ def handle_exit_signal(signum, _frame):
 #  Fall Detector
 # =========================================================================
 class FallDetector:
-    def __init__(self, imu, gpio_request, mqtt_client, device_id, topic, verbose=False):
+    def __init__(self, imu, gpio_request, mqtt_client, device_id, topic, verbose=False,
+                 confirm_mode=CONFIRM_MODE, trace_file=None, imminent_topic=None,
+                 calibration=None, calibration_path=None, health_topic=None):
         self.imu = imu
         self.gpio = gpio_request
         self.mqtt_client = mqtt_client
         self.device_id = device_id
         self.topic = topic
+        self.imminent_topic = imminent_topic
+        self.health_topic = health_topic
         self.verbose = verbose
         self.use_interrupts = gpio_request is not None
+        self.confirm_mode = confirm_mode
+        self.trace_file = trace_file
 
         # State machine
         self.state = "IDLE"
@@ -285,31 +797,45 @@ class FallDetector:
         self.inactivity_start_time = None
         self.inactivity_buffer = []
         self.last_event_time = 0
-        self.posture_acc_x = 0.0
-        self.posture_acc_y = 0.0
-        self.posture_acc_z = 0.0
-        self.posture_acc_n = 0
-
-        # Gravity EMA
-        self.grav_x = 0.0
-        self.grav_y = 0.0
-        self.grav_z = 1.0
-        self.grav_samples = 0
         self.pre_fall_grav = None
+        self.sprt_llr = 0.0
+        self.sprt_next_step = None
+        self.sprt_step_start = 0
+
+        # Orientation
+        self.orientation = OrientationFilter()
+        self.last_sample_time = None
+
+        # Pre-impact prediction
+        self.pre_impact = PreImpactDetector()
+        self.last_imminent_time = 0
+
+        # Calibration
+        self.calibration = calibration
+        self.calibration_path = calibration_path
+        self.calibrator = StationaryCalibrator()
+        self.last_calibration_save = calibration.ts if calibration else 0
+        if calibration is not None:
+            if self.imu is not None:
+                self.imu.set_calibration(calibration)
 
         # Housekeeping
         self.last_watchdog = time.time()
         self.last_health_check = time.time()
         self.sample_count = 0
         self.i2c_errors = 0
+        self.stats = LoopStats("interrupt" if self.use_interrupts else "polling")
+        self.last_stats = time.monotonic()
+        self.last_health_publish = self.last_stats
+        self.motion = MotionMonitor() if self.imu is not None else None
 
         mode = "interrupt-driven" if self.use_interrupts else "polling"
-        log.info("Fall detector started (%s)", mode)
+        log.info("Fall detector started (%s, %s confirmation)", mode, self.confirm_mode)
         log.info("Thresholds: freefall=%.1fg  impact=%.1fg/%.0f deg/s  "
-                 "inactivity=%.1fs  posture=%.1fg",
+                 "inactivity=%.1fs  posture=%.0f deg",
                  FREE_FALL_THRESHOLD_G, IMPACT_THRESHOLD_G,
                  IMPACT_THRESHOLD_GYRO, INACTIVITY_PERIOD_SEC,
-                 POSTURE_CHANGE_THRESHOLD_G)
+                 POSTURE_CHANGE_THRESHOLD_DEG)
 
     def reset_state(self):
         """Reset state machine but preserve last_event_time for debounce."""
@@ -319,45 +845,134 @@ class FallDetector:
         self.inactivity_start_time = None
         self.inactivity_buffer = []
         self.pre_fall_grav = None
-        self.posture_acc_x = 0.0
-        self.posture_acc_y = 0.0
-        self.posture_acc_z = 0.0
-        self.posture_acc_n = 0
-
-    def _update_gravity_ema(self, ax, ay, az):
-        if self.grav_samples == 0:
-            self.grav_x, self.grav_y, self.grav_z = ax, ay, az
+        self.sprt_llr = 0.0
+        self.sprt_next_step = None
+        self.sprt_step_start = 0
+
+    def _update_orientation(self, ax, ay, az, gx, gy, gz, now):
+        if self.last_sample_time is None:
+            dt = SAMPLE_PERIOD_SEC
         else:
-            a = GRAVITY_EMA_ALPHA
-            self.grav_x += a * (ax - self.grav_x)
-            self.grav_y += a * (ay - self.grav_y)
-            self.grav_z += a * (az - self.grav_z)
-        self.grav_samples += 1
+            dt = min(max(now - self.last_sample_time, 0.5 * SAMPLE_PERIOD_SEC),
+                     4.0 * SAMPLE_PERIOD_SEC)
+        self.last_sample_time = now
+        self.orientation.update(ax, ay, az, gx, gy, gz, dt)
+        return dt
+
+    def _update_calibration(self, sample, now):
+        means = self.calibrator.update(sample)
+        if means is None:
+            return
+        ax, ay, az, gx, gy, gz = means
+        a_mag = magnitude(ax, ay, az)
+        gravity = (ax / a_mag, ay / a_mag, az / a_mag)
 
-    def _posture_changed(self, ax, ay, az):
+        old = self.calibration
+        if old is None:
+            calib = ImuCalibration((gx, gy, gz), 1.0 / a_mag, gravity, now)
+        else:
+            k = CALIB_BLEND
+            calib = ImuCalibration(
+                tuple(b + k * r for b, r in zip(old.gyro_bias, (gx, gy, gz))),
+                old.accel_scale * (1.0 + k * (1.0 / a_mag - 1.0)),
+                gravity,
+                now,
+            )
+        if not calib.is_plausible():
+            log.warning("Rejecting implausible calibration: bias=%s scale=%.3f",
+                        calib.gyro_bias, calib.accel_scale)
+            return
+
+        self.calibration = calib
+        if self.imu is not None:
+            self.imu.set_calibration(calib)
+
+        if self.calibration_path and (
+            old is None or now - self.last_calibration_save >= CALIB_SAVE_INTERVAL_SEC
+        ):
+            if calib.save(self.calibration_path):
+                self.last_calibration_save = now
+                log.info("Calibration saved: gyro_bias=(%.2f, %.2f, %.2f) "
+                         "accel_scale=%.4f", *calib.gyro_bias, calib.accel_scale)
+
+    def _update_pre_impact(self, ax, ay, az, a_mag, dt, now):
+        ux, uy, uz = self.orientation.gravity()
+        imminent = self.pre_impact.update(ax * ux + ay * uy + az * uz, a_mag, dt)
+        if (
+            imminent
+            and self.state in ("IDLE", "FREE_FALL")
+            and (now - self.last_imminent_time) > PRE_IMPACT_HOLDOFF_SEC
+            and (now - self.last_event_time) > MIN_EVENT_INTERVAL
+        ):
+            self.last_imminent_time = now
+            log.info(">>> Fall imminent  v=%.2f m/s", self.pre_impact.velocity)
+            self._publish_imminent_event(self.pre_impact.velocity)
+
+    def _posture_changed(self):
         """Compare current gravity direction to the pre-fall reference."""
-        if self.pre_fall_grav is None or self.grav_samples < GRAVITY_MIN_SAMPLES:
-            log.info("Posture check skipped (insufficient samples)")
+        if self.pre_fall_grav is None:
+            log.info("Posture check skipped (no pre-fall reference)")
             return True
-        rx, ry, rz = self.pre_fall_grav
-        change = magnitude(ax - rx, ay - ry, az - rz)
-        log.info("Posture delta=%.2fg (threshold=%.1fg)", change, POSTURE_CHANGE_THRESHOLD_G)
-        return change >= POSTURE_CHANGE_THRESHOLD_G
+        change = tilt_angle_deg(self.orientation.gravity(), self.pre_fall_grav)
+        log.info("Posture delta=%.1f deg (threshold=%.0f deg)",
+                 change, POSTURE_CHANGE_THRESHOLD_DEG)
+        return change >= POSTURE_CHANGE_THRESHOLD_DEG
+
+    def _sequential_confirmed(self, now):
+        """Feed one SPRT observation per SPRT_STEP_SEC.
+
+        Each step observes whether the current tilt exceeds the posture
+        threshold.  Steps with too much rotation are skipped because the
+        posture has not settled yet.  Returns True once the log-likelihood
+        ratio crosses the fall bound.  The ratio is floored at the lower
+        bound instead of rejecting early; rejection is left to the full
+        inactivity window.
+        """
+        if self.pre_fall_grav is None:
+            return False
+        if self.sprt_next_step is None:
+            self.sprt_next_step = self.inactivity_start_time + SPRT_STEP_SEC
+        if now < self.sprt_next_step:
+            return False
+        self.sprt_next_step += SPRT_STEP_SEC
 
-    def process_sample(self, ax, ay, az, gx, gy, gz):
+        step = self.inactivity_buffer[self.sprt_step_start:]
+        self.sprt_step_start = len(self.inactivity_buffer)
+        if step and sum(step) / len(step) > INACTIVITY_ALLOWED_MOVEMENT_FRAC:
+            return False
+
+        tilt = tilt_angle_deg(self.orientation.gravity(), self.pre_fall_grav)
+        if tilt >= POSTURE_CHANGE_THRESHOLD_DEG:
+            self.sprt_llr += SPRT_LLR_CHANGED
+        else:
+            self.sprt_llr += SPRT_LLR_UNCHANGED
+        self.sprt_llr = max(self.sprt_llr, SPRT_LOWER_BOUND)
+        return self.sprt_llr >= SPRT_UPPER_BOUND
+
+    def _movement_fraction(self):
+        n = len(self.inactivity_buffer) or 1
+        return sum(self.inactivity_buffer) / n
+
+    def process_sample(self, ax, ay, az, gx, gy, gz, now=None):
         a_mag = magnitude(ax, ay, az)
         g_mag = magnitude(gx, gy, gz)
-        now = time.time()
+        if now is None:
+            now = time.time()
 
         if abs(ax) + abs(ay) + abs(az) < MIN_VALID_ACCEL_SUM:
             log.warning("Skipping invalid accel (near zero)")
             return
 
+        dt = self._update_orientation(ax, ay, az, gx, gy, gz, now)
+        self._update_pre_impact(ax, ay, az, a_mag, dt, now)
         if self.state == "IDLE":
-            self._update_gravity_ema(ax, ay, az)
+            self._update_calibration((ax, ay, az, gx, gy, gz), now)
+        if self.motion is not None:
+            self.motion.update(a_mag, self.orientation.last_rate, now, self.state)
 
         if self.verbose:
-            log.debug("|a|=%.2fg  |g|=%.1f deg/s  state=%s", a_mag, g_mag, self.state)
+            log.debug("|a|=%.2fg  |g|=%.1f deg/s  rate=%.1f deg/s  state=%s",
+                      a_mag, g_mag, self.orientation.last_rate, self.state)
 
         # ==============================================================
         #  STATE MACHINE
@@ -370,7 +985,7 @@ class FallDetector:
             ):
                 self.state = "FREE_FALL"
                 self.free_fall_time = now
-                self.pre_fall_grav = (self.grav_x, self.grav_y, self.grav_z)
+                self.pre_fall_grav = self.orientation.gravity()
                 log.info(">>> Free-fall detected  |a|=%.2fg", a_mag)
 
         elif self.state == "FREE_FALL":
@@ -390,23 +1005,26 @@ class FallDetector:
             if now < self.inactivity_start_time:
                 return
 
-            self.inactivity_buffer.append(g_mag > INACTIVITY_GYRO_THRESHOLD)
-
-            self.posture_acc_x += ax
-            self.posture_acc_y += ay
-            self.posture_acc_z += az
-            self.posture_acc_n += 1
+            self.inactivity_buffer.append(
+                self.orientation.last_rate > INACTIVITY_GYRO_THRESHOLD
+            )
 
             elapsed = now - self.inactivity_start_time
 
-            if elapsed >= INACTIVITY_PERIOD_SEC:
-                avg_ax = self.posture_acc_x / self.posture_acc_n
-                avg_ay = self.posture_acc_y / self.posture_acc_n
-                avg_az = self.posture_acc_z / self.posture_acc_n
-                posture_changed = self._posture_changed(avg_ax, avg_ay, avg_az)
+            if self.confirm_mode == "sequential" and self._sequential_confirmed(now):
+                movement = self._movement_fraction()
+                severe = movement <= INACTIVITY_ALLOWED_MOVEMENT_FRAC
+                log.info(">>> FALL CONFIRMED early (%.0f ms after impact, LLR=%.2f, "
+                         "movement=%.1f%%)", (now - self.impact_time) * 1000,
+                         self.sprt_llr, movement * 100)
+                self._publish_fall_event(severe=severe)
+                self.last_event_time = now
+                self.reset_state()
+
+            elif elapsed >= INACTIVITY_PERIOD_SEC:
+                posture_changed = self._posture_changed()
 
-                n = len(self.inactivity_buffer) or 1
-                movement = sum(self.inactivity_buffer) / n
+                movement = self._movement_fraction()
                 is_motionless = movement <= INACTIVITY_ALLOWED_MOVEMENT_FRAC
 
                 if posture_changed:
@@ -423,6 +1041,20 @@ class FallDetector:
                 self.last_event_time = now
                 self.reset_state()
 
+    def _publish_imminent_event(self, velocity):
+        """Provisional pre-impact alert on the fast lane (never blocks)."""
+        payload = {
+            "device_id": self.device_id,
+            "device_type": "camera",
+            "ts": int(time.time()),
+            "fall_imminent": True,
+            "velocity": round(velocity, 2),
+        }
+        if self.mqtt_client is None or self.imminent_topic is None:
+            log.info("FALL IMMINENT (MQTT skipped): %s", payload)
+            return
+        self.mqtt_client.publish_nowait(self.imminent_topic, payload, qos=0)
+
     def _publish_fall_event(self, severe=False):
         payload = {
             "device_id": self.device_id,
@@ -430,6 +1062,10 @@ class FallDetector:
             "ts": int(time.time()),
             "fall": True,
         }
+        if self.impact_time and (self.impact_time - self.last_imminent_time) <= (
+            FREE_FALL_IMPACT_WINDOW + PRE_IMPACT_WINDOW_SAMPLES * SAMPLE_PERIOD_SEC
+        ):
+            payload["predicted"] = True
         if severe:
             log.info("NOTE: fall appears severe (motionless)")
         if self.mqtt_client is None:
@@ -440,6 +1076,26 @@ class FallDetector:
         except Exception as e:
             log.error("MQTT publish error: %s", e)
 
+    def _report_stats(self, mono):
+        self.last_stats = mono
+        stats = self.stats.report(mono, self.sample_count, self.i2c_errors)
+        if self.imu is not None:
+            # Time spent waiting for the radar to release bus 1
+            stats["i2c_lock_wait_us"] = self.imu.dev.stats.report()["wait_us"]
+        write_stats_file(stats)
+        if self.verbose:
+            log.debug("Loop stats: %s", stats)
+
+        if (
+            self.health_topic
+            and self.mqtt_client is not None
+            and mono - self.last_health_publish >= HEALTH_MQTT_INTERVAL_SEC
+        ):
+            self.last_health_publish = mono
+            payload = {"device_id": self.device_id, "device_type": "camera"}
+            payload.update(stats)
+            self.mqtt_client.publish_nowait(self.health_topic, payload, qos=0)
+
     # ==================================================================
     #  Main Loop
     # ==================================================================
@@ -449,21 +1105,34 @@ class FallDetector:
         while not exit_event.is_set():
             try:
                 got_data = False
+                queued = 1
 
                 if self.use_interrupts:
                     if self.gpio.wait_edge_events(
                         timeout=timedelta(seconds=INTERRUPT_TIMEOUT_SEC)
                     ):
-                        self.gpio.read_edge_events()
+                        queued = len(self.gpio.read_edge_events())
                         got_data = True
+                    else:
+                        self.stats.record_int_timeout()
                 else:
                     time.sleep(poll_interval)
                     got_data = True
 
                 if got_data:
+                    t_read = time.perf_counter()
                     ax, ay, az, gx, gy, gz = self.imu.read_sensor_data()
+                    read_latency = time.perf_counter() - t_read
+                    sample_time = time.time()
                     self.sample_count += 1
-                    self.process_sample(ax, ay, az, gx, gy, gz)
+                    self.stats.record_sample(time.monotonic(), read_latency,
+                                             self.state, queued)
+                    if self.trace_file is not None:
+                        self.trace_file.write(
+                            f"{sample_time:.4f},{ax:.5f},{ay:.5f},{az:.5f},"
+                            f"{gx:.3f},{gy:.3f},{gz:.3f}\n"
+                        )
+                    self.process_sample(ax, ay, az, gx, gy, gz, now=sample_time)
 
                 # Watchdog ping
                 now = time.time()
@@ -478,6 +1147,11 @@ class FallDetector:
                         self.i2c_errors += 1
                     self.last_health_check = now
 
+                # Loop telemetry
+                mono = time.monotonic()
+                if mono - self.last_stats >= STATS_INTERVAL_SEC:
+                    self._report_stats(mono)
+
             except OSError as e:
                 self.i2c_errors += 1
                 log.error("I2C error: %s", e)
@@ -501,6 +1175,16 @@ def main():
     parser.add_argument("--verbose", action="store_true", help="Print every sample")
     parser.add_argument("--no-interrupt", action="store_true", help="Force polling mode")
     parser.add_argument("--skip-mqtt", action="store_true", help="Skip MQTT (local testing)")
+    parser.add_argument("--confirm-mode", choices=("sequential", "fixed"),
+                        default=CONFIRM_MODE,
+                        help="Fall confirmation: early-exit sequential test or "
+                             "fixed inactivity window")
+    parser.add_argument("--health-mqtt", action="store_true",
+                        help="Also publish loop health on device/<id>/imu_health")
+    parser.add_argument("--calibration", metavar="PATH", default=CALIB_PATH,
+                        help="Calibration cache file (default: %(default)s)")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Append raw samples to a CSV trace (for fall_latency_bench.py)")
     args = parser.parse_args()
 
     if args.verbose:
@@ -516,6 +1200,8 @@ def main():
     config = load_config()
     device_id = config["device_id"]
     topic = f"device/{device_id}/fall"
+    imminent_topic = f"device/{device_id}/fall_imminent"
+    health_topic = f"device/{device_id}/imu_health" if args.health_mqtt else None
 
     # MQTT
     mqtt_client = None
@@ -525,24 +1211,42 @@ def main():
         log.info("MQTT skipped (--skip-mqtt)")
 
     gpio_request = None
+    trace_file = None
+    dev = None
+
+    calibration = ImuCalibration.load(args.calibration)
+    if calibration is not None:
+        log.info("Calibration loaded: gyro_bias=(%.2f, %.2f, %.2f) accel_scale=%.4f",
+                 *calibration.gyro_bias, calibration.accel_scale)
 
     try:
-        with smbus2.SMBus(I2C_BUS) as bus:
-            imu = ICM42605(bus)
-            imu.init_sensor()
+        if args.record:
+            new_trace = not os.path.exists(args.record)
+            trace_file = open(args.record, "a", buffering=1 << 16)
+            if new_trace:
+                trace_file.write("t,ax,ay,az,gx,gy,gz\n")
+            log.info("Recording raw samples to %s", args.record)
+
+        dev = open_device(I2C_BUS, ICM42605_ADDR, "icm42605", PRIORITY_HIGH)
+        imu = ICM42605(dev)
+        imu.init_sensor()
 
-            if not args.no_interrupt:
-                gpio_request = setup_gpio_interrupt(IMU_INT_GPIO)
+        if not args.no_interrupt:
+            gpio_request = setup_gpio_interrupt(IMU_INT_GPIO)
 
-            if mqtt_client:
-                mqtt_client.connect()
+        if mqtt_client:
+            mqtt_client.connect()
 
-            sd_notify("READY=1")
+        sd_notify("READY=1")
 
-            detector = FallDetector(
-                imu, gpio_request, mqtt_client, device_id, topic, args.verbose
-            )
-            detector.run()
+        detector = FallDetector(
+            imu, gpio_request, mqtt_client, device_id, topic, args.verbose,
+            confirm_mode=args.confirm_mode, trace_file=trace_file,
+            imminent_topic=imminent_topic,
+            calibration=calibration, calibration_path=args.calibration,
+            health_topic=health_topic,
+        )
+        detector.run()
 
     except KeyboardInterrupt:
         log.info("Interrupted.")
@@ -558,6 +1262,11 @@ def main():
                 pass
         if mqtt_client:
             mqtt_client.close()
+        if trace_file:
+            trace_file.close()
+        if dev is not None:
+            log.info("I2C %s", dev.summary())
+            dev.bus.close()
         log.info("Shutdown complete.")
 
 
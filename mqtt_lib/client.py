@@ -18,6 +18,9 @@ Publishing (long-running services like IMU fall-detect, E-STOP):
     ...
     client.close()
 
+Publishing from a sensor loop (never blocks, drops while offline):
+    client.publish_nowait("device/<id>/fall_imminent", payload, qos=0)
+
 Publishing one-shot (cron / bootup):
     client = MQTTClient(config, exit_event)
     client.publish_once("device/<id>/status", payload)
@@ -502,6 +505,50 @@ class MQTTClient:
             log.error("Publish exception on %s: %s", topic, exc)
             return False
 
+    def publish_nowait(self, topic, payload, qos=0):
+        """Publish without ever blocking the caller.
+
+        Unlike :meth:`publish`, this never attempts a reconnect: if the
+        link is down the message is dropped immediately and paho's
+        background loop keeps reconnecting on its own.  Meant for
+        latency-critical or high-rate streams that must not stall a
+        sensor loop.  This method is thread-safe.
+
+        Parameters
+        ----------
+        topic : str
+            Full MQTT topic.
+        payload : dict or str
+            Message body; dicts are JSON-serialised automatically.
+        qos : int
+            Quality of Service.  Default is 0 (fire-and-forget).
+
+        Returns
+        -------
+        bool
+            True if paho accepted the publish, False if it was dropped.
+        """
+        if self._closed or not self._connected:
+            log.debug("Not connected, dropping message on %s", topic)
+            return False
+
+        try:
+            data = json.dumps(payload) if isinstance(payload, dict) else payload
+
+            with self._lock:
+                result = self._client.publish(topic, data, qos=qos)
+
+            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                log.debug("Published %s (qos=%d, nowait): %s", topic, qos, data)
+                return True
+
+            log.error("Publish failed on %s: rc=%s", topic, result.rc)
+            return False
+
+        except Exception as exc:
+            log.error("Publish exception on %s: %s", topic, exc)
+            return False
+
     def publish_once(self, topic, payload, qos=1, timeout=_DEFAULT_CONNECT_TIMEOUT):
         """Connect, publish one message, disconnect.
 
@@ -0,0 +1,105 @@
+"""
+Chunked HDF5 capture of XM125 detector frames.
+
+The distance detector I2C application only exposes the detected peaks,
+so a frame is: time, status, result word, temperature and up to
+MAX_PEAKS (distance_mm, strength) pairs.  Frames are buffered in memory
+and appended one chunk at a time so the SD card sees few, large writes.
+
+File layout (one row per frame):
+    t            float64   monotonic seconds
+    status       uint32    detector status register
+    result       uint32    distance result register
+    temperature  int16
+    num_peaks    uint8
+    distance_mm  float32 [MAX_PEAKS]   NaN where no peak
+    strength     float32 [MAX_PEAKS]   NaN where no peak
+
+The detector configuration in effect is stored as file attributes
+(``config.<name>``) so param_sweep.py knows what was already applied
+on the module.
+"""
+
+import time
+
+import h5py
+import numpy as np
+
+MAX_PEAKS = 10  # Peak registers on the XM125 (PEAK_DIST_BASE .. +9)
+CHUNK_FRAMES = 256  # Frames per HDF5 chunk / per write
+
+
+class FrameCapture:
+    """Append detector frames to an HDF5 file in fixed-size chunks."""
+
+    def __init__(self, path, config, chunk_frames=CHUNK_FRAMES):
+        self.path = path
+        self.chunk = chunk_frames
+        self.h5 = h5py.File(path, "a")
+        self.n_buf = 0
+        self.frames = 0
+
+        self._scalar = {
+            "t": np.float64,
+            "status": np.uint32,
+            "result": np.uint32,
+            "temperature": np.int16,
+            "num_peaks": np.uint8,
+        }
+        self.buf = {name: np.zeros(chunk_frames, dtype) for name, dtype in self._scalar.items()}
+        self.buf["distance_mm"] = np.full((chunk_frames, MAX_PEAKS), np.nan, np.float32)
+        self.buf["strength"] = np.full((chunk_frames, MAX_PEAKS), np.nan, np.float32)
+
+        for name, arr in self.buf.items():
+            if name not in self.h5:
+                self.h5.create_dataset(
+                    name,
+                    shape=(0,) + arr.shape[1:],
+                    maxshape=(None,) + arr.shape[1:],
+                    dtype=arr.dtype,
+                    chunks=(chunk_frames,) + arr.shape[1:],
+                    compression="lzf",
+                )
+        for name, value in config.items():
+            self.h5.attrs[f"config.{name}"] = value
+        self.h5.attrs.setdefault("created", time.time())
+
+    def add(self, t, status, result, peaks):
+        i = self.n_buf
+        self.buf["t"][i] = t
+        self.buf["status"][i] = status
+        self.buf["result"][i] = result
+        temp = (result >> 16) & 0xFFFF
+        self.buf["temperature"][i] = temp - 0x10000 if temp & 0x8000 else temp
+        self.buf["num_peaks"][i] = len(peaks)
+        dist = self.buf["distance_mm"][i]
+        strength = self.buf["strength"][i]
+        dist.fill(np.nan)
+        strength.fill(np.nan)
+        for k, (d, s) in enumerate(peaks[:MAX_PEAKS]):
+            if d is not None:
+                dist[k] = d
+                strength[k] = s
+        self.n_buf += 1
+        if self.n_buf == self.chunk:
+            self.flush()
+
+    def flush(self):
+        n = self.n_buf
+        if not n:
+            return
+        for name, arr in self.buf.items():
+            ds = self.h5[name]
+            start = ds.shape[0]
+            ds.resize(start + n, axis=0)
+            ds[start:start + n] = arr[:n]
+        self.h5.flush()
+        self.frames += n
+        self.n_buf = 0
+
+    def close(self):
+        if self.h5 is None:
+            return
+        self.flush()
+        self.h5.close()
+        self.h5 = None
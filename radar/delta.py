@@ -0,0 +1,168 @@
+"""
+Delta encoding of XM125 frames for the uplink.
+
+Instead of the full payload every frame, the encoder sends a keyframe
+(the usual message plus peak ids) every KEYFRAME_SEC and in between only
+what changed since the last message:
+
+    {"type": "delta", "seq": 42, "ts": ...,
+     "add": [[id, distance_mm, strength], ...],
+     "mov": [[id, distance_mm], ...],
+     "del": [id, ...],
+     "status": ..., "temperature": ...}      # only when changed
+
+Peaks keep their id while they stay within MATCH_GATE_MM of the last
+sent position, across keyframes too; moves smaller than MOVE_TOL_MM are
+not sent.  Frames with no change produce no message.  ``seq`` increases
+by one per message, so the backend sees a gap as a lost message and can
+wait for (or request) the next keyframe.
+"""
+
+import json
+
+# ==============================
+#         CONFIGURATION
+# ==============================
+KEYFRAME_SEC = 30.0  # Full state at least this often
+MOVE_TOL_MM = 30  # Smaller moves are not reported
+MATCH_GATE_MM = 300  # Larger jumps are a del + add
+TEMP_TOL = 2  # Temperature change (deg C) worth sending
+
+
+class DeltaEncoder:
+    """Turns successive frames into keyframes and compact deltas."""
+
+    def __init__(self, device_id, keyframe_sec=KEYFRAME_SEC):
+        self.device_id = device_id
+        self.keyframe_sec = keyframe_sec
+        self.seq = 0
+        self.peaks = {}  # id -> (distance_mm, strength) as last sent
+        self.status = None
+        self.temperature = None
+        self._next_id = 0
+        self._last_key = None
+        self.frames = 0
+        self.messages = 0
+        self.bytes = 0
+
+    def encode(self, status, result, peaks, t, ts):
+        """Return the JSON string to publish for this frame, or None."""
+        self.frames += 1
+        peaks = [(d, s) for d, s in peaks if d is not None]
+        if self._last_key is None or t - self._last_key >= self.keyframe_sec:
+            msg = self._keyframe(status, result, peaks, t, ts)
+        else:
+            msg = self._delta(status, result, peaks, ts)
+            if msg is None:
+                return None
+        data = json.dumps(msg, separators=(",", ":"))
+        self.messages += 1
+        self.bytes += len(data)
+        return data
+
+    def _keyframe(self, status, result, peaks, t, ts):
+        self._last_key = t
+        # Matched peaks keep their id; the keyframe carries exact positions
+        matches = self._match(peaks)
+        ids = {pi: pid for _gap, pid, pi in matches}
+        self.peaks = {}
+        for pi, (d, s) in enumerate(peaks):
+            pid = ids.get(pi)
+            if pid is None:
+                pid = self._next_id
+                self._next_id += 1
+            self.peaks[pid] = (d, s)
+        self.status = status
+        self.temperature = (result >> 16) & 0xFFFF
+        strongest = None
+        if self.peaks:
+            pid, (d, s) = max(self.peaks.items(), key=lambda kv: abs(kv[1][1]))
+            strongest = {"id": pid, "distance_mm": d, "strength": s}
+        self.seq += 1
+        return {
+            "type": "key",
+            "seq": self.seq,
+            "device_id": self.device_id,
+            "device_type": "camera",
+            "status": status,
+            "result": result,
+            "temperature": self.temperature,
+            "num_peaks": len(self.peaks),
+            "near_start_edge": bool((result >> 8) & 0x1),
+            "calibration_needed": bool((result >> 9) & 0x1),
+            "peaks": [[pid, d, s] for pid, (d, s) in self.peaks.items()],
+            "strongest_distance": strongest,
+            "ts": ts,
+        }
+
+    def _match(self, peaks):
+        """Greedy nearest match of new peaks to the last sent ones.
+
+        Returns (gap, id, peak index) triples within MATCH_GATE_MM.
+        """
+        pairs = sorted(
+            (abs(old[0] - d), pid, pi)
+            for pid, old in self.peaks.items()
+            for pi, (d, _s) in enumerate(peaks)
+        )
+        matched_ids, matched_peaks = set(), set()
+        matches = []
+        for gap, pid, pi in pairs:
+            if gap > MATCH_GATE_MM or pid in matched_ids or pi in matched_peaks:
+                continue
+            matched_ids.add(pid)
+            matched_peaks.add(pi)
+            matches.append((gap, pid, pi))
+        return matches
+
+    def _delta(self, status, result, peaks, ts):
+        matches = self._match(peaks)
+        matched_ids = {pid for _gap, pid, _pi in matches}
+        matched_peaks = {pi for _gap, _pid, pi in matches}
+        moved = []
+        for gap, pid, pi in matches:
+            if gap > MOVE_TOL_MM:
+                d, s = peaks[pi]
+                self.peaks[pid] = (d, s)
+                moved.append([pid, d])
+
+        removed = [pid for pid in self.peaks if pid not in matched_ids]
+        for pid in removed:
+            del self.peaks[pid]
+        added = []
+        for pi, (d, s) in enumerate(peaks):
+            if pi not in matched_peaks:
+                self.peaks[self._next_id] = (d, s)
+                added.append([self._next_id, d, s])
+                self._next_id += 1
+
+        msg = {}
+        if added:
+            msg["add"] = added
+        if moved:
+            msg["mov"] = moved
+        if removed:
+            msg["del"] = removed
+        if status != self.status:
+            self.status = status
+            msg["status"] = status
+        temp = (result >> 16) & 0xFFFF
+        if abs(temp - self.temperature) >= TEMP_TOL:
+            self.temperature = temp
+            msg["temperature"] = temp
+        if not msg:
+            return None
+
+        self.seq += 1
+        msg.update({"type": "delta", "seq": self.seq, "ts": ts})
+        return msg
+
+    def report(self):
+        """Messages and bytes sent so far, per frame."""
+        frames = self.frames or 1
+        return {
+            "frames": self.frames,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "bytes_per_frame": round(self.bytes / frames, 1),
+        }
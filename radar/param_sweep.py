@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Offline detector parameter sweep over HDF5 captures.
+
+Replays frames recorded with ``xm125_mqtt.py --capture`` against a grid
+of detection settings and reports, per setting:
+
+    det%     frames with at least one peak
+    flicker  presence on/off transitions per 100 frames (lower = steadier)
+    jitter   median frame-to-frame change of the strongest peak (mm)
+    false%   retained peaks with no neighbour within --gate-mm in either
+             the previous or the next frame (isolated, likely clutter)
+
+The XM125 distance application only reports peaks, so the sweep works
+on what the module already detected: the range window (START_MM/END_MM)
+can only be narrowed and the threshold can only be raised, here as a
+minimum |strength|.  Grid values outside the captured configuration are
+flagged.  All settings are evaluated at once with NumPy broadcasting.
+
+Settings are ranked by false%, then flicker, among those that keep at
+least --min-det of the best det% (a setting that suppresses everything
+has no false peaks and no flicker, but detects nothing).  The rest follow
+by falling det%.
+
+Usage:
+    python3 param_sweep.py /tmp/radar/*.h5
+    python3 param_sweep.py cap.h5 --start 500,1000 --end 3000,6000 \\
+        --min-strength 0,500,1000,2000
+"""
+
+import argparse
+import itertools
+import sys
+import warnings
+
+import h5py
+import numpy as np
+
+DEFAULT_START = "500,800,1200"
+DEFAULT_END = "3000,4500,6000"
+DEFAULT_MIN_STRENGTH = "0,250,500,1000,2000"
+DEFAULT_GATE_MM = 150
+DEFAULT_MIN_DET = 0.9  # Fraction of the best det% a setting must keep to rank
+BLOCK_FRAMES = 4096  # Frames evaluated per broadcast block
+
+
+def load_capture(path):
+    """Return (distance, strength, config) for one capture file."""
+    with h5py.File(path, "r") as h5:
+        dist = h5["distance_mm"][:]
+        strength = h5["strength"][:]
+        config = {
+            key.split(".", 1)[1]: np.asarray(h5.attrs[key]).item()
+            for key in h5.attrs if key.startswith("config.")
+        }
+    return dist, strength, config
+
+
+def parse_list(text):
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def evaluate(dist, strength, grid, gate_mm):
+    """Score every setting in `grid` ([(start, end, min_strength), ...]).
+
+    `dist` / `strength` are (frames, peaks) arrays with NaN padding.
+    Returns a dict of per-setting arrays.
+    """
+    g = np.asarray(grid, dtype=np.float32)
+    start = g[:, 0, None, None]
+    end = g[:, 1, None, None]
+    min_s = g[:, 2, None, None]
+    n_frames = dist.shape[0]
+    n_set = len(grid)
+
+    detected = np.zeros((n_set, n_frames), dtype=bool)
+    best = np.full((n_set, n_frames), np.nan, dtype=np.float32)
+    isolated = np.zeros(n_set, dtype=np.int64)
+    kept = np.zeros(n_set, dtype=np.int64)
+
+    for b0 in range(0, n_frames, BLOCK_FRAMES):
+        # One frame of context on each side for the neighbour test
+        lo, hi = max(b0 - 1, 0), min(b0 + BLOCK_FRAMES + 1, n_frames)
+        d = dist[lo:hi]
+        s = np.abs(strength[lo:hi])
+        valid = ~np.isnan(d)
+        # mask: (settings, frames, peaks)
+        mask = valid & (d >= start) & (d <= end) & (s >= min_s)
+
+        # Strongest retained peak per frame
+        s_masked = np.where(mask, s, -1.0)
+        idx = s_masked.argmax(axis=2)
+        any_peak = mask.any(axis=2)
+        best_d = np.take_along_axis(
+            np.broadcast_to(d, mask.shape), idx[..., None], axis=2
+        )[..., 0]
+        best_d = np.where(any_peak, best_d, np.nan)
+
+        # Neighbour test against retained peaks of adjacent frames
+        diff = np.abs(d[1:, :, None] - d[:-1, None, :])          # (f-1, p, p)
+        close = diff <= gate_mm
+        link = close[None] & mask[:, 1:, :, None] & mask[:, :-1, None, :]
+        has_prev = np.zeros_like(mask)
+        has_next = np.zeros_like(mask)
+        has_prev[:, 1:] = link.any(axis=3)
+        has_next[:, :-1] = link.any(axis=2)
+        lone = mask & ~has_prev & ~has_next
+
+        # Only count frames that belong to this block (not the context)
+        a, z = b0 - lo, b0 - lo + min(BLOCK_FRAMES, n_frames - b0)
+        detected[:, b0:b0 + z - a] = any_peak[:, a:z]
+        best[:, b0:b0 + z - a] = best_d[:, a:z]
+        isolated += lone[:, a:z].sum(axis=(1, 2))
+        kept += mask[:, a:z].sum(axis=(1, 2))
+
+    flicker = np.count_nonzero(detected[:, 1:] != detected[:, :-1], axis=1)
+    step = np.abs(np.diff(best, axis=1))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows
+        jitter = np.nanmedian(step, axis=1)
+    return {
+        "det_pct": 100.0 * detected.mean(axis=1),
+        "flicker": 100.0 * flicker / max(n_frames - 1, 1),
+        "jitter_mm": jitter,
+        "false_pct": 100.0 * isolated / np.maximum(kept, 1),
+        "peaks": kept,
+    }
+
+
+def rank(res, min_det=DEFAULT_MIN_DET):
+    """Setting indices, best first.
+
+    Settings keeping at least `min_det` of the best det% come first, by
+    false% then flicker; the others follow by falling det%.
+    """
+    det = res["det_pct"]
+    eligible = (det > 0) & (det >= min_det * det.max())
+    # lexsort: last key is primary
+    return np.lexsort((res["flicker"], res["false_pct"],
+                       np.where(eligible, 0.0, -det), ~eligible))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline XM125 parameter sweep")
+    parser.add_argument("captures", nargs="+", help="HDF5 files from --capture")
+    parser.add_argument("--start", default=DEFAULT_START, help="START_MM values")
+    parser.add_argument("--end", default=DEFAULT_END, help="END_MM values")
+    parser.add_argument("--min-strength", default=DEFAULT_MIN_STRENGTH,
+                        help="Minimum |strength| values (threshold proxy)")
+    parser.add_argument("--gate-mm", type=float, default=DEFAULT_GATE_MM,
+                        help="Neighbour distance for the false-peak test")
+    parser.add_argument("--min-det", type=float, default=DEFAULT_MIN_DET,
+                        help="Fraction of the best det%% a setting must keep to rank")
+    parser.add_argument("--top", type=int, default=20, help="Rows to print")
+    args = parser.parse_args()
+
+    grid = [
+        (s, e, m)
+        for s, e, m in itertools.product(
+            parse_list(args.start), parse_list(args.end), parse_list(args.min_strength)
+        )
+        if s < e
+    ]
+    if not grid:
+        parser.error("empty grid")
+
+    dists, strengths, configs = [], [], []
+    for path in args.captures:
+        d, s, cfg = load_capture(path)
+        dists.append(d)
+        strengths.append(s)
+        configs.append(cfg)
+        print(f"{path}: {len(d)} frames, config {cfg}")
+    # Captures are concatenated; the seams add at most one flicker each
+    dist = np.concatenate(dists)
+    strength = np.concatenate(strengths)
+
+    cap_start = max(int(c.get("start_mm", 0)) for c in configs)
+    cap_end = min(int(c.get("end_mm", 1 << 30)) for c in configs)
+
+    res = evaluate(dist, strength, grid, args.gate_mm)
+    order = rank(res, args.min_det)
+
+    print(f"\n{len(grid)} settings over {len(dist)} frames "
+          f"(gate {args.gate_mm:.0f} mm)")
+    print(f"{'start':>6} {'end':>6} {'min|s|':>7} {'det%':>6} {'flicker':>8} "
+          f"{'jitter':>7} {'false%':>7} {'peaks':>7}")
+    for i in order[:args.top]:
+        start, end, min_s = grid[i]
+        note = "  *outside capture" if start < cap_start or end > cap_end else ""
+        print(f"{start:>6} {end:>6} {min_s:>7} {res['det_pct'][i]:>6.1f} "
+              f"{res['flicker'][i]:>8.2f} {res['jitter_mm'][i]:>7.0f} "
+              f"{res['false_pct'][i]:>7.1f} {res['peaks'][i]:>7}{note}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
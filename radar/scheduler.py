@@ -0,0 +1,131 @@
+"""
+Adaptive measurement rate for the XM125 continuous mode.
+
+Picks a frame rate from wearer activity (published by imu_fall_detect.py
+on the telemetry bus, or the legacy /dev/shm JSON file) and from what the
+radar currently sees:
+
+    active  : wearer moving, a track approaching / inside the zone, or any
+              raw peak inside the zone
+    idle    : wearer still, peaks or tracks present or seen recently
+    standby : wearer still and no peak for STANDBY_AFTER_SEC
+
+Raw peaks count as well as confirmed tracks: at the standby rate a new
+target needs several frames to confirm, and one closing faster than the
+tracker gate per frame never confirms at all.
+
+The module only powers the sensor during a measurement, so the frame rate
+is what sets the radar's average draw.
+"""
+
+import json
+import sys
+import time
+
+from tracking import PROXIMITY_ZONE_MM, TTC_ALERT_SEC
+
+sys.path.insert(0, "/app/bodycam2")
+
+from telemetry_lib import TelemetryBus
+
+# ==============================
+#         CONFIGURATION
+# ==============================
+MOTION_FILE = "/dev/shm/imu_motion.json"
+MOTION_POLL_SEC = 0.5  # Re-read the motion channel at most this often
+MOTION_STALE_SEC = 3.0  # Older than this -> IMU not running, treat as moving
+
+IDLE_RATE_HZ = 2.0
+STANDBY_RATE_HZ = 0.5
+STANDBY_AFTER_SEC = 30.0  # Quiet time before dropping from idle to standby
+ACTIVE_HOLD_SEC = 5.0  # Stay active this long after the last trigger
+APPROACH_SPEED_MMS = 300  # Any closing target faster than this keeps us active
+
+PROFILES = ("active", "idle", "standby")
+
+
+class DutyScheduler:
+    """Chooses the next frame period and keeps time-in-profile counters."""
+
+    def __init__(self, active_rate_hz, motion_path=MOTION_FILE):
+        self.rates = {
+            "active": active_rate_hz,
+            "idle": min(IDLE_RATE_HZ, active_rate_hz),
+            "standby": min(STANDBY_RATE_HZ, active_rate_hz),
+        }
+        self.motion_path = motion_path
+        try:
+            self.bus = TelemetryBus()
+        except OSError:
+            self.bus = None
+        self.profile = "active"
+        self.moving = True
+        self._motion_read = 0.0
+        self._last_trigger = None
+        self._last_target = None
+        self._since = None
+        self.dwell = dict.fromkeys(PROFILES, 0.0)
+        self.frames = dict.fromkeys(PROFILES, 0)
+
+    def _read_motion(self):
+        """Refresh self.moving from the IMU channel (missing/stale = moving)."""
+        now = time.time()
+        if now - self._motion_read < MOTION_POLL_SEC:
+            return
+        self._motion_read = now
+        if self.bus is not None:
+            sample = self.bus.read("imu_motion")
+            if sample is not None:
+                self.moving = sample.values["moving"] or sample.age(now) > MOTION_STALE_SEC
+                return
+        try:
+            with open(self.motion_path) as fh:
+                motion = json.load(fh)
+            self.moving = bool(motion["moving"]) or now - motion["ts"] > MOTION_STALE_SEC
+        except (OSError, ValueError, KeyError):
+            self.moving = True
+
+    def update(self, tracks, t, peaks=()):
+        """Pick the profile for the next frame. Returns (profile, period_sec).
+
+        `tracks` are the confirmed tracks, `peaks` the frame's raw
+        (distance_mm, strength) peaks.
+        """
+        self._read_motion()
+        if self._since is None:
+            self._last_trigger = self._last_target = self._since = t
+        distances = [d for d, _s in peaks if d is not None]
+        if tracks or distances:
+            self._last_target = t
+        urgent = any(d <= PROXIMITY_ZONE_MM for d in distances) or any(
+            tr["distance_mm"] <= PROXIMITY_ZONE_MM
+            or tr["velocity_mms"] <= -APPROACH_SPEED_MMS
+            or (tr["ttc_s"] is not None and tr["ttc_s"] <= TTC_ALERT_SEC)
+            for tr in tracks
+        )
+        if self.moving or urgent:
+            self._last_trigger = t
+
+        if t - self._last_trigger < ACTIVE_HOLD_SEC:
+            profile = "active"
+        elif t - self._last_target < STANDBY_AFTER_SEC:
+            profile = "idle"
+        else:
+            profile = "standby"
+
+        self.dwell[self.profile] += t - self._since
+        self._since = t
+        self.frames[profile] += 1
+        if profile != self.profile:
+            print(f"[Duty] {self.profile} -> {profile} ({self.rates[profile]:g} Hz)")
+            self.profile = profile
+        return profile, 1.0 / self.rates[profile]
+
+    def summary(self):
+        """Time share per profile and the average frame rate."""
+        total = sum(self.dwell.values()) or 1.0
+        share = {p: round(100.0 * self.dwell[p] / total, 1) for p in PROFILES}
+        return {
+            "share_pct": share,
+            "avg_rate_hz": round(sum(self.frames.values()) / total, 2),
+        }
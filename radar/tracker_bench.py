@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Radar tracker replay benchmark.
+
+Replays peak logs through tracking.PeakTracker and reports per-frame
+update cost, track fragmentation and, for synthetic logs where the truth
+is known, distance / velocity / time-to-contact error.
+
+Log format (as written by ``xm125_mqtt.py --record``), one frame per line:
+    <t> <distance_mm>:<strength> <distance_mm>:<strength> ...
+
+Usage:
+    python3 tracker_bench.py /tmp/radar/*.log
+    python3 tracker_bench.py --synthetic 50
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+
+import tracking
+
+TTC_EVAL_SEC = 3.0  # Score time-to-contact only where it matters
+
+
+# =========================================================================
+#  Logs
+# =========================================================================
+def load_log(path):
+    frames = []
+    with open(path) as fh:
+        for line in fh:
+            fields = line.split()
+            if not fields:
+                continue
+            peaks = []
+            for item in fields[1:]:
+                d, s = item.split(":")
+                peaks.append((int(d), int(s)))
+            frames.append((float(fields[0]), peaks))
+    return frames
+
+
+def synthetic_log(rng, rate_hz=15.0, seconds=8.0):
+    """One target walking in from 4-6 m, a static reflector and clutter.
+
+    Returns (frames, truth) where truth[i] is the target's true
+    (distance_mm, velocity_mms) at frame i, or None after contact.
+    """
+    dt = 1.0 / rate_hz
+    speed = -rng.uniform(500, 1500)
+    dist = rng.uniform(4000, 6000)
+    wall = rng.uniform(6500, 7000)
+    frames, truth = [], []
+    t = 1000.0
+    for _ in range(int(seconds * rate_hz)):
+        t += dt + rng.gauss(0, 0.002)
+        dist += speed * dt
+        peaks = []
+        if dist > 200 and rng.random() > 0.1:      # 10% dropouts
+            peaks.append((int(dist + rng.gauss(0, 30)), rng.randint(3000, 8000)))
+        peaks.append((int(wall + rng.gauss(0, 15)), rng.randint(1000, 2000)))
+        if rng.random() < 0.05:                     # occasional clutter
+            peaks.append((rng.randint(300, 7000), rng.randint(100, 500)))
+        peaks.sort()
+        frames.append((t, peaks))
+        truth.append((dist, speed) if dist > 200 else None)
+    return frames, truth
+
+
+# =========================================================================
+#  Replay
+# =========================================================================
+def replay(frames, truth=None):
+    tracker = tracking.PeakTracker()
+    cost = []
+    ids = set()
+    dist_err, vel_err, settled_err, ttc_err = [], [], [], []
+    for i, (t, peaks) in enumerate(frames):
+        t0 = time.perf_counter()
+        tracks, _born, _lost = tracker.update(peaks, t)
+        cost.append(time.perf_counter() - t0)
+        ids.update(tr["id"] for tr in tracks)
+
+        if truth is None or truth[i] is None or not tracks:
+            continue
+        d_true, v_true = truth[i]
+        best = min(tracks, key=lambda tr: abs(tr["distance_mm"] - d_true))
+        if abs(best["distance_mm"] - d_true) > tracking.GATE_MM:
+            continue
+        dist_err.append(best["distance_mm"] - d_true)
+        vel_err.append(best["velocity_mms"] - v_true)
+        if best["hits"] >= tracking.VELOCITY_SETTLE_HITS:
+            settled_err.append(best["velocity_mms"] - v_true)
+        ttc_true = d_true / -v_true
+        if best["ttc_s"] is not None and ttc_true <= TTC_EVAL_SEC:
+            ttc_err.append(best["ttc_s"] - ttc_true)
+    return {
+        "frames": len(frames),
+        "cost": cost,
+        "tracks": len(ids),
+        "dist_err": dist_err,
+        "vel_err": vel_err,
+        "settled_err": settled_err,
+        "ttc_err": ttc_err,
+    }
+
+
+# =========================================================================
+#  Reporting
+# =========================================================================
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def rms(values):
+    return math.sqrt(sum(v * v for v in values) / len(values)) if values else float("nan")
+
+
+def report(label, results, expected_tracks=None):
+    cost_us = [c * 1e6 for r in results for c in r["cost"]]
+    frames = sum(r["frames"] for r in results)
+    tracks = sum(r["tracks"] for r in results)
+    print(f"  {label}: {len(results)} logs, {frames} frames")
+    print(f"    update us: p50={percentile(cost_us, 50):.1f} p99={percentile(cost_us, 99):.1f} "
+          f"max={max(cost_us):.1f}  (~{1e6 / percentile(cost_us, 50):.0f} frames/s)")
+    if expected_tracks:
+        print(f"    confirmed tracks: {tracks} (ideal {expected_tracks})")
+    else:
+        print(f"    confirmed tracks: {tracks}")
+    dist_err = [e for r in results for e in r["dist_err"]]
+    if dist_err:
+        vel_err = [e for r in results for e in r["vel_err"]]
+        settled_err = [e for r in results for e in r["settled_err"]]
+        ttc_err = [e for r in results for e in r["ttc_err"]]
+        print(f"    distance RMSE {rms(dist_err):.0f} mm  velocity RMSE {rms(vel_err):.0f} mm/s "
+              f"({rms(settled_err):.0f} after {tracking.VELOCITY_SETTLE_HITS} hits)  "
+              f"TTC RMSE (<{TTC_EVAL_SEC:.0f} s) {rms(ttc_err):.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Radar tracker replay benchmark")
+    parser.add_argument("logs", nargs="*", help="Recorded peak logs")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N",
+                        help="Also generate N synthetic approach logs")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if not args.logs and not args.synthetic:
+        parser.error("give log files or --synthetic N")
+
+    if args.logs:
+        results = [replay(load_log(p)) for p in args.logs]
+        report("recorded", results)
+
+    if args.synthetic:
+        rng = random.Random(args.seed)
+        results = [replay(*synthetic_log(rng)) for _ in range(args.synthetic)]
+        # One walker + one wall per log
+        report("synthetic", results, expected_tracks=2 * args.synthetic)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+Peak tracking and change detection for the XM125 continuous mode.
+
+Keeps state between frames so the radar service can publish only when
+something meaningful changes (object enters the proximity zone, approach
+speed crosses a threshold, a target appears or disappears) instead of
+every frame.
+
+Tracks live in fixed-size NumPy arrays (one slot per possible track) and
+are updated with a nearest-neighbour association plus an alpha-beta
+filter, giving per-track distance, closing velocity and time-to-contact.
+The second hit of a track sets its velocity from the two measurements;
+the filter refines it from there.  Velocity is still noisy for the first
+few frames, so approach events wait for VELOCITY_SETTLE_HITS.
+"""
+
+import numpy as np
+
+# ==============================
+#         CONFIGURATION
+# ==============================
+MAX_TRACKS = 16  # Track slots (the detector reports at most 10 peaks)
+GATE_MM = 400  # Max innovation to associate a peak with an existing track
+GATE_SPEED_MMS = 2000  # Gate widens to this speed x frame interval at low rates
+FILTER_ALPHA = 0.5  # Alpha-beta position gain
+FILTER_BETA = 0.15  # Alpha-beta velocity gain (tuned with tracker_bench.py --synthetic)
+CONFIRM_HITS = 3  # Frames before a new track is reported
+MAX_MISSED = 5  # Frames a track may go unseen before it is dropped
+
+TTC_MIN_SPEED_MMS = 100  # Below this closing speed time-to-contact is undefined
+PROXIMITY_ZONE_MM = 1500  # Entering this range is an event
+APPROACH_SPEED_MMS = 800  # Closing faster than this is an event
+TTC_ALERT_SEC = 2.0  # Time-to-contact below this is an approach event
+VELOCITY_SETTLE_HITS = 8  # Hits before velocity / TTC may raise an approach event
+HEARTBEAT_SEC = 5.0  # Republish current state this often while tracks exist
+
+
+class PeakTracker:
+    """Nearest-neighbour alpha-beta tracker over successive peak lists.
+
+    State is held column-wise in arrays indexed by slot; ``update`` returns
+    confirmed tracks as dicts with ``id``, ``distance_mm``, ``velocity_mms``,
+    ``ttc_s`` (None when not closing), ``strength`` and ``hits``.
+    """
+
+    def __init__(self, max_tracks=MAX_TRACKS, alpha=FILTER_ALPHA, beta=FILTER_BETA):
+        self.alpha = alpha
+        self.beta = beta
+        self.active = np.zeros(max_tracks, dtype=bool)
+        self.confirmed = np.zeros(max_tracks, dtype=bool)
+        self.ids = np.zeros(max_tracks, dtype=np.int64)
+        self.pos = np.zeros(max_tracks)
+        self.vel = np.zeros(max_tracks)
+        self.strength = np.zeros(max_tracks, dtype=np.int64)
+        self.hits = np.zeros(max_tracks, dtype=np.int32)
+        self.missed = np.zeros(max_tracks, dtype=np.int32)
+        self._next_id = 0
+        self._last_t = None
+
+    def update(self, peaks, t):
+        """Associate one frame of (distance_mm, strength) peaks at time t.
+
+        Returns (tracks, born, lost) where born/lost are lists of tracks
+        that became confirmed or were dropped in this frame.
+        """
+        dt = (t - self._last_t) if self._last_t is not None else 0.0
+        self._last_t = t
+        peaks = [(d, s) for d, s in peaks if d is not None]
+        z = np.fromiter((d for d, _s in peaks), dtype=float, count=len(peaks))
+
+        # Predict
+        act = self.active
+        self.pos[act] += self.vel[act] * dt
+
+        # Greedy nearest-neighbour association, closest pairs first
+        slots = np.flatnonzero(act)
+        assigned = np.full(len(z), -1)
+        hit = np.zeros_like(act)
+        if len(slots) and len(z):
+            cost = np.abs(self.pos[slots, None] - z[None, :])
+            order = np.argsort(cost, axis=None)
+            used_t = np.zeros(len(slots), dtype=bool)
+            gate = max(GATE_MM, GATE_SPEED_MMS * dt)
+            for flat in order:
+                ti, pi = divmod(int(flat), len(z))
+                if cost[ti, pi] > gate:
+                    break
+                if used_t[ti] or assigned[pi] >= 0:
+                    continue
+                used_t[ti] = True
+                assigned[pi] = slots[ti]
+            matched = assigned >= 0
+            hit[assigned[matched]] = True
+
+            # Correct (vectorised alpha-beta step)
+            idx = assigned[matched]
+            resid = z[matched] - self.pos[idx]
+            second = self.hits[idx] == 1
+            # Second hit: take position and the two-point velocity as measured
+            self.pos[idx] += np.where(second, 1.0, self.alpha) * resid
+            if dt > 0:
+                self.vel[idx] += (np.where(second, 1.0, self.beta) / dt) * resid
+            self.strength[idx] = [s for (_d, s), m in zip(peaks, matched) if m]
+            self.hits[idx] += 1
+            self.missed[idx] = 0
+
+        coast = act & ~hit
+        self.missed[coast] += 1
+
+        dropped = act & (self.missed > MAX_MISSED)
+        lost = [self._as_dict(i) for i in np.flatnonzero(dropped & self.confirmed)]
+        self.active[dropped] = False
+        self.confirmed[dropped] = False
+
+        promote = self.active & ~self.confirmed & (self.hits >= CONFIRM_HITS)
+        self.confirmed |= promote
+        born_slots = list(np.flatnonzero(promote))
+
+        # Unassigned peaks start new tracks in free slots
+        for pi in np.flatnonzero(assigned < 0):
+            free = np.flatnonzero(~self.active)
+            if not len(free):
+                break
+            slot = free[0]
+            self._start(slot, z[pi], peaks[pi][1])
+            if self.confirmed[slot]:
+                born_slots.append(slot)
+
+        tracks = [self._as_dict(i) for i in np.flatnonzero(self.confirmed)]
+        born = [self._as_dict(i) for i in born_slots]
+        return tracks, born, lost
+
+    def _start(self, slot, distance, strength):
+        self.active[slot] = True
+        self.confirmed[slot] = CONFIRM_HITS <= 1
+        self.ids[slot] = self._next_id
+        self.pos[slot] = distance
+        self.vel[slot] = 0.0
+        self.strength[slot] = strength
+        self.hits[slot] = 1
+        self.missed[slot] = 0
+        self._next_id += 1
+
+    def _as_dict(self, slot):
+        distance = float(self.pos[slot])
+        velocity = float(self.vel[slot])
+        ttc = None
+        if velocity <= -TTC_MIN_SPEED_MMS:
+            ttc = max(distance, 0.0) / -velocity
+        return {
+            "id": int(self.ids[slot]),
+            "distance_mm": distance,
+            "velocity_mms": velocity,
+            "ttc_s": ttc,
+            "strength": int(self.strength[slot]),
+            "hits": int(self.hits[slot]),
+        }
+
+
+class ChangeDetector:
+    """Turns tracker output into events and decides when to publish."""
+
+    def __init__(self):
+        self._in_zone = set()
+        self._approaching = set()
+        self._last_publish = 0.0
+
+    def events(self, tracks, born, lost, t):
+        """Return a list of event dicts for this frame (possibly empty)."""
+        events = []
+        for tr in born:
+            events.append({"type": "target_new", "track": tr["id"],
+                           "distance_mm": round(tr["distance_mm"])})
+        for tr in lost:
+            events.append({"type": "target_lost", "track": tr["id"]})
+            self._in_zone.discard(tr["id"])
+            self._approaching.discard(tr["id"])
+
+        for tr in tracks:
+            tid = tr["id"]
+            in_zone = tr["distance_mm"] <= PROXIMITY_ZONE_MM
+            if in_zone and tid not in self._in_zone:
+                self._in_zone.add(tid)
+                events.append({"type": "zone_enter", "track": tid,
+                               "distance_mm": round(tr["distance_mm"])})
+            elif not in_zone and tid in self._in_zone:
+                self._in_zone.discard(tid)
+                events.append({"type": "zone_exit", "track": tid})
+
+            ttc = tr["ttc_s"]
+            approaching = tr["hits"] >= VELOCITY_SETTLE_HITS and (
+                tr["velocity_mms"] <= -APPROACH_SPEED_MMS
+                or (ttc is not None and ttc <= TTC_ALERT_SEC))
+            if approaching and tid not in self._approaching:
+                self._approaching.add(tid)
+                events.append({"type": "approach", "track": tid,
+                               "velocity_mms": round(tr["velocity_mms"]),
+                               "ttc_s": round(ttc, 2) if ttc is not None else None})
+            elif not approaching:
+                self._approaching.discard(tid)
+        return events
+
+    def should_publish(self, events, tracks, t):
+        """Publish on any event, or as a heartbeat while tracks exist."""
+        if events or (tracks and t - self._last_publish >= HEARTBEAT_SEC):
+            self._last_publish = t
+            return True
+        return False
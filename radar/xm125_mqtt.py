@@ -1,22 +1,57 @@
 """
 XM125 Distance Detector to MQTT Publisher
 Production: Only pushes/prints if peaks are detected.
-All MQTT settings, client ID, and topic are dynamically loaded from JSON config and shell command.
+MQTT goes through the shared mqtt_lib client (config from
+/app/bodycam2/conf/config.json); publishes never block the measurement
+loop and are dropped while the broker is unreachable.
+
+The XM125 driver goes through i2c_lib (one persistent handle, bus lock
+shared with the IMU, which has priority) and reads contiguous registers
+(peak distances, peak strengths) in a single combined i2c_rdwr
+transaction.  `--bench N` runs N measurement cycles and reports I2C
+transactions, latency and wall time per cycle.
+
+`--continuous` measures at 10-20 Hz, tracks peaks between frames (see
+tracking.py) and publishes only when a target appears/disappears, enters
+the proximity zone or starts approaching fast, plus a periodic heartbeat.
+`--adaptive` additionally lowers the rate while the wearer is still and
+nothing is near (see scheduler.py).  `--delta` instead sends every frame
+at --rate as periodic keyframes plus compact deltas (see delta.py).
+
+`--record PATH` logs every frame's peaks for offline replay through
+tracker_bench.py; `--capture PATH.h5` stores full frames (status, result,
+peaks) in chunked HDF5 for param_sweep.py.
+
+Measurement and publishing run as two stages: an acquisition thread on a
+deadline schedule feeds a bounded queue (oldest frame dropped when full)
+and the main thread encodes and publishes.  Achieved frame rate, queue
+drops and late frames are printed every minute.
+
+Command completion is signalled by the module's MCU_INT line (rising edge
+when Busy clears) via gpiod.  The edge wait is bounded by the expected
+command time; a missed edge falls back to polling the status register for
+the rest of the timeout.  The line is checked with one measurement during
+init and released if it produces no edge, so the driver polls from then on.
 """
 
-import json
-import random
+import argparse
+import queue
 import signal
-import subprocess
 import sys
 import threading
 import time
 import traceback
+from datetime import timedelta
 
-import paho.mqtt.client as mqtt
-from smbus2 import SMBus, i2c_msg
+from delta import DeltaEncoder
+from scheduler import DutyScheduler
+from tracking import ChangeDetector, PeakTracker
 
-CONFIG_PATH = "/app/bodycam2/camera/conf/config.json"
+# Allow import of shared mqtt_lib module from /app/bodycam2/
+sys.path.insert(0, "/app/bodycam2")
+
+from i2c_lib import PRIORITY_LOW, i2c_msg, open_device
+from mqtt_lib import MQTTClient, load_config
 
 # ==============================
 #         CONFIGURATION
@@ -30,12 +65,21 @@ SIGNAL_QUALITY = 15000  # Higher = better SNR (and more power). Default 15000
 NUM_FRAMES_RECORDED = 100  # Used only if Threshold Method is RECORDED
 REFLECTOR_SHAPE = 1  # 1 = GENERIC, 2 = PLANAR
 MEASUREMENT_INTERVAL = 1  # (seconds)
+CONTINUOUS_RATE_HZ = 15  # Frame rate in --continuous mode (10-20 Hz)
+REPORT_INTERVAL_SEC = 60  # Print pipeline/duty/delta stats this often
+FRAME_QUEUE_SIZE = 32  # Frames buffered between acquisition and publishing
 
 # ==============================
 #      XM125 I2C Registers
 # ==============================
+I2C_BUS = 1
 I2C_ADDR = 0x52
 
+RADAR_INT_GPIO = 20  # XM125 MCU_INT: high when ready, low while busy
+BUSY_POLL_INTERVAL = 0.05  # (seconds) fallback when no interrupt line
+INT_WAIT_SEC = 0.3  # Edge wait for a measurement (sweep is well under this)
+INT_WAIT_LONG_SEC = 2.0  # Edge wait for configure / calibrate / reset
+
 REG_DETECTOR_STATUS = 0x0003
 REG_DISTANCE_RESULT = 0x0010
 REG_START = 0x0040
@@ -60,6 +104,9 @@ CMD_CALIBRATE = 4
 CMD_RECALIBRATE = 5
 CMD_RESET_MODULE = 1381192737
 
+STATUS_BUSY = 0x80000000
+STATUS_READY_MASK = 0x000003FF  # RSS/config/sensor/detector/buffer/calibration OK bits
+
 ERROR_MASK = (
     0x00010000
     | 0x00020000
@@ -74,150 +121,200 @@ ERROR_MASK = (
     | 0x10000000
 )
 
+# Registers written by initialize_detector(), in write order.  Read back on
+# startup/recovery to decide whether the module still holds our config.
+DESIRED_CONFIG = (
+    (REG_START, START_MM),
+    (REG_END, END_MM),
+    (REG_THRESHOLD_SENSITIVITY, THRESHOLD_SENS),
+    (REG_THRESHOLD_METHOD, THRESHOLD_METHOD),
+    (REG_MAX_STEP_LENGTH, MAX_STEP_LENGTH),
+    (REG_SIGNAL_QUALITY, SIGNAL_QUALITY),
+    (REG_NUM_FRAMES_REC, NUM_FRAMES_RECORDED),
+    (REG_REFLECTOR_SHAPE, REFLECTOR_SHAPE),
+    (REG_MEASURE_ON_WAKEUP, 0),
+)
+
 # ==============================
 #         GLOBALS
 # ==============================
 exit_event = threading.Event()
 
 # ==============================
-#   CONFIG LOADING FUNCTIONS
+#        XM125 I2C DRIVER
 # ==============================
+class XM125:
+    """XM125 register access through the shared i2c_lib bus 1 handle.
+
+    Registers are 32-bit big-endian behind a 16-bit address.  The module
+    auto-increments the address on reads, so N consecutive registers come
+    back in one read.  Every call is a single i2c_rdwr ioctl (repeated
+    start between address write and data read); `transactions` counts them.
+    """
+
+    def __init__(self, bus_num=I2C_BUS, addr=I2C_ADDR, int_request=None):
+        self.bus_num = bus_num
+        self.addr = addr
+        # Low priority: frames have tens of ms of slack, the IMU's 100 Hz
+        # reads on the same bus do not
+        self.i2c = open_device(bus_num, addr, "xm125", PRIORITY_LOW)
+        self.int_request = int_request
+        self.transactions = 0
 
+    def close(self):
+        if self.i2c is not None:
+            self.i2c.bus.close()
+            self.i2c = None
+        self.release_int()
+
+    def release_int(self):
+        """Give up the MCU_INT line; completion is polled from then on."""
+        if self.int_request is not None:
+            try:
+                self.int_request.release()
+            except Exception:
+                pass
+            self.int_request = None
+
+    def clear_int(self):
+        """Drop stale MCU_INT edges before issuing a new command."""
+        if self.int_request is not None:
+            while self.int_request.wait_edge_events(timeout=timedelta(0)):
+                self.int_request.read_edge_events()
+
+    def wait_int(self, timeout):
+        """Wait for the ready edge. Returns False on timeout or without a line."""
+        if self.int_request is None:
+            return False
+        if self.int_request.wait_edge_events(timeout=timedelta(seconds=timeout)):
+            self.int_request.read_edge_events()
+            return True
+        return False
 
-def load_config(path=CONFIG_PATH):
-    """Load config JSON, return as dict. Exits with log if critical error."""
-    try:
-        with open(path, "r") as f:
-            cfg = json.load(f)
-    except FileNotFoundError:
-        print(f"[CONFIG] ERROR: Config file not found at {path}. Exiting.")
-        sys.exit(100)
-    except Exception as e:
-        print(f"[CONFIG] ERROR: Failed to read config: {e}")
-        sys.exit(101)
-    return cfg
-
-
-def get_shell_output(command):
-    """Runs shell command and returns stdout as string (stripped)."""
-    try:
-        output = subprocess.check_output(
-            command, shell=True, stderr=subprocess.STDOUT, universal_newlines=True
-        )
-        return output.strip()
-    except Exception as e:
-        print(
-            f"[CONFIG] ERROR: Failed to run shell command for client_id: '{command}' -> {e}"
+    def write_reg(self, reg, value):
+        """Write a 32-bit register at the given 16-bit address (big-endian)."""
+        data = reg.to_bytes(2, "big") + value.to_bytes(4, "big", signed=False)
+        try:
+            self.i2c.i2c_rdwr(i2c_msg.write(self.addr, data))
+            self.transactions += 1
+        except Exception as e:
+            print(f"[I2C] Write error at reg 0x{reg:04X}: {e}")
+            raise
+
+    def read_blocks(self, blocks):
+        """Read several runs of consecutive registers in one transaction.
+
+        `blocks` is a list of (start_reg, count).  Returns one list of raw
+        4-byte values per block.
+        """
+        msgs = []
+        reads = []
+        for reg, count in blocks:
+            read = i2c_msg.read(self.addr, 4 * count)
+            msgs.append(i2c_msg.write(self.addr, reg.to_bytes(2, "big")))
+            msgs.append(read)
+            reads.append(read)
+        try:
+            self.i2c.i2c_rdwr(*msgs)
+            self.transactions += 1
+        except Exception as e:
+            regs = ", ".join(f"0x{reg:04X}+{count}" for reg, count in blocks)
+            print(f"[I2C] Read error at reg {regs}: {e}")
+            raise
+        out = []
+        for read in reads:
+            data = bytes(read)
+            out.append([data[i:i + 4] for i in range(0, len(data), 4)])
+        return out
+
+    def read_regs(self, reg, count, signed=False):
+        """Read `count` consecutive 32-bit registers starting at `reg`."""
+        words = self.read_blocks([(reg, count)])[0]
+        return [int.from_bytes(w, "big", signed=signed) for w in words]
+
+    def read_reg(self, reg):
+        """Read an unsigned 32-bit register."""
+        return self.read_regs(reg, 1)[0]
+
+    def read_reg_signed(self, reg):
+        """Read a signed 32-bit register."""
+        return self.read_regs(reg, 1, signed=True)[0]
+
+    def read_peaks(self, num_distances):
+        """Return [(distance_mm, strength), ...] for the first N peaks,
+        reading both register runs in one transaction."""
+        dist_words, strength_words = self.read_blocks(
+            [(PEAK_DIST_BASE, num_distances), (PEAK_STRENGTH_BASE, num_distances)]
         )
-        return None
-
-
-def build_mqtt_settings(cfg):
-    """Returns dict with all required MQTT settings built from config.json and rules."""
-    # Sanity checks and fallbacks
-    for k in ("server", "port_s", "username", "client_id"):
-        if k not in cfg:
-            print(f"[CONFIG] ERROR: Missing key '{k}' in config file.")
-            sys.exit(102)
-
-    # Broker/server
-    mqtt_broker = cfg.get("server")
-    try:
-        mqtt_port = int(cfg.get("port_s"))
-    except Exception:
-        print("[CONFIG] ERROR: Invalid port_s value in config, must be int.")
-        sys.exit(103)
-
-    mqtt_username = cfg.get("username")
-    mqtt_password = cfg.get("password", "")
-
-    mqtt_keepalive = int(cfg.get("keepalive", 20))
-    mqtt_ws_path = cfg.get("path", "/mqtt")
-    mqtt_use_ws = True  # Always True, matches your current logic
-    mqtt_protocol = mqtt.MQTTv5  # Or mqtt.MQTTv311 if you need to support old brokers
-
-    # Special: client_id is a shell command
-    base_id = get_shell_output(cfg.get("client_id"))
-    if not base_id:
-        print("[CONFIG] ERROR: Could not determine base client_id, exiting.")
-        sys.exit(104)
-
-    rand_num = random.randint(10, 99)  # Always 2-digit
-    mqtt_client_id = f"{base_id}-{rand_num}"
-    mqtt_topic = f"device/{base_id}/distance"  # final topic with path
-    print(f"[MQTT] INFO: MQTT_TOPIC: {mqtt_topic}.")
-    print(f"[MQTT] INFO: MQTT_CLIENT_ID: {mqtt_client_id}.")
-
-    # Return all needed settings
-    return dict(
-        broker=mqtt_broker,
-        port=mqtt_port,
-        username=mqtt_username,
-        password=mqtt_password,
-        keepalive=mqtt_keepalive,
-        ws_path=mqtt_ws_path,
-        use_ws=mqtt_use_ws,
-        protocol=mqtt_protocol,
-        topic=mqtt_topic,
-        client_id=mqtt_client_id,
-    )
+        return [
+            (int.from_bytes(d, "big"), int.from_bytes(st, "big", signed=True))
+            for d, st in zip(dist_words, strength_words)
+        ]
 
 
-# ==============================
-#       LOW-LEVEL I2C OPS
-# ==============================
-def write_reg(addr, value):
-    """Write a 32-bit register at the given 16-bit address (big-endian)."""
-    data = addr.to_bytes(2, "big") + value.to_bytes(4, "big", signed=False)
+def setup_gpio_interrupt(gpio_pin):
+    """Return a gpiod LineRequest for MCU_INT rising edges, or None on failure."""
     try:
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(I2C_ADDR, data[0], list(data[1:]))
-    except Exception as e:
-        print(f"[I2C] Write error at reg 0x{addr:04X}: {e}")
-        raise
-
+        import gpiod
+        from gpiod.line import Edge
 
-def read_reg(addr):
-    """Read an unsigned 32-bit register at the given 16-bit address (big-endian)."""
-    try:
-        with SMBus(1) as bus:
-            addr_bytes = addr.to_bytes(2, "big")
-            bus.i2c_rdwr(i2c_msg.write(I2C_ADDR, addr_bytes))
-            read = i2c_msg.read(I2C_ADDR, 4)
-            bus.i2c_rdwr(read)
-            data = bytes(read)
-            return int.from_bytes(data, "big", signed=False)
+        chip = gpiod.Chip("/dev/gpiochip0")
+        settings = gpiod.LineSettings(edge_detection=Edge.RISING)
+        request = chip.request_lines(
+            config={gpio_pin: settings}, consumer="xm125-radar"
+        )
+        print(f"[GPIO] MCU_INT on GPIO {gpio_pin} ready (gpiod v2, rising edge)")
+        return request
     except Exception as e:
-        print(f"[I2C] Read error at reg 0x{addr:04X}: {e}")
-        raise
-
+        print(f"[GPIO] Setup failed: {e} -- falling back to busy polling")
+        return None
 
-def read_reg_signed(addr):
-    """Read a signed 32-bit register at the given 16-bit address (big-endian)."""
-    try:
-        with SMBus(1) as bus:
-            addr_bytes = addr.to_bytes(2, "big")
-            bus.i2c_rdwr(i2c_msg.write(I2C_ADDR, addr_bytes))
-            read = i2c_msg.read(I2C_ADDR, 4)
-            bus.i2c_rdwr(read)
-            data = bytes(read)
-            return int.from_bytes(data, "big", signed=True)
-    except Exception as e:
-        print(f"[I2C] Read (signed) error at reg 0x{addr:04X}: {e}")
-        raise
 
+def poll_not_busy(dev, timeout=5.0, int_wait=INT_WAIT_SEC):
+    """Wait until Busy bit clears or timeout, else raise.
 
-def poll_not_busy(timeout=5.0):
-    """Poll until Busy bit clears or timeout, else raise."""
+    Blocks on the MCU_INT edge for at most `int_wait` (the expected
+    command time), then confirms with one status read; if the edge does
+    not show up, polls the status register for the rest of `timeout`.
+    """
     t0 = time.time()
+    if dev.wait_int(min(int_wait, timeout)):
+        status = dev.read_reg(REG_DETECTOR_STATUS)
+        if (status & 0x80000000) == 0:
+            return status
     while time.time() - t0 < timeout:
-        status = read_reg(REG_DETECTOR_STATUS)
+        status = dev.read_reg(REG_DETECTOR_STATUS)
         if (status & 0x80000000) == 0:  # Busy bit is bit 31
             return status
-        time.sleep(0.05)
+        time.sleep(BUSY_POLL_INTERVAL)
     raise TimeoutError("Timeout waiting for busy to clear.")
 
 
+def run_command(dev, cmd, timeout, int_wait=INT_WAIT_SEC):
+    """Issue a detector command and wait for completion. Returns status."""
+    dev.clear_int()
+    dev.write_reg(REG_COMMAND, cmd)
+    return poll_not_busy(dev, timeout, int_wait)
+
+
+def check_int_line(dev):
+    """Confirm MCU_INT with one measurement; release the line if no edge.
+
+    Without this a miswired or wrong --int-gpio line would cost the full
+    edge wait on every command.
+    """
+    if dev.int_request is None:
+        return
+    dev.clear_int()
+    dev.write_reg(REG_COMMAND, CMD_MEASURE_DISTANCE)
+    if dev.wait_int(INT_WAIT_LONG_SEC):
+        print("[GPIO] MCU_INT edge confirmed")
+    else:
+        print("[GPIO] No MCU_INT edge on a measurement -- releasing the line, polling from now on")
+        dev.release_int()
+    poll_not_busy(dev, 5, 0)
+
+
 def check_no_errors(status):
     """Check if status has any error bits set."""
     if status & ERROR_MASK:
@@ -226,62 +323,128 @@ def check_no_errors(status):
     return True
 
 
-def do_reset():
+def do_reset(dev):
     """Send RESET MODULE command and poll until not busy."""
     print("[XM125] Resetting module...")
-    write_reg(REG_COMMAND, CMD_RESET_MODULE)
+    dev.clear_int()
+    dev.write_reg(REG_COMMAND, CMD_RESET_MODULE)
     time.sleep(0.5)
     try:
-        poll_not_busy(8)
+        poll_not_busy(dev, 8, INT_WAIT_LONG_SEC)
     except TimeoutError:
         print("[XM125] Reset busy timeout, may not have completed!")
-    status = read_reg(REG_DETECTOR_STATUS)
+    status = dev.read_reg(REG_DETECTOR_STATUS)
     print(f"[XM125] Status after reset: 0x{status:08X}")
     return status
 
 
-def initialize_detector():
-    """Fully initialize, configure and calibrate the detector. Retries until success."""
+def config_matches(dev):
+    """Read back the tunable registers (one transaction) and compare."""
+    cfg_words, wake_words = dev.read_blocks(
+        [(REG_START, REG_REFLECTOR_SHAPE - REG_START + 1), (REG_MEASURE_ON_WAKEUP, 1)]
+    )
+    current = {
+        REG_START + i: int.from_bytes(w, "big") for i, w in enumerate(cfg_words)
+    }
+    current[REG_MEASURE_ON_WAKEUP] = int.from_bytes(wake_words[0], "big")
+    return all(current[reg] == value for reg, value in DESIRED_CONFIG)
+
+
+def detector_ready(status):
+    """True if the status shows a configured, calibrated, idle detector."""
+    return (
+        not (status & (ERROR_MASK | STATUS_BUSY))
+        and (status & STATUS_READY_MASK) == STATUS_READY_MASK
+    )
+
+
+def configure_and_calibrate(dev):
+    """Write tunables, apply configuration and calibrate. Returns success."""
+    print("[XM125] Writing tunable parameters...")
+    for reg, value in DESIRED_CONFIG:
+        dev.write_reg(reg, value)
+    time.sleep(0.1)
+    print("[XM125] Applying configuration...")
+    status = run_command(dev, CMD_APPLY_CONFIGURATION, 6, INT_WAIT_LONG_SEC)
+    print(f"[XM125] After config: 0x{status:08X}")
+    if not check_no_errors(status):
+        print("[XM125] Config error.")
+        return False
+    print("[XM125] Calibrating...")
+    status = run_command(dev, CMD_CALIBRATE, 8, INT_WAIT_LONG_SEC)
+    print(f"[XM125] After calibrate: 0x{status:08X}")
+    if not check_no_errors(status):
+        print("[XM125] Calibration error.")
+        return False
+    return True
+
+
+def recalibrate(dev):
+    """Run CMD_RECALIBRATE on an already configured detector. Returns success."""
+    print("[XM125] Recalibrating...")
+    status = run_command(dev, CMD_RECALIBRATE, 8, INT_WAIT_LONG_SEC)
+    print(f"[XM125] After recalibrate: 0x{status:08X}")
+    return check_no_errors(status)
+
+
+def warm_init(dev, calib_needed=False):
+    """Try to bring the detector up without a module reset.
+
+    Returns the path taken ("warm", "recalibrate", "reconfigure") or None
+    if the module shows error bits or the cheap paths failed, in which
+    case the caller must do a full reset.
+    """
+    status = dev.read_reg(REG_DETECTOR_STATUS)
+    print(f"[XM125] Status: 0x{status:08X}")
+    if status & (ERROR_MASK | STATUS_BUSY):
+        return None
+    if not config_matches(dev):
+        print("[XM125] Configuration differs, rewriting without reset.")
+        return "reconfigure" if configure_and_calibrate(dev) else None
+    if (status & STATUS_READY_MASK) != STATUS_READY_MASK:
+        return "reconfigure" if configure_and_calibrate(dev) else None
+    if calib_needed:
+        return "recalibrate" if recalibrate(dev) else None
+    return "warm"
+
+
+def initialize_detector(dev, warm=True, calib_needed=False):
+    """Bring the detector to a configured, calibrated state. Retries until success.
+
+    With `warm`, first reads back status and configuration and skips the
+    reset (and, when nothing changed, the calibration) if the module is
+    already set up; the full reset/configure/calibrate sequence is only
+    used when error bits are set or the warm path fails.  Returns the
+    path taken ("warm", "recalibrate", "reconfigure" or "cold").
+    """
+    t0 = time.perf_counter()
+    if warm:
+        try:
+            path = warm_init(dev, calib_needed)
+            if path:
+                check_int_line(dev)
+                print(f"[XM125] Detector ready ({path}) in {time.perf_counter() - t0:.2f} s\n")
+                return path
+        except Exception as e:
+            print(f"[XM125] Warm init failed: {e}")
+        print("[XM125] Falling back to full reset.")
+
     while not exit_event.is_set():
         try:
-            do_reset()
-            status = read_reg(REG_DETECTOR_STATUS)
+            do_reset(dev)
+            status = dev.read_reg(REG_DETECTOR_STATUS)
             print(f"[XM125] Initial status: 0x{status:08X}")
-            if (status & ERROR_MASK) or (status & 0x80000000):
+            if (status & ERROR_MASK) or (status & STATUS_BUSY):
                 print("[XM125] Error/busy on boot, retrying reset.")
                 time.sleep(0.5)
                 continue
-            print("[XM125] Writing tunable parameters...")
-            write_reg(REG_START, START_MM)
-            write_reg(REG_END, END_MM)
-            write_reg(REG_THRESHOLD_SENSITIVITY, THRESHOLD_SENS)
-            write_reg(REG_THRESHOLD_METHOD, THRESHOLD_METHOD)
-            write_reg(REG_MAX_STEP_LENGTH, MAX_STEP_LENGTH)
-            write_reg(REG_SIGNAL_QUALITY, SIGNAL_QUALITY)
-            write_reg(REG_NUM_FRAMES_REC, NUM_FRAMES_RECORDED)
-            write_reg(REG_REFLECTOR_SHAPE, REFLECTOR_SHAPE)
-            write_reg(REG_MEASURE_ON_WAKEUP, 0)
-            time.sleep(0.1)
-            print("[XM125] Applying configuration...")
-            write_reg(REG_COMMAND, CMD_APPLY_CONFIGURATION)
-            poll_not_busy(6)
-            status = read_reg(REG_DETECTOR_STATUS)
-            print(f"[XM125] After config: 0x{status:08X}")
-            if not check_no_errors(status):
-                print("[XM125] Config error, retrying full init.")
+            if not configure_and_calibrate(dev):
+                print("[XM125] Retrying full init.")
                 time.sleep(1)
                 continue
-            print("[XM125] Calibrating...")
-            write_reg(REG_COMMAND, CMD_CALIBRATE)
-            poll_not_busy(8)
-            status = read_reg(REG_DETECTOR_STATUS)
-            print(f"[XM125] After calibrate: 0x{status:08X}")
-            if not check_no_errors(status):
-                print("[XM125] Calibration error, retrying full init.")
-                time.sleep(1)
-                continue
-            print("[XM125] Detector ready.\n")
-            return True
+            check_int_line(dev)
+            print(f"[XM125] Detector ready (cold) in {time.perf_counter() - t0:.2f} s\n")
+            return "cold"
         except Exception as e:
             print(f"[XM125] Initialization exception: {e}")
             traceback.print_exc()
@@ -290,111 +453,202 @@ def initialize_detector():
     sys.exit(111)
 
 
-# ==============================
-#      MQTT PUBLISHER CLASS
-# ==============================
-class MQTTPublisher:
-    """MQTT publisher for the XM125 data, all params dynamic."""
-
-    def __init__(self, mqtt_settings):
-        self.connected = False
-        self._closed = False
-        self.settings = mqtt_settings
-
-        # Set up the client
-        self.client = mqtt.Client(
-            mqtt.CallbackAPIVersion.VERSION2,
-            client_id=self.settings["client_id"],
-            protocol=self.settings["protocol"],
-            transport="websockets" if self.settings["use_ws"] else "tcp",
-        )
-
-        if self.settings["username"]:
-            self.client.username_pw_set(
-                self.settings["username"], self.settings["password"]
-            )
-        self._setup_callbacks()
-
-    def _setup_callbacks(self):
-        def on_connect(client, userdata, flags, reason_code, properties):
-            if hasattr(reason_code, "value") and reason_code.value == 0:
-                print("[MQTT] Connected successfully.")
-                self.connected = True
-            elif reason_code == 0:
-                print("[MQTT] Connected successfully (int reason_code).")
-                self.connected = True
-            else:
-                print(f"[MQTT] Connect failed, reason: {reason_code}")
-                self.connected = False
-
-        def on_disconnect(client, userdata, flags, reason_code, properties):
-            print(f"[MQTT] Disconnected, reason: {reason_code}")
-            self.connected = False
-
-        self.client.on_connect = on_connect
-        self.client.on_disconnect = on_disconnect
-
-    def connect(self):
-        while not self.connected and not exit_event.is_set():
-            try:
-                if self.settings["use_ws"]:
-                    self.client.tls_set()
-                    self.client.ws_set_options(path=self.settings["ws_path"])
-                self.client.connect(
-                    self.settings["broker"],
-                    self.settings["port"],
-                    keepalive=self.settings["keepalive"],
-                )
-                self.client.loop_start()
-                for _ in range(100):
-                    if self.connected:
-                        break
-                    time.sleep(0.1)
-                if not self.connected:
-                    print("[MQTT] Waiting for broker connection...")
-            except Exception as e:
-                # print(f"[MQTT] Connect error: {e}. Retrying in 5 sec.")
-                print(f"[MQTT] Connect error: {e}. Exiting.")
-                exit(-1)
-                # time.sleep(5)
-
-    def publish(self, payload):
-        """Publish a payload (dict or string) to the MQTT topic."""
-        if not self.connected and not exit_event.is_set():
-            self.connect()
-        try:
-            if isinstance(payload, dict):
-                payload = json.dumps(payload)
-            result = self.client.publish(self.settings["topic"], payload, qos=0)
-            if result.rc != mqtt.MQTT_ERR_SUCCESS:
-                print(f"[MQTT] Publish failed, code: {result.rc}")
-        except Exception as e:
-            print(f"[MQTT] Publish exception: {e}")
-
-    def close(self):
-        if not self._closed:
-            self.client.loop_stop()
-            self.client.disconnect()
-            self._closed = True
-
-
 # ==============================
 #      MAIN LOGIC LOOP
 # ==============================
-def get_peaks(num_distances):
+def get_peaks(dev, num_distances):
     """Return a list of peaks: each is (distance_mm, strength) tuple."""
-    peaks = []
-    for i in range(num_distances):
+    try:
+        return dev.read_peaks(num_distances)
+    except Exception as e:
+        print(f"[XM125] Error reading {num_distances} peaks: {e}")
+        return [(None, None)] * num_distances
+
+
+def measure_once(dev):
+    """Run one measurement cycle.
+
+    Returns (status, result, peaks); peaks is empty when nothing was
+    detected.  Raises on I2C errors or busy timeout.
+    """
+    status = run_command(dev, CMD_MEASURE_DISTANCE, 5)
+    if not check_no_errors(status):
+        return status, None, []
+    result = dev.read_reg(REG_DISTANCE_RESULT)
+    num_distances = result & 0xF
+    peaks = get_peaks(dev, num_distances) if num_distances > 0 else []
+    return status, result, peaks
+
+
+def run_benchmark(dev, cycles):
+    """Print init/recovery times, then I2C transactions and wall time per cycle."""
+    for label, kwargs in (
+        ("startup", {}),
+        ("warm restart", {}),
+        ("recalibrate", {"calib_needed": True}),
+        ("cold init", {"warm": False}),
+    ):
+        t0 = time.perf_counter()
+        path = initialize_detector(dev, **kwargs)
+        print(f"[Bench] {label}: {path} path, {time.perf_counter() - t0:.2f} s")
+    dev.transactions = 0
+    peaks_total = 0
+    t0 = time.perf_counter()
+    for _ in range(cycles):
+        _status, _result, peaks = measure_once(dev)
+        peaks_total += len(peaks)
+    elapsed = time.perf_counter() - t0
+    print(
+        f"[Bench] {cycles} cycles | {dev.transactions / cycles:.1f} I2C transactions/cycle"
+        f" | {elapsed / cycles * 1000:.1f} ms/cycle | {peaks_total / cycles:.2f} peaks/cycle"
+    )
+    print(f"[Bench] I2C {dev.i2c.summary()}")
+
+
+def build_message(device_id, status, result, peaks):
+    """Compose the MQTT payload for one measurement."""
+    num_distances = result & 0xF
+    near_start = (result >> 8) & 0x1
+    calib_needed = (result >> 9) & 0x1
+    temp = (result >> 16) & 0xFFFF
+
+    # --- Find strongest peak ---
+    strongest = None
+    if peaks and all(x is not None for x in peaks):
+        valid = [
+            (i, d, s)
+            for i, (d, s) in enumerate(peaks)
+            if d is not None and s is not None
+        ]
+        if valid:
+            i_best, d_best, s_best = max(valid, key=lambda x: abs(x[2]))
+            strongest = {
+                "index": i_best,
+                "distance_mm": d_best,
+                "strength": s_best,
+            }
+
+    return {
+        "device_id": device_id,
+        "device_type": "camera",
+        "status": status,
+        "result": result,
+        "temperature": temp,
+        "num_peaks": num_distances,
+        "near_start_edge": bool(near_start),
+        "calibration_needed": bool(calib_needed),
+        "peaks": [
+            {"index": i, "distance_mm": d, "strength": s}
+            for i, (d, s) in enumerate(peaks)
+        ],
+        "strongest_distance": strongest,
+        "ts": int(time.time()),
+    }
+
+
+def format_peak_log_line(t, peaks):
+    """One frame of the --record log: ``t d:s d:s ...`` (empty frame = just t)."""
+    fields = [f"{t:.4f}"] + [f"{d}:{s}" for d, s in peaks if d is not None]
+    return " ".join(fields) + "\n"
+
+
+class Acquisition(threading.Thread):
+    """Measurement stage: runs the detector on a fixed-rate schedule.
+
+    Each frame is pushed as (monotonic_t, status, result, peaks) into a
+    bounded queue; when the publisher falls behind, the oldest frame is
+    dropped so the queue always holds the most recent data.  Deadlines
+    advance by `period` from the previous deadline, not from the end of
+    the work, so processing time does not stretch the cadence.  `period`
+    may be changed from another thread.
+    """
+
+    def __init__(self, dev, frames, period):
+        super().__init__(name="xm125-acquisition", daemon=True)
+        self.dev = dev
+        self.frames = frames
+        self.period = period
+        self.count = 0
+        self.drops = 0
+        self.late = 0
+        self.recoveries = 0
+        self._window_t = time.monotonic()
+        self._window_count = 0
+
+    def _push(self, frame):
         try:
-            peak_addr = PEAK_DIST_BASE + i
-            strength_addr = PEAK_STRENGTH_BASE + i
-            dist_mm = read_reg(peak_addr)
-            strength = read_reg_signed(strength_addr)
-            peaks.append((dist_mm, strength))
-        except Exception as e:
-            print(f"[XM125] Error reading peak {i}: {e}")
-            peaks.append((None, None))
-    return peaks
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            try:
+                self.frames.get_nowait()
+                self.drops += 1
+            except queue.Empty:
+                pass
+            self.frames.put_nowait(frame)
+        self.count += 1
+
+    def _recover(self, **kwargs):
+        self.recoveries += 1
+        initialize_detector(self.dev, **kwargs)
+
+    def run(self):
+        next_frame = time.monotonic()
+        while not exit_event.is_set():
+            try:
+                status, result, peaks = measure_once(self.dev)
+                if result is None:
+                    # Error bits in the status register: full reset
+                    print(
+                        "[XM125] Measurement error detected. Re-initializing detector..."
+                    )
+                    self._recover(warm=False)
+                    next_frame = time.monotonic()
+                    continue
+                if (result >> 10) & 0x1 or (result >> 9) & 0x1:
+                    print(
+                        "[XM125] Measurement/calibration error. Recovering detector..."
+                    )
+                    self._recover(calib_needed=True)
+                    next_frame = time.monotonic()
+                    continue
+                self._push((time.monotonic(), status, result, peaks))
+
+            except Exception as e:
+                if exit_event.is_set():
+                    break
+                print(f"[Main] Unhandled error: {e}")
+                traceback.print_exc()
+                exit_event.wait(2)
+                # I2C glitch or timeout: warm path checks whether the
+                # module actually lost its state before resetting it
+                self._recover()
+                next_frame = time.monotonic()
+                continue
+
+            # Fixed-rate schedule: sleep to the next deadline
+            next_frame += self.period
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                exit_event.wait(delay)
+            else:
+                self.late += 1
+                next_frame = time.monotonic()
+
+    def report(self, now, depth):
+        """Achieved frame rate since the last report plus cumulative counters."""
+        elapsed = now - self._window_t
+        rate = (self.count - self._window_count) / elapsed if elapsed > 0 else 0.0
+        self._window_t = now
+        self._window_count = self.count
+        return {
+            "target_hz": round(1.0 / self.period, 2),
+            "achieved_hz": round(rate, 2),
+            "frames": self.count,
+            "queue_drops": self.drops,
+            "late": self.late,
+            "recoveries": self.recoveries,
+            "queue_depth": depth,
+        }
 
 
 def handle_exit_signal(signum, frame):
@@ -409,104 +663,187 @@ def main():
     if hasattr(signal, "SIGHUP"):
         signal.signal(signal.SIGHUP, handle_exit_signal)
 
+    parser = argparse.ArgumentParser(description="XM125 Distance Detector -> MQTT")
+    parser.add_argument("--bench", type=int, metavar="N",
+                        help="Run N measurement cycles, report I2C cost, and exit")
+    parser.add_argument("--continuous", action="store_true",
+                        help="Measure at --rate Hz and publish only on tracked changes")
+    parser.add_argument("--rate", type=float, default=CONTINUOUS_RATE_HZ,
+                        help="Continuous mode frame rate (default: %(default)s Hz)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Continuous mode with the rate driven by IMU motion and targets")
+    parser.add_argument("--delta", action="store_true",
+                        help="Every frame at --rate, sent as keyframes + deltas")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Append every frame's peaks to a log (for tracker_bench.py)")
+    parser.add_argument("--capture", metavar="PATH.h5",
+                        help="Append every frame to a chunked HDF5 capture (for param_sweep.py)")
+    parser.add_argument("--no-interrupt", action="store_true",
+                        help="Poll the busy bit instead of waiting on MCU_INT")
+    parser.add_argument("--int-gpio", type=int, default=RADAR_INT_GPIO,
+                        help="GPIO wired to XM125 MCU_INT (default: %(default)s)")
+    args = parser.parse_args()
+    if args.adaptive:
+        args.continuous = True
+    if args.delta and args.continuous:
+        parser.error("--delta cannot be combined with --continuous/--adaptive")
+
     print("===== XM125 Distance Detector → MQTT Publisher =====")
 
-    cfg = load_config()
-    mqtt_settings = build_mqtt_settings(cfg)
-    mqtt_pub = MQTTPublisher(mqtt_settings)
+    int_request = None
+    if not args.no_interrupt:
+        int_request = setup_gpio_interrupt(args.int_gpio)
+    dev = XM125(int_request=int_request)
+
+    if args.bench:
+        try:
+            run_benchmark(dev, args.bench)
+        finally:
+            dev.close()
+        return
+
+    config = load_config()
+    device_id = config["device_id"]
+    topic = f"device/{device_id}/distance"
+    print(f"[MQTT] INFO: MQTT_TOPIC: {topic}.")
+    mqtt_client = MQTTClient(config, exit_event)
+
+    tracker = PeakTracker()
+    changes = ChangeDetector()
+    period = 1.0 / args.rate
+    duty = DutyScheduler(args.rate) if args.adaptive else None
+    encoder = DeltaEncoder(device_id) if args.delta else None
+    last_report = time.monotonic()
+    peak_log = None
+    capture = None
+    frames = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    acq = None
 
     try:
-        initialize_detector()
-        mqtt_pub.connect()
+        if args.record:
+            peak_log = open(args.record, "a", buffering=1 << 16)
+            print(f"[Main] Recording peaks to {args.record}")
+        if args.capture:
+            from capture import FrameCapture
+
+            capture = FrameCapture(args.capture, {
+                "start_mm": START_MM,
+                "end_mm": END_MM,
+                "threshold_sensitivity": THRESHOLD_SENS,
+                "threshold_method": THRESHOLD_METHOD,
+                "max_step_length": MAX_STEP_LENGTH,
+                "signal_quality": SIGNAL_QUALITY,
+                "reflector_shape": REFLECTOR_SHAPE,
+            })
+            print(f"[Main] Capturing frames to {args.capture}")
+        initialize_detector(dev)
+        # Connect in the background: measurements start right away and
+        # publish_nowait() drops frames until the broker is reachable.
+        # paho reconnects on its own after that, so a network drop never
+        # touches the detector.
+        threading.Thread(target=mqtt_client.connect, name="mqtt-connect",
+                         daemon=True).start()
         print("Detector initialized. Beginning measurement loop.\n")
+        if args.continuous:
+            mode = "adaptive, up to" if duty else "continuous mode at"
+            print(f"[Main] {mode} {args.rate:.1f} Hz")
+        elif encoder is not None:
+            print(f"[Main] Delta stream at {args.rate:.1f} Hz")
+        acq = Acquisition(
+            dev, frames,
+            1.0 / args.rate if args.continuous or encoder else MEASUREMENT_INTERVAL,
+        )
+        acq.start()
 
+        # Publisher stage: everything after the I2C reads runs here, so
+        # JSON encoding and MQTT never delay the next measurement.
         while not exit_event.is_set():
             try:
-                # 1. Trigger distance measurement
-                write_reg(REG_COMMAND, CMD_MEASURE_DISTANCE)
-                poll_not_busy(5)
-                status = read_reg(REG_DETECTOR_STATUS)
-                if not check_no_errors(status):
-                    print(
-                        "[XM125] Measurement error detected. Re-initializing detector..."
-                    )
-                    initialize_detector()
-                    continue
+                now, status, result, peaks = frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
 
-                result = read_reg(REG_DISTANCE_RESULT)
+            try:
                 num_distances = result & 0xF
                 near_start = (result >> 8) & 0x1
                 calib_needed = (result >> 9) & 0x1
                 measure_error = (result >> 10) & 0x1
                 temp = (result >> 16) & 0xFFFF
 
-                if measure_error or calib_needed:
-                    print(
-                        "[XM125] Measurement/calibration error. Re-initializing detector..."
-                    )
-                    initialize_detector()
-                    continue
+                if peak_log is not None:
+                    peak_log.write(format_peak_log_line(now, peaks))
+                if capture is not None:
+                    capture.add(now, status, result, peaks)
+
+                if args.continuous:
+                    tracks, born, lost = tracker.update(peaks, now)
+                    events = changes.events(tracks, born, lost, now)
+                    if changes.should_publish(events, tracks, now):
+                        msg = build_message(device_id, status, result, peaks)
+                        msg["tracks"] = [
+                            {
+                                "id": tr["id"],
+                                "distance_mm": round(tr["distance_mm"]),
+                                "velocity_mms": round(tr["velocity_mms"]),
+                                "ttc_s": None if tr["ttc_s"] is None else round(tr["ttc_s"], 2),
+                                "strength": tr["strength"],
+                            }
+                            for tr in tracks
+                        ]
+                        msg["events"] = events
+                        for ev in events:
+                            print(f"[Track] {ev}")
+                        mqtt_client.publish_nowait(topic, msg)
+
+                    if duty is not None:
+                        _profile, acq.period = duty.update(tracks, now, peaks)
 
-                if num_distances > 0:
-                    peaks = get_peaks(num_distances)
+                elif encoder is not None:
+                    data = encoder.encode(status, result, peaks, now, int(time.time()))
+                    if data is not None:
+                        mqtt_client.publish_nowait(topic, data)
+
+                elif num_distances > 0:
                     print(
                         f"Status: 0x{status:08X} | Result: 0x{result:08X} | Peaks: {num_distances} | Temp: {temp} | NearEdge: {near_start} | Calib: {calib_needed} | Error: {measure_error}"
                     )
                     for i, (dist_mm, strength) in enumerate(peaks):
                         print(f"  Peak {i}: {dist_mm} mm, Strength: {strength}")
 
-                    # --- Find strongest peak ---
-                    strongest = None
-                    if peaks and all(x is not None for x in peaks):
-                        valid = [
-                            (i, d, s)
-                            for i, (d, s) in enumerate(peaks)
-                            if d is not None and s is not None
-                        ]
-                        if valid:
-                            i_best, d_best, s_best = min(valid, key=lambda x: abs(x[2]))
-                            strongest = {
-                                "index": i_best,
-                                "distance_mm": d_best,
-                                "strength": s_best,
-                            }
-
                     # Compose payload and publish only if peaks exist
-                    msg = {
-                        "device_id": mqtt_settings["client_id"][:-3],
-                        "device_type": "camera",
-                        "status": status,
-                        "result": result,
-                        "temperature": temp,
-                        "num_peaks": num_distances,
-                        "near_start_edge": bool(near_start),
-                        "calibration_needed": bool(calib_needed),
-                        "peaks": [
-                            {"index": i, "distance_mm": d, "strength": s}
-                            for i, (d, s) in enumerate(peaks)
-                        ],
-                        "strongest_distance": strongest,
-                        "ts": int(time.time()),
-                    }
-                    mqtt_pub.publish(msg)
+                    mqtt_client.publish_nowait(
+                        topic, build_message(device_id, status, result, peaks)
+                    )
                 # No peaks: do nothing (no print, no MQTT)
 
-                time.sleep(MEASUREMENT_INTERVAL)
-
             except Exception as e:
-                if exit_event.is_set():
-                    break
-                print(f"[Main] Unhandled error: {e}")
+                print(f"[Main] Publish stage error: {e}")
                 traceback.print_exc()
-                time.sleep(2)
-                initialize_detector()
+
+            mono = time.monotonic()
+            if mono - last_report >= REPORT_INTERVAL_SEC:
+                last_report = mono
+                print(f"[Pipeline] {acq.report(mono, frames.qsize())}")
+                if duty is not None:
+                    print(f"[Duty] {duty.summary()}")
+                if encoder is not None:
+                    print(f"[Delta] {encoder.report()}")
+                print(f"[I2C] {dev.i2c.summary()}")
 
     except Exception as e:
         print(f"[Main] Fatal error in main loop: {e}")
         traceback.print_exc()
         sys.exit(120)
     finally:
-        mqtt_pub.close()
+        exit_event.set()
+        if acq is not None:
+            acq.join(timeout=10)
+        mqtt_client.close()
+        dev.close()
+        if peak_log:
+            peak_log.close()
+        if capture:
+            capture.close()
         print("[Main] Exiting cleanly.")
 
 
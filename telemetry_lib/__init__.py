@@ -0,0 +1,10 @@
+"""
+Bodycam2 shared-memory telemetry bus.
+
+Usage:
+    from telemetry_lib import TelemetryBus
+"""
+
+from telemetry_lib.bus import FIELDS, Sample, TelemetryBus
+
+__all__ = ["FIELDS", "Sample", "TelemetryBus"]
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Shared-memory telemetry bus for bodycam2 services.
+
+One memory-mapped segment in /dev/shm with a fixed binary layout replaces
+the per-service text files (battery.dat, uv.dat, gps.dat, status.json).
+Every field has its own seqlock counter and write timestamp, so readers
+get a consistent value plus its age without opening or parsing files,
+and can block until a field changes instead of polling.
+
+Location : /app/bodycam2/telemetry_lib/bus.py
+Segment  : /dev/shm/bodycam_telemetry
+
+Writer (one process per field):
+    bus = TelemetryBus()
+    bus.publish("battery", voltage=3.92, percent=71)
+
+Reader:
+    bus = TelemetryBus()
+    sample = bus.read("battery")          # None until first write
+    if sample and sample.age() < 120:
+        print(sample.values["percent"])
+
+Waiting for changes (futex wake-up, polling fallback):
+    seq = bus.seq("battery")
+    if bus.wait("battery", seq, timeout=60):
+        ...                               # new value available
+
+Layout
+------
+Header (64 bytes):  magic "BCTM", layout version, global change counter,
+                    field count.
+Slot   (64 bytes):  seq u32 (odd while a write is in progress), pad,
+                    ts float64 (time.time() of the write), value bytes.
+
+Fields are append-only: new fields get the next slot, existing offsets
+never move, so old readers keep working.  Bump LAYOUT_VERSION only for
+incompatible changes; the segment is then recreated.
+"""
+
+import collections
+import ctypes
+import errno
+import fcntl
+import logging
+import mmap
+import os
+import platform
+import struct
+import time
+
+log = logging.getLogger("bodycam.telemetry")
+
+# ---------------------------------------------------------------------------
+#  Constants
+# ---------------------------------------------------------------------------
+DEFAULT_PATH = "/dev/shm/bodycam_telemetry"
+
+MAGIC = b"BCTM"
+LAYOUT_VERSION = 1
+HEADER_SIZE = 64
+SLOT_SIZE = 64
+MAX_FIELDS = 63
+SEGMENT_SIZE = HEADER_SIZE + SLOT_SIZE * MAX_FIELDS   # 4096
+
+_HEADER = struct.Struct("<4sIII")     # magic, version, change counter, n_fields
+_COUNTER_OFFSET = 8
+_SLOT_HEAD = struct.Struct("<IId")    # seq, pad, ts
+_VALUE_OFFSET = _SLOT_HEAD.size
+_SEQ = struct.Struct("<I")
+
+_READ_RETRIES = 100
+_POLL_INTERVAL_SEC = 0.1              # wait() fallback without futex
+
+# Field registry: (name, struct format, value names).  Append only.
+FIELDS = (
+    ("battery", "<fh", ("voltage", "percent")),
+    ("uv", "<ff", ("lux", "uvi")),
+    ("gps", "<dd", ("lat", "lon")),
+    ("cell", "<hh16s24s", ("signal_quality", "signal_level", "state", "operator")),
+    ("imu_motion", "<ff?12s", ("activity_g", "rate_dps", "moving", "state")),
+    ("battery_runtime", "<iff", ("runtime_s", "current_a", "soc_std")),
+    ("battery_event", "<12si", ("level", "runtime_s")),
+)
+
+# ---------------------------------------------------------------------------
+#  futex(2) via ctypes
+# ---------------------------------------------------------------------------
+_SYS_FUTEX = {
+    "x86_64": 202,
+    "aarch64": 98,
+    "armv7l": 240,
+    "armv6l": 240,
+    "i686": 240,
+}.get(platform.machine())
+
+FUTEX_WAIT = 0     # shared (not FUTEX_PRIVATE_FLAG): works across processes
+FUTEX_WAKE = 1
+_WAKE_ALL = 0x7FFFFFFF
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+def _load_futex():
+    if _SYS_FUTEX is None:
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        syscall = libc.syscall
+        syscall.restype = ctypes.c_long
+        return syscall
+    except (OSError, AttributeError):
+        return None
+
+
+_syscall = _load_futex()
+
+
+class Sample(collections.namedtuple("Sample", "values ts seq")):
+    """One consistent field read: ``values`` dict, write time, sequence."""
+
+    __slots__ = ()
+
+    def age(self, now=None):
+        return (time.time() if now is None else now) - self.ts
+
+
+class TelemetryBus:
+    """Reader/writer handle on the shared telemetry segment.
+
+    Opening creates (or repairs) the segment if needed, so writers and
+    readers can start in any order.  Each field must have exactly one
+    writing process; any number of processes may read.
+
+    Python has no memory-barrier primitive; the seqlock relies on the
+    writer's wake-up syscall after the final sequence store and on the
+    reader re-checking the sequence number, which is sufficient for the
+    low update rates used here.
+
+    Parameters
+    ----------
+    path : str, optional
+        Segment location (defaults to DEFAULT_PATH).
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._fields = {}
+        for index, (name, fmt, names) in enumerate(FIELDS):
+            st = struct.Struct(fmt)
+            if _VALUE_OFFSET + st.size > SLOT_SIZE:
+                raise ValueError(f"field {name} does not fit a {SLOT_SIZE}-byte slot")
+            self._fields[name] = (HEADER_SIZE + index * SLOT_SIZE, st, names)
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                self._init_segment(fd)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._mm = mmap.mmap(fd, SEGMENT_SIZE, mmap.MAP_SHARED,
+                                 mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+
+        self._anchor = ctypes.c_char.from_buffer(self._mm)
+        self._base = ctypes.addressof(self._anchor)
+        self.futex = _syscall is not None
+
+    @staticmethod
+    def _init_segment(fd):
+        """Size the file and write the header unless it is already valid."""
+        if os.fstat(fd).st_size == SEGMENT_SIZE:
+            head = os.pread(fd, _HEADER.size, 0)
+            magic, version, _counter, _n = _HEADER.unpack(head)
+            if magic == MAGIC and version == LAYOUT_VERSION:
+                return
+        os.ftruncate(fd, 0)
+        os.ftruncate(fd, SEGMENT_SIZE)
+        os.pwrite(fd, _HEADER.pack(MAGIC, LAYOUT_VERSION, 0, len(FIELDS)), 0)
+        log.info("Telemetry segment initialised (%d fields)", len(FIELDS))
+
+    # ------------------------------------------------------------------
+    #  Writing
+    # ------------------------------------------------------------------
+    def publish(self, name, *args, **kwargs):
+        """Write one field, positionally or by value name, and wake waiters.
+
+        Strings are stored NUL-padded and truncated to the slot width.
+        """
+        offset, st, names = self._fields[name]
+        values = list(args) + [kwargs[n] for n in names[len(args):]]
+        values = [v.encode() if isinstance(v, str) else v for v in values]
+
+        seq = _SEQ.unpack_from(self._mm, offset)[0] & 0xFFFFFFFE
+        # An odd value left by a writer that died mid-update is
+        # resynchronised by the masking above; 0 is reserved for "never
+        # written", so the counter wraps to 2.
+        _SEQ.pack_into(self._mm, offset, seq + 1)
+        st.pack_into(self._mm, offset + _VALUE_OFFSET, *values)
+        struct.pack_into("<d", self._mm, offset + 8, time.time())
+        _SEQ.pack_into(self._mm, offset, (seq + 2) & 0xFFFFFFFF or 2)
+
+        counter = _SEQ.unpack_from(self._mm, _COUNTER_OFFSET)[0]
+        _SEQ.pack_into(self._mm, _COUNTER_OFFSET, (counter + 1) & 0xFFFFFFFF)
+        self._wake(offset)
+        self._wake(_COUNTER_OFFSET)
+
+    # ------------------------------------------------------------------
+    #  Reading
+    # ------------------------------------------------------------------
+    def seq(self, name):
+        """Current sequence number of a field (0 = never written)."""
+        return _SEQ.unpack_from(self._mm, self._fields[name][0])[0]
+
+    def counter(self):
+        """Global change counter, bumped by every publish."""
+        return _SEQ.unpack_from(self._mm, _COUNTER_OFFSET)[0]
+
+    def read(self, name):
+        """Return a consistent :class:`Sample`, or None if never written."""
+        offset, st, names = self._fields[name]
+        for _ in range(_READ_RETRIES):
+            seq = _SEQ.unpack_from(self._mm, offset)[0]
+            if seq & 1:
+                time.sleep(0)
+                continue
+            if seq == 0:
+                return None
+            ts = struct.unpack_from("<d", self._mm, offset + 8)[0]
+            raw = st.unpack_from(self._mm, offset + _VALUE_OFFSET)
+            if _SEQ.unpack_from(self._mm, offset)[0] == seq:
+                values = {
+                    n: v.rstrip(b"\0").decode(errors="replace") if isinstance(v, bytes) else v
+                    for n, v in zip(names, raw)
+                }
+                return Sample(values, ts, seq)
+        log.warning("Telemetry read of %s kept colliding with writes", name)
+        return None
+
+    def read_fresh(self, name, max_age):
+        """Like :meth:`read` but returns None if older than *max_age* seconds."""
+        sample = self.read(name)
+        if sample is None or sample.age() > max_age:
+            return None
+        return sample
+
+    # ------------------------------------------------------------------
+    #  Change notification
+    # ------------------------------------------------------------------
+    def wait(self, name, seq, timeout=None):
+        """Block until field *name* moves past *seq*. Returns True on change."""
+        return self._wait_word(self._fields[name][0], seq, timeout)
+
+    def wait_any(self, counter, timeout=None):
+        """Block until any field is published after *counter* was read."""
+        return self._wait_word(_COUNTER_OFFSET, counter, timeout)
+
+    def _wait_word(self, offset, seen, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = _SEQ.unpack_from(self._mm, offset)[0]
+            if current != seen and not (offset != _COUNTER_OFFSET and current & 1):
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            if self.futex:
+                self._futex_wait(offset, current, remaining)
+            else:
+                time.sleep(_POLL_INTERVAL_SEC if remaining is None
+                           else min(_POLL_INTERVAL_SEC, remaining))
+
+    def _futex_wait(self, offset, expected, timeout):
+        ts = None
+        if timeout is not None:
+            ts = _Timespec(int(timeout), int((timeout % 1) * 1e9))
+        rc = _syscall(ctypes.c_long(_SYS_FUTEX), ctypes.c_void_p(self._base + offset),
+                      ctypes.c_int(FUTEX_WAIT), ctypes.c_uint32(expected),
+                      ctypes.byref(ts) if ts is not None else ctypes.c_void_p(None),
+                      ctypes.c_void_p(None), ctypes.c_uint32(0))
+        if rc == -1:
+            err = ctypes.get_errno()
+            if err == errno.ENOSYS:
+                log.warning("futex unavailable, falling back to polling")
+                self.futex = False
+            elif err not in (errno.EAGAIN, errno.ETIMEDOUT, errno.EINTR):
+                raise OSError(err, os.strerror(err))
+
+    def _wake(self, offset):
+        if self.futex:
+            _syscall(ctypes.c_long(_SYS_FUTEX), ctypes.c_void_p(self._base + offset),
+                     ctypes.c_int(FUTEX_WAKE), ctypes.c_int(_WAKE_ALL),
+                     ctypes.c_void_p(None), ctypes.c_void_p(None), ctypes.c_uint32(0))
+
+    # ------------------------------------------------------------------
+    #  Shutdown
+    # ------------------------------------------------------------------
+    def close(self):
+        """Unmap the segment.  Safe to call multiple times."""
+        if self._mm is None:
+            return
+        del self._anchor
+        self._mm.close()
+        self._mm = None
+
+    @property
+    def fields(self):
+        return tuple(self._fields)
@@ -0,0 +1,49 @@
+"""
+Battery calibration loading: an implausible file (here a discharge curve
+with a repeated percentage, which would divide by zero in the estimator)
+must be ignored in favour of the board defaults.
+
+    python -m pytest test/test_battery_calibration.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "battery"))
+
+from adc_calibration import AdcCalibration  # noqa: E402
+from soc_estimator import DISCHARGE_CURVE  # noqa: E402
+
+DEFAULTS = {"vdd": 3.3, "r_top": 10000, "r_bottom": 27000, "curve": DISCHARGE_CURVE}
+
+
+def _load(tmp_path, data):
+    path = tmp_path / "battery_calibration.json"
+    path.write_text(json.dumps(data))
+    return AdcCalibration.load(DEFAULTS, str(path))
+
+
+def test_valid_file_is_used(tmp_path):
+    cal, path = _load(tmp_path, {"vdd": 3.28, "gain": 1.01})
+    assert path is not None
+    assert cal.vdd == 3.28
+
+
+def test_repeated_percent_is_rejected(tmp_path):
+    curve = [[4.2, 100], [4.0, 80], [3.9, 80], [3.0, 0]]
+    cal, path = _load(tmp_path, {"curve": curve})
+    assert path is None
+    assert cal.curve == [(float(v), float(p)) for v, p in DISCHARGE_CURVE]
+
+
+def test_bad_divider_and_rail_are_rejected(tmp_path):
+    assert _load(tmp_path, {"r_bottom": 0})[1] is None
+    assert _load(tmp_path, {"vdd": 0})[1] is None
+
+
+def test_voltage_is_linear_in_code():
+    cal = AdcCalibration(**DEFAULTS)
+    per_code = 3.3 / 1024 * 37000 / 27000
+    assert abs(cal.voltage(512) - 512 * per_code) < 1e-9
+    assert cal.voltage(-5) == cal.voltage(0)
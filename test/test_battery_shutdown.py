@@ -0,0 +1,51 @@
+"""
+Low-battery shutdown without a broker: the final status publish must give
+up after FINAL_STATUS_TIMEOUT_S and the coordinator must still stop the
+services and power off.
+
+    python -m pytest test/test_battery_shutdown.py
+"""
+
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "battery"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import shutdown  # noqa: E402
+
+
+def _closed_port():
+    """A local TCP port with nothing listening on it."""
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def test_shutdown_proceeds_without_broker(monkeypatch):
+    config = {
+        "server": "127.0.0.1", "port": _closed_port(), "device_id": "test-cam",
+        "keepalive": 60, "username": "", "password": "", "transport": "tcp",
+        "ws_path": "/mqtt", "tls": False,
+    }
+    monkeypatch.setattr(shutdown, "load_config", lambda: config)
+    monkeypatch.setattr(shutdown, "FINAL_STATUS_TIMEOUT_S", 1.0)
+    monkeypatch.setattr(shutdown, "FINAL_STATUS_GRACE_S", 1.0)
+
+    ran = []
+    coordinator = shutdown.ShutdownCoordinator(None, dry_run=True)
+    monkeypatch.setattr(coordinator, "_run", lambda cmd, timeout=None: ran.append(cmd))
+    coordinator.trigger("shutdown", 120)
+
+    t0 = time.monotonic()
+    coordinator.start()
+    coordinator.join(timeout=10)
+
+    assert not coordinator.is_alive(), "coordinator stuck on the final status"
+    assert time.monotonic() - t0 < 5
+    assert ran[-1] == shutdown.POWEROFF_CMD
+    assert len(ran) == len(shutdown.SHUTDOWN_ORDER) + 1
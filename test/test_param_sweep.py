@@ -0,0 +1,39 @@
+"""
+Parameter sweep ranking: a setting that suppresses every peak has no
+false peaks and no flicker, and must still never rank first.
+
+    python -m pytest test/test_param_sweep.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "radar"))
+
+import param_sweep  # noqa: E402
+
+
+def _capture(n_frames=400, seed=1):
+    """A steady target at 1.5 m plus weak random clutter."""
+    rng = np.random.default_rng(seed)
+    dist = np.full((n_frames, 2), np.nan, dtype=np.float32)
+    strength = np.full((n_frames, 2), np.nan, dtype=np.float32)
+    dist[:, 0] = 1500 + rng.normal(0, 10, n_frames)
+    strength[:, 0] = 3000
+    clutter = rng.random(n_frames) < 0.2
+    dist[clutter, 1] = rng.uniform(600, 2900, clutter.sum())
+    strength[clutter, 1] = 300
+    return dist, strength
+
+
+def test_no_detection_setting_never_ranks_first():
+    dist, strength = _capture()
+    grid = [(500, 3000, 0), (500, 3000, 500), (500, 3000, 5000)]
+    res = param_sweep.evaluate(dist, strength, grid, param_sweep.DEFAULT_GATE_MM)
+    assert res["det_pct"][2] == 0 and res["false_pct"][2] == 0
+
+    order = param_sweep.rank(res)
+    assert grid[order[0]] == (500, 3000, 500)
+    assert order[-1] == 2
@@ -0,0 +1,38 @@
+"""
+Delta encoding: a peak that stays put keeps its id across a keyframe,
+so the backend does not see it vanish and reappear every KEYFRAME_SEC.
+
+    python -m pytest test/test_radar_delta.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "radar"))
+
+from delta import DeltaEncoder  # noqa: E402
+
+RESULT = 25 << 16  # 25 deg C, no flags
+
+
+def _ids(msg):
+    return {pid: d for pid, d, _s in msg["peaks"]}
+
+
+def test_stationary_peak_keeps_id_across_keyframe():
+    enc = DeltaEncoder("cam", keyframe_sec=10.0)
+    first = json.loads(enc.encode(0, RESULT, [(1500, 3000)], 0.0, 0))
+    assert first["type"] == "key"
+    (wall_id,) = _ids(first)
+
+    enc.encode(0, RESULT, [(1505, 3000), (2500, 900)], 5.0, 5)
+    second = json.loads(enc.encode(0, RESULT, [(1510, 3000), (2520, 900), (4000, 500)],
+                                   10.0, 10))
+    assert second["type"] == "key"
+    ids = _ids(second)
+    assert ids[wall_id] == 1510
+    assert len(set(ids)) == 3
+    # The peak added by the delta keeps its id too; only the new one is fresh
+    new = [pid for pid, d in ids.items() if d == 4000]
+    assert new and new[0] > max(pid for pid in ids if pid != new[0])
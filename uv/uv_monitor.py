@@ -3,18 +3,38 @@
 UV / Ambient Light Monitor for Bodycam
 LTR-390UV-01 on I2C bus 0 @ 0x53
 
-Reads UVI and Lux every 60 seconds, writes to /dev/shm/uv.dat
+Reads Lux every second and UVI every 60 seconds, publishes them on the
+telemetry bus ("uv" field, every Lux reading; the camera streamer picks
+its light profile from it; uvi is NaN until the first UVS reading and
+after a failed one) and writes /dev/shm/uv.dat for legacy readers every
+60 seconds
 Format: lux,uvi  (e.g. 1523.4,6.2)
 
+The LTR-390 measures either UVS or ALS, never both at once.  The sensor
+stays in continuous ALS mode and switches to UVS once per minute: gain,
+rate and mode registers are written only when they change, data-ready
+is taken from MAIN_STATUS, and each sample is one 3-byte block read.
+Gain and resolution are auto-ranged per channel from the previous raw
+count (RangeControl), so one conversion per channel and cycle is enough:
+long integration at high gain in the dark, short integration at low gain
+in direct sun.  A saturated reading is retried at once a few steps down,
+a near-zero one once at the more sensitive setting it implies.
+
 Logs to /tmp/uv.log
 """
 
-import smbus2
+import argparse
+import math
 import time
 import logging
 import signal
 import sys
-import statistics
+
+# Allow import of shared telemetry_lib module from /app/bodycam2/
+sys.path.insert(0, "/app/bodycam2")
+
+from i2c_lib import PRIORITY_LOW, open_device
+from telemetry_lib import TelemetryBus
 
 # -----------------------------------------------------------------------------
 # Configuration
@@ -24,8 +44,9 @@ I2C_ADDR = 0x53
 
 OUTPUT_FILE = "/dev/shm/uv.dat"
 LOG_FILE = "/tmp/uv.log"
-POLL_INTERVAL = 60      # seconds
-NUM_SAMPLES = 3         # samples to median
+POLL_INTERVAL = 60      # seconds, UVI and uv.dat
+ALS_INTERVAL = 1.0      # seconds, lux on the telemetry bus (--als-interval)
+I2C_STATS_INTERVAL = 3600   # seconds between I2C transaction statistics in the log
 
 WFAC = 1.0              # Window factor. 1.0 = no window / clear sky
 
@@ -36,11 +57,9 @@ REG_GAIN            = 0x05
 REG_PART_ID         = 0x06
 REG_MAIN_STATUS     = 0x07
 REG_ALS_DATA_0      = 0x0D
-REG_ALS_DATA_1      = 0x0E
-REG_ALS_DATA_2      = 0x0F
 REG_UVS_DATA_0      = 0x10
-REG_UVS_DATA_1      = 0x11
-REG_UVS_DATA_2      = 0x12
+
+STATUS_DATA_READY   = 0x08    # MAIN_STATUS bit 3, cleared on read
 
 # MAIN_CTRL values
 CTRL_STANDBY         = 0x00
@@ -54,24 +73,52 @@ GAIN_6               = 0x02
 GAIN_9               = 0x03
 GAIN_18              = 0x04
 
-# Resolution / measurement rate (register 0x04)
-RES_20BIT_400MS      = 0x00
-RES_18BIT_100MS      = 0x22
+GAIN_FACTORS = {GAIN_1: 1, GAIN_3: 3, GAIN_6: 6, GAIN_9: 9, GAIN_18: 18}
 
-# UVS config: gain 18x, 20-bit/400ms -> sensitivity = 2300 counts/UVI
-UVS_GAIN             = GAIN_18
-UVS_CONV_TIME        = 0.45   # 400ms + margin
-UV_SENSITIVITY       = 2300.0
+# Resolution / measurement rate (register 0x04): resolution bits 6:4,
+# rate bits 2:0, rate chosen as the shortest >= integration time
+RES_20BIT_400MS      = 0x04   # 20-bit, 500ms rate
+RES_19BIT_200MS      = 0x13   # 19-bit, 200ms rate
+RES_18BIT_100MS      = 0x22   # 18-bit, 100ms rate
+RES_17BIT_50MS       = 0x31   # 17-bit, 50ms rate
+
+# Integration time (seconds) and full-scale count per MEAS_RATE value
+INT_TIMES = {RES_20BIT_400MS: 0.4, RES_19BIT_200MS: 0.2,
+             RES_18BIT_100MS: 0.1, RES_17BIT_50MS: 0.05}
+FULL_SCALE = {RES_20BIT_400MS: (1 << 20) - 1, RES_19BIT_200MS: (1 << 19) - 1,
+              RES_18BIT_100MS: (1 << 18) - 1, RES_17BIT_50MS: (1 << 17) - 1}
 
-# ALS config: gain 3x, 18-bit/100ms
-ALS_GAIN             = GAIN_3
-ALS_CONV_TIME        = 0.15   # 100ms + margin
-ALS_GAIN_FACTOR      = 3.0
-ALS_INT_FACTOR       = 1.0    # 18-bit/100ms -> INT=1
+# UVS sensitivity: 2300 counts/UVI at gain 18x, 20-bit/400ms (datasheet),
+# scaled linearly with gain and integration time
+UV_SENSITIVITY       = 2300.0
 
-# Meas rate register values
-UVS_MEAS_RATE_REG    = 0x04   # 20-bit resolution, 500ms rate
-ALS_MEAS_RATE_REG    = 0x22   # 18-bit resolution, 100ms rate
+# Auto-ranging ladders, most sensitive first: (gain, meas_rate).
+# Full scale grows with integration time as fast as the signal does, so
+# only gain extends the range; integration time buys resolution.
+ALS_RANGES = [
+    (GAIN_18, RES_20BIT_400MS),   # up to ~6k lux
+    (GAIN_9, RES_19BIT_200MS),    # ~12k lux
+    (GAIN_6, RES_18BIT_100MS),    # ~18k lux
+    (GAIN_3, RES_18BIT_100MS),    # ~37k lux
+    (GAIN_1, RES_17BIT_50MS),     # ~110k lux, direct sun
+]
+UVS_RANGES = [
+    (GAIN_18, RES_20BIT_400MS),
+    (GAIN_18, RES_18BIT_100MS),
+    (GAIN_9, RES_18BIT_100MS),
+    (GAIN_3, RES_17BIT_50MS),
+]
+RANGE_HIGH_FRAC      = 0.7    # Keep the predicted count below this of full scale
+RANGE_MIN_COUNTS     = 2000   # Enough resolution to prefer a faster setting
+SATURATION_FRAC      = 0.95
+UNDERRANGE_COUNTS    = 100    # Too coarse to report; retry at the new setting
+MAX_RERANGE          = 3      # Immediate retries after a saturated reading
+
+# Startup settings (mid-ladder), replaced after the first reading
+UVS_GAIN, UVS_MEAS_RATE = UVS_RANGES[1]
+ALS_GAIN, ALS_MEAS_RATE = ALS_RANGES[3]
+
+DATA_READY_TIMEOUT   = 0.3    # beyond one conversion at the slowest rate used
 
 EXPECTED_PART_ID     = 0xB2
 
@@ -107,181 +154,272 @@ signal.signal(signal.SIGINT, signal_handler)
 # -----------------------------------------------------------------------------
 # I2C helpers
 # -----------------------------------------------------------------------------
-def write_reg(bus, reg, val):
-    bus.write_byte_data(I2C_ADDR, reg, val)
+def write_reg(dev, reg, val):
+    dev.write_byte_data(reg, val)
 
 
-def read_reg(bus, reg):
-    return bus.read_byte_data(I2C_ADDR, reg)
-
-
-def read_20bit_data(bus, reg_low):
-    """Read 3 consecutive registers and assemble 20-bit value."""
-    d0 = bus.read_byte_data(I2C_ADDR, reg_low)
-    d1 = bus.read_byte_data(I2C_ADDR, reg_low + 1)
-    d2 = bus.read_byte_data(I2C_ADDR, reg_low + 2)
-    return ((d2 & 0x0F) << 16) | (d1 << 8) | d0
+def read_reg(dev, reg):
+    return dev.read_byte_data(reg)
 
 
 # -----------------------------------------------------------------------------
 # Sensor init / verify
 # -----------------------------------------------------------------------------
-def init_sensor(bus):
+def init_sensor(dev):
     """Verify part ID and put sensor in standby."""
-    part_id = read_reg(bus, REG_PART_ID)
+    part_id = read_reg(dev, REG_PART_ID)
     if part_id != EXPECTED_PART_ID:
         log.warning("Unexpected PART_ID: 0x%02X (expected 0x%02X)", part_id, EXPECTED_PART_ID)
 
     # Clear power-on status by reading MAIN_STATUS
-    status = read_reg(bus, REG_MAIN_STATUS)
+    status = read_reg(dev, REG_MAIN_STATUS)
     log.info("Initial status: 0x%02X", status)
 
     # Ensure standby
-    write_reg(bus, REG_MAIN_CTRL, CTRL_STANDBY)
+    write_reg(dev, REG_MAIN_CTRL, CTRL_STANDBY)
 
     log.info("LTR-390UV initialized (PART_ID=0x%02X)", part_id)
 
 
 # -----------------------------------------------------------------------------
-# Single measurement
+# Acquisition
 # -----------------------------------------------------------------------------
-def read_uvs(bus):
-    """Take a single UVS measurement and return raw count."""
-    # Configure for UVS
-    write_reg(bus, REG_GAIN, UVS_GAIN)
-    write_reg(bus, REG_MEAS_RATE, UVS_MEAS_RATE_REG)
-
-    # Activate UVS mode
-    write_reg(bus, REG_MAIN_CTRL, CTRL_UVS_ACTIVE)
-
-    # Wait for conversion
-    time.sleep(UVS_CONV_TIME)
-
-    # Poll for data ready (bit 3 of MAIN_STATUS)
-    for _ in range(10):
-        status = read_reg(bus, REG_MAIN_STATUS)
-        if status & 0x08:
-            break
-        time.sleep(0.05)
-
-    data = read_20bit_data(bus, REG_UVS_DATA_0)
-
-    # Back to standby
-    write_reg(bus, REG_MAIN_CTRL, CTRL_STANDBY)
-
-    return data
-
-
-def read_als(bus):
-    """Take a single ALS measurement and return raw count."""
-    # Configure for ALS
-    write_reg(bus, REG_GAIN, ALS_GAIN)
-    write_reg(bus, REG_MEAS_RATE, ALS_MEAS_RATE_REG)
-
-    # Activate ALS mode
-    write_reg(bus, REG_MAIN_CTRL, CTRL_ALS_ACTIVE)
-
-    # Wait for conversion
-    time.sleep(ALS_CONV_TIME)
-
-    # Poll for data ready
-    for _ in range(10):
-        status = read_reg(bus, REG_MAIN_STATUS)
-        if status & 0x08:
+class Ltr390:
+    """Continuous-mode acquisition with shadowed configuration registers.
+
+    MAIN_CTRL, GAIN and MEAS_RATE are only written when the requested
+    value differs from what the sensor already holds, so staying on one
+    channel costs nothing but the data-ready poll and the block read.
+    """
+
+    def __init__(self, dev):
+        self.dev = dev
+        self._regs = {}
+
+    def _set(self, reg, val):
+        if self._regs.get(reg) != val:
+            write_reg(self.dev, reg, val)
+            self._regs[reg] = val
+
+    def start(self, uvs, gain, meas_rate):
+        """Switch to continuous UVS (uvs=True) or ALS measurement."""
+        changed = (self._regs.get(REG_MAIN_CTRL) != (CTRL_UVS_ACTIVE if uvs else CTRL_ALS_ACTIVE)
+                   or self._regs.get(REG_GAIN) != gain
+                   or self._regs.get(REG_MEAS_RATE) != meas_rate)
+        if changed:
+            # Configure in standby so the first conversion uses the new settings
+            self._set(REG_MAIN_CTRL, CTRL_STANDBY)
+            self._set(REG_GAIN, gain)
+            self._set(REG_MEAS_RATE, meas_rate)
+            self._set(REG_MAIN_CTRL, CTRL_UVS_ACTIVE if uvs else CTRL_ALS_ACTIVE)
+            # Drop a conversion that may have completed under the old settings
+            read_reg(self.dev, REG_MAIN_STATUS)
+        return changed
+
+    def standby(self):
+        self._set(REG_MAIN_CTRL, CTRL_STANDBY)
+
+    def wait_ready(self, int_time):
+        """Return once a conversion is available (sleeping if none is yet)."""
+        if read_reg(self.dev, REG_MAIN_STATUS) & STATUS_DATA_READY:
+            return True
+        time.sleep(int_time)
+        deadline = time.monotonic() + DATA_READY_TIMEOUT
+        while True:
+            if read_reg(self.dev, REG_MAIN_STATUS) & STATUS_DATA_READY:
+                return True
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+
+    def read_data(self, uvs):
+        """One 3-byte block read of the UVS or ALS data registers."""
+        d0, d1, d2 = self.dev.read_i2c_block_data(
+            REG_UVS_DATA_0 if uvs else REG_ALS_DATA_0, 3)
+        return ((d2 & 0x0F) << 16) | (d1 << 8) | d0
+
+    def burst(self, uvs, gain, meas_rate, n):
+        """Collect `n` consecutive conversions of one channel."""
+        self.start(uvs, gain, meas_rate)
+        samples = []
+        for _ in range(n):
+            if not self.wait_ready(INT_TIMES[meas_rate]):
+                raise OSError("LTR-390 data-ready timeout")
+            samples.append(self.read_data(uvs))
+        return samples
+
+
+class RangeControl:
+    """Chooses gain and integration time from the previous raw count.
+
+    The previous count divided by its gain x integration time gives the
+    light level in sensor units; the next setting is the fastest one that
+    still yields RANGE_MIN_COUNTS without exceeding RANGE_HIGH_FRAC of
+    full scale, or the most sensitive one below that ceiling in the dark.
+    """
+
+    def __init__(self, ranges, initial):
+        self.ranges = ranges
+        self.setting = initial
+        self.level = None   # counts per (gain x second)
+
+    @staticmethod
+    def _scale(setting):
+        gain, rate = setting
+        return GAIN_FACTORS[gain] * INT_TIMES[rate]
+
+    def update(self, raw, setting):
+        """Record a reading and pick the setting for the next one."""
+        self.level = raw / self._scale(setting)
+        fits = [s for s in self.ranges
+                if self.level * self._scale(s) <= RANGE_HIGH_FRAC * FULL_SCALE[s[1]]]
+        if not fits:
+            self.setting = self.ranges[-1]
+            return
+        enough = [s for s in fits if self.level * self._scale(s) >= RANGE_MIN_COUNTS]
+        if enough:
+            self.setting = min(enough, key=lambda s: INT_TIMES[s[1]])
+        else:
+            self.setting = fits[0]
+
+    def saturated(self, raw, setting):
+        return raw >= SATURATION_FRAC * FULL_SCALE[setting[1]]
+
+    def step_down(self, setting, steps=2):
+        i = self.ranges.index(setting) if setting in self.ranges else 0
+        self.setting = self.ranges[min(i + steps, len(self.ranges) - 1)]
+
+
+def read_ranged(sensor, uvs, control):
+    """One auto-ranged reading. Returns (raw, gain, meas_rate)."""
+    for _ in range(MAX_RERANGE + 1):
+        gain, rate = setting = control.setting
+        raw = sensor.burst(uvs, gain, rate, 1)[0]
+        if not control.saturated(raw, setting) or setting == control.ranges[-1]:
             break
-        time.sleep(0.05)
-
-    data = read_20bit_data(bus, REG_ALS_DATA_0)
-
-    # Back to standby
-    write_reg(bus, REG_MAIN_CTRL, CTRL_STANDBY)
-
-    return data
+        control.step_down(setting)
+    control.update(raw, setting)
+    if raw < UNDERRANGE_COUNTS and control.setting != setting:
+        gain, rate = setting = control.setting
+        raw = sensor.burst(uvs, gain, rate, 1)[0]
+        control.update(raw, setting)
+    return raw, gain, rate
 
 
 # -----------------------------------------------------------------------------
 # Conversion formulas
 # -----------------------------------------------------------------------------
-def counts_to_uvi(raw_count):
+def counts_to_uvi(raw_count, gain=UVS_GAIN, meas_rate=UVS_MEAS_RATE):
     """Convert UVS raw count to UV Index."""
-    uvi = (raw_count / UV_SENSITIVITY) * WFAC
+    sensitivity = UV_SENSITIVITY * (GAIN_FACTORS[gain] / 18.0) * (INT_TIMES[meas_rate] / 0.4)
+    uvi = (raw_count / sensitivity) * WFAC
     return round(uvi, 1)
 
 
-def counts_to_lux(raw_count):
+def counts_to_lux(raw_count, gain=ALS_GAIN, meas_rate=ALS_MEAS_RATE):
     """Convert ALS raw count to Lux."""
-    lux = (0.6 * raw_count) / (ALS_GAIN_FACTOR * ALS_INT_FACTOR) * WFAC
+    int_factor = INT_TIMES[meas_rate] / 0.1
+    lux = (0.6 * raw_count) / (GAIN_FACTORS[gain] * int_factor) * WFAC
     return round(lux, 1)
 
 
 # -----------------------------------------------------------------------------
 # Main loop
 # -----------------------------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="LTR-390 UV / ambient light monitor")
+    parser.add_argument("--als-interval", type=float, default=ALS_INTERVAL,
+                        help="Seconds between lux readings (default: %(default)s; "
+                             f"{POLL_INTERVAL} = lux with UVI only)")
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+    als_interval = min(max(args.als_interval, 0.5), POLL_INTERVAL)
+
     log.info("UV monitor starting (bus=%d, addr=0x%02X)", I2C_BUS, I2C_ADDR)
-    log.info("UVS: gain=18x, 20-bit/400ms | ALS: gain=3x, 18-bit/100ms")
-    log.info("Sampling %d readings per cycle, interval=%ds", NUM_SAMPLES, POLL_INTERVAL)
+    log.info("Auto-ranged UVS/ALS: lux every %.1fs, uvi every %ds", als_interval, POLL_INTERVAL)
 
-    bus = None
+    dev = None
     try:
-        bus = smbus2.SMBus(I2C_BUS)
-        init_sensor(bus)
+        # Low priority: conversions are slow and a reading can wait for the
+        # battery ADC; the sensor is never holding the bus while it converts
+        dev = open_device(I2C_BUS, I2C_ADDR, "ltr390", PRIORITY_LOW)
+        init_sensor(dev)
+        sensor = Ltr390(dev)
+        uvs_range = RangeControl(UVS_RANGES, (UVS_GAIN, UVS_MEAS_RATE))
+        als_range = RangeControl(ALS_RANGES, (ALS_GAIN, ALS_MEAS_RATE))
     except Exception as e:
         log.error("Failed to initialize sensor: %s", e)
         sys.exit(1)
 
+    try:
+        telemetry = TelemetryBus()
+    except OSError as e:
+        log.error("Telemetry bus unavailable: %s", e)
+        telemetry = None
+
+    uvi = None
+    next_uvs = next_als = time.monotonic()
+    next_stats = next_uvs + I2C_STATS_INTERVAL
     while running:
         cycle_start = time.monotonic()
         try:
-            # Collect UVS samples
-            uvs_samples = []
-            for i in range(NUM_SAMPLES):
-                raw = read_uvs(bus)
-                uvs_samples.append(raw)
-
-            # Collect ALS samples
-            als_samples = []
-            for i in range(NUM_SAMPLES):
-                raw = read_als(bus)
-                als_samples.append(raw)
-
-            # Median
-            uvs_median = statistics.median(uvs_samples)
-            als_median = statistics.median(als_samples)
-
-            # Convert
-            uvi = counts_to_uvi(uvs_median)
-            lux = counts_to_lux(als_median)
-
-            # Clamp UVI floor
-            if uvi < 0:
-                uvi = 0.0
-
-            # Write output
-            output = f"{lux},{uvi}"
-            with open(OUTPUT_FILE, "w") as f:
-                f.write(output)
-
-            log.info("lux=%.1f uvi=%.1f (uvs_raw=%s als_raw=%s)",
-                     lux, uvi, uvs_samples, als_samples)
+            uvs_cycle = cycle_start >= next_uvs
+            if uvs_cycle:
+                next_uvs = cycle_start + POLL_INTERVAL
+                # A failed UVS reading must not cost the lux reading
+                try:
+                    uvs_raw, uvs_gain, uvs_rate = read_ranged(sensor, True, uvs_range)
+                    uvi = max(counts_to_uvi(uvs_raw, uvs_gain, uvs_rate), 0.0)
+                except Exception as e:
+                    log.error("UVS read failed: %s", e)
+                    uvs_cycle = False
+                    uvi = None
+
+            # Sensor stays in continuous ALS mode between fast readings
+            als_raw, als_gain, als_rate = read_ranged(sensor, False, als_range)
+            lux = counts_to_lux(als_raw, als_gain, als_rate)
+            acq_time = time.monotonic() - cycle_start
+
+            if telemetry is not None:
+                telemetry.publish("uv", lux=lux, uvi=math.nan if uvi is None else uvi)
+
+            if uvs_cycle:
+                # Write output
+                output = f"{lux},{uvi}"
+                with open(OUTPUT_FILE, "w") as f:
+                    f.write(output)
+
+                log.info("lux=%.1f uvi=%.1f (uvs_raw=%d gain=%dx %.0fms, "
+                         "als_raw=%d gain=%dx %.0fms, %.2fs)",
+                         lux, uvi, uvs_raw, GAIN_FACTORS[uvs_gain], INT_TIMES[uvs_rate] * 1000,
+                         als_raw, GAIN_FACTORS[als_gain], INT_TIMES[als_rate] * 1000, acq_time)
+
+            if cycle_start >= next_stats:
+                next_stats = cycle_start + I2C_STATS_INTERVAL
+                log.info("I2C %s", dev.summary())
 
         except Exception as e:
             log.error("Read cycle failed: %s", e)
 
-        # Sleep remainder of interval, checking for shutdown every second
-        elapsed = time.monotonic() - cycle_start
-        sleep_time = max(0, POLL_INTERVAL - elapsed)
-        end_time = time.monotonic() + sleep_time
-        while running and time.monotonic() < end_time:
-            time.sleep(1)
+        if als_interval >= POLL_INTERVAL:
+            sensor.standby()   # Nothing to sample until the next cycle
+
+        # Sleep until the next lux reading, checking for shutdown every second
+        next_als = max(next_als + als_interval, time.monotonic())
+        while running and time.monotonic() < next_als:
+            time.sleep(min(1.0, max(next_als - time.monotonic(), 0)))
 
     # Cleanup
-    if bus:
+    if dev:
         try:
-            write_reg(bus, REG_MAIN_CTRL, CTRL_STANDBY)
+            write_reg(dev, REG_MAIN_CTRL, CTRL_STANDBY)
         except Exception:
             pass
-        bus.close()
+        log.info("I2C %s", dev.summary())
+        dev.bus.close()
 
     log.info("UV monitor stopped")
 